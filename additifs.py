@@ -0,0 +1,153 @@
+"""
+Index des additifs - SuperNutriScore
+"""
+
+import re
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+# Groupes nommés : plages de numéros E et/ou numéros explicites.
+# Les édulcorants sont les édulcorants intenses (non nutritifs) pénalisés par
+# le Nutri-Score boissons, variantes comprises (e960a, e960c...)
+GROUPES_ADDITIFS = {
+    'colorants': {'plages': [(100, 199)]},
+    'conservateurs': {'plages': [(200, 299)]},
+    'antioxydants': {'plages': [(300, 399)]},
+    'epaississants_emulsifiants': {'plages': [(400, 499), (1400, 1499)]},
+    'regulateurs_acidite': {'plages': [(500, 599)]},
+    'exhausteurs_gout': {'plages': [(600, 699)]},
+    'edulcorants': {'numeros': [950, 951, 952, 954, 955, 957, 959, 960, 961, 962, 969]},
+    'polyols': {'numeros': [420, 421, 953, 964, 965, 966, 967, 968]}
+}
+
+# Un bit par groupe dans le masque uint16 de chaque produit
+BITS_GROUPES = {groupe: 1 << i for i, groupe in enumerate(GROUPES_ADDITIFS)}
+
+MOTIF_CODE = re.compile(r'^e(\d{2,4})(x{0,2})([a-z]*)$')
+SEPARATEURS = re.compile(r'[,;|\s]+')
+
+
+def normaliser_code(code: str) -> str:
+    code = code.strip().lower()
+    if code.startswith('en:'):
+        code = code[3:]
+    return code.replace('-', '')
+
+
+def numero_additif(code: str) -> Optional[int]:
+    # 'e160a' -> 160, 'e340ii' -> 340, 'e14xx' -> 1400
+    correspondance = MOTIF_CODE.match(code)
+    if correspondance is None:
+        return None
+    chiffres, inconnus, _ = correspondance.groups()
+    return int(chiffres + '0' * len(inconnus))
+
+
+def parser_liste_additifs(texte) -> List[str]:
+    if texte is None or (isinstance(texte, float) and np.isnan(texte)):
+        return []
+    codes = (normaliser_code(code) for code in SEPARATEURS.split(str(texte)))
+    return list(dict.fromkeys(code for code in codes if code))
+
+
+def masque_groupes(codes: List[str]) -> int:
+    masque = 0
+    for code in codes:
+        numero = numero_additif(code)
+        if numero is None:
+            continue
+        for groupe, definition in GROUPES_ADDITIFS.items():
+            if numero in definition.get('numeros', ()) or any(
+                    debut <= numero <= fin for debut, fin in definition.get('plages', ())):
+                masque |= BITS_GROUPES[groupe]
+    return masque
+
+
+def masques_additifs(liste_additifs: pd.Series) -> np.ndarray:
+    # Chaque liste distincte n'est analysée qu'une fois
+    codes, distinctes = pd.factorize(liste_additifs)
+    masques_distincts = np.array(
+        [masque_groupes(parser_liste_additifs(texte)) for texte in distinctes] + [0],
+        dtype=np.uint16
+    )
+    return masques_distincts[codes]
+
+
+def contient_groupe(masques, groupe: str):
+    # Fonctionne sur un masque scalaire comme sur un tableau de masques
+    return (masques & BITS_GROUPES[groupe]) != 0
+
+
+def contient_edulcorants(masques):
+    return contient_groupe(masques, 'edulcorants')
+
+
+class IndexAdditifs:
+    # Matrice creuse produits x codes au format CSR (indptr / indices),
+    # avec le masque de groupes de chaque produit
+
+    def __init__(self, vocabulaire: List[str], indptr: np.ndarray, indices: np.ndarray,
+                 masques: np.ndarray):
+        self.vocabulaire = vocabulaire
+        self.indptr = indptr
+        self.indices = indices
+        self.masques = masques
+        self.position_codes = {code: i for i, code in enumerate(vocabulaire)}
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    @classmethod
+    def construire(cls, liste_additifs: pd.Series) -> 'IndexAdditifs':
+        codes_listes, distinctes = pd.factorize(liste_additifs)
+
+        vocabulaire: Dict[str, int] = {}
+        listes_distinctes = []
+        masques_distincts = []
+        for texte in distinctes:
+            codes = parser_liste_additifs(texte)
+            listes_distinctes.append([vocabulaire.setdefault(code, len(vocabulaire)) for code in codes])
+            masques_distincts.append(masque_groupes(codes))
+        listes_distinctes.append([])  # listes manquantes (code -1)
+        masques_distincts.append(0)
+
+        # CSR des listes distinctes, puis recopie vectorisée ligne par produit
+        longueurs_distinctes = np.array([len(l) for l in listes_distinctes], dtype=np.int64)
+        indptr_distinctes = np.concatenate([[0], np.cumsum(longueurs_distinctes)])
+        indices_distinctes = np.array([i for l in listes_distinctes for i in l], dtype=np.int32)
+
+        longueurs = longueurs_distinctes[codes_listes]
+        indptr = np.concatenate([[0], np.cumsum(longueurs)])
+        decalage = np.repeat(indptr_distinctes[codes_listes] - indptr[:-1], longueurs)
+        indices = indices_distinctes[np.arange(indptr[-1]) + decalage]
+
+        masques = np.array(masques_distincts, dtype=np.uint16)[codes_listes]
+        return cls(list(vocabulaire), indptr, indices, masques)
+
+    def lignes(self) -> np.ndarray:
+        return np.repeat(np.arange(len(self)), np.diff(self.indptr))
+
+    def masque_groupe(self, groupe: str) -> np.ndarray:
+        return contient_groupe(self.masques, groupe)
+
+    def contient_code(self, code: str) -> np.ndarray:
+        presence = np.zeros(len(self), dtype=bool)
+        position = self.position_codes.get(normaliser_code(code))
+        if position is not None:
+            presence[self.lignes()[self.indices == position]] = True
+        return presence
+
+    def nombre_additifs(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def nombre_par_groupe(self, groupe: str) -> np.ndarray:
+        dans_groupe = np.array([(masque_groupes([code]) & BITS_GROUPES[groupe]) != 0
+                                for code in self.vocabulaire], dtype=bool)
+        if len(self.indices) == 0:
+            return np.zeros(len(self), dtype=np.int64)
+        return np.bincount(self.lignes()[dans_groupe[self.indices]], minlength=len(self))
+
+    def frequences(self) -> pd.Series:
+        comptes = np.bincount(self.indices, minlength=len(self.vocabulaire))
+        return pd.Series(comptes, index=self.vocabulaire).sort_values(ascending=False)
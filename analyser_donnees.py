@@ -1,7 +1,11 @@
 import pandas as pd
+from chargement_donnees import charger_base
+from additifs import contient_edulcorants
+from index_produits import charger_index
+from front_pareto import calculer_couches_pareto
 from supernutriscore import (
-    NutriScoreBoissons, ElectreTri, SuperNutriScore, AnalyseResultats,
-    creer_profils_limites, definir_poids_criteres
+    NutriScoreBoissons, ElectreTri, ElectreTriComplet, SuperNutriScore, AnalyseResultats,
+    creer_profils_categories, creer_profils_limites, definir_poids_criteres, definir_seuils_criteres
 )
 
 
@@ -14,8 +18,7 @@ def analyser_base_donnees():
     # Chargement des données
     print("[INFO] Chargement de la base de données...")
     try:
-        df = pd.read_csv('base_donnees_boissons.csv', encoding='utf-8')
-        df.columns = df.columns.str.strip()
+        df = charger_base()
         print(f"[OK] {len(df)} produits chargés")
         print()
     except Exception as e:
@@ -27,9 +30,10 @@ def analyser_base_donnees():
     print("-" * 80)
     print(f"Nombre total de produits: {len(df)}")
     print(f"\nDistribution des labels Nutri-Score:")
-    print(df['Label_Nutriscore'].value_counts().sort_index())
+    print(df['Label_Nutriscore'].value_counts()[lambda s: s > 0].sort_index())
     print(f"\nNombre de catégories: {df['Categorie'].nunique()}")
     print(f"Produits BIO: {(df['Label_Bio'] == 'OUI').sum()} ({(df['Label_Bio'] == 'OUI').sum()/len(df)*100:.1f}%)")
+    print(f"Produits avec édulcorants: {contient_edulcorants(df['Masque_Additifs']).sum()}")
     print()
     
     # Vérification de l'algorithme Nutri-Score BOISSONS
@@ -51,19 +55,15 @@ def analyser_base_donnees():
         # Détection eau
         est_eau = produit['Categorie'].lower() == 'eau'
         
-        # Détection édulcorants
-        contient_edulcorants = False
-        if pd.notna(produit['Liste_Additifs']):
-            edulcorants_codes = ['e950', 'e951', 'e952', 'e954', 'e955']
-            contient_edulcorants = any(code in str(produit['Liste_Additifs']).lower() 
-                                      for code in edulcorants_codes)
+        # Détection édulcorants (masque calculé au chargement)
+        edulcorants = bool(contient_edulcorants(produit['Masque_Additifs']))
         
         resultat = NutriScoreBoissons.calculer_score_nutritionnel(
             produit['Energie_kJ'],
             produit['Acides_Gras_Satures_g'],
             produit['Sucres_g'],
             produit['Sel_g'],
-            contient_edulcorants,
+            edulcorants,
             produit['Proteines_g'],
             produit['Fibres_g'],
             produit['Fruits_Legumes_Pct'],
@@ -74,7 +74,12 @@ def analyser_base_donnees():
         print(f"Score DB: {produit['Score_Nutriscore']} | Label DB: {produit['Label_Nutriscore']}")
         concordance = "[OK]" if resultat['label'] == produit['Label_Nutriscore'] else "[X]"
         print(f"Concordance: {concordance}")
-    
+
+    # Vérification sur toute la base (calcul vectorisé)
+    scores_base = NutriScoreBoissons.calculer_scores_batch(df)
+    concordance_base = (scores_base['Label_Nutriscore_Calcule'] == df['Label_Nutriscore']).mean()
+    print(f"\nConcordance sur toute la base ({len(df)} produits): {concordance_base:.2%}")
+
     print()
     
     # Classification ELECTRE TRI
@@ -96,13 +101,13 @@ def analyser_base_donnees():
     print("Classification avec λ=0.6:")
     print()
     
+    electre = ElectreTri(poids, profils, lambda_seuil=0.6)
+    df_resultat = electre.classifier_deux_procedures(df)
+    
     for methode in ['pessimiste', 'optimiste']:
         print(f"Procédure {methode.upper()}:")
-        electre = ElectreTri(poids, profils, lambda_seuil=0.6)
-        df_resultat = electre.classifier_base_donnees(df, methode)
-        
         colonne = f'Classe_ELECTRE_{methode.capitalize()}'
-        print(df_resultat[colonne].value_counts().sort_index())
+        print(df_resultat[colonne].value_counts()[lambda s: s > 0].sort_index())
         
         # Matrice de confusion
         matrice = AnalyseResultats.matrice_confusion(
@@ -113,26 +118,25 @@ def analyser_base_donnees():
         print(f"Accuracy: {metriques['accuracy']:.2%}")
         print()
     
+    n_incomparables = df_resultat['Incomparabilite_ELECTRE'].sum()
+    print(f"Produits incomparables (pessimiste ≠ optimiste): {n_incomparables} ({n_incomparables/len(df)*100:.1f}%)")
+    print()
+    
     # SuperNutri-Score
     print("[SUPER] Calcul du SuperNutri-Score")
     print("-" * 80)
     
-    resultats_super = []
-    for idx, row in df.iterrows():
-        super_score = SuperNutriScore.calculer_super_score(
-            row['Label_Nutriscore'],
-            row['Label_Greenscore'] if pd.notna(row['Label_Greenscore']) else 'NOT-APPLICABLE',
-            row['Label_Bio'],
-            poids_nutri=0.5,
-            poids_green=0.3,
-            poids_bio=0.2
-        )
-        resultats_super.append(super_score['classe'])
+    resultats_super = SuperNutriScore.calculer_super_scores_batch(
+        df,
+        poids_nutri=0.5,
+        poids_green=0.3,
+        poids_bio=0.2
+    )
     
-    df['SuperNutri_Classe'] = resultats_super
+    df['SuperNutri_Classe'] = resultats_super['SuperNutri_Classe']
     
     print("Distribution SuperNutri-Score:")
-    print(df['SuperNutri_Classe'].value_counts().sort_index())
+    print(df['SuperNutri_Classe'].value_counts()[lambda s: s > 0].sort_index())
     print()
     
     # Matrice de confusion SuperNutri vs Nutri
@@ -146,16 +150,7 @@ def analyser_base_donnees():
     
     # Top 10 meilleurs et pires produits
     print("[TOP] Top 5 meilleurs produits (SuperNutri-Score):")
-    df_super_score = []
-    for idx, row in df.iterrows():
-        super_score = SuperNutriScore.calculer_super_score(
-            row['Label_Nutriscore'],
-            row['Label_Greenscore'] if pd.notna(row['Label_Greenscore']) else 'NOT-APPLICABLE',
-            row['Label_Bio']
-        )
-        df_super_score.append(super_score['score'])
-    
-    df['SuperNutri_Score'] = df_super_score
+    df['SuperNutri_Score'] = resultats_super['SuperNutri_Score']
     
     top5 = df.nsmallest(5, 'SuperNutri_Score')[['Nom_Produit', 'Marque', 'SuperNutri_Classe', 'SuperNutri_Score']]
     print(top5.to_string(index=False))
@@ -172,22 +167,41 @@ def analyser_base_donnees():
     
     comparaisons = []
     
-    for lambda_val in [0.6, 0.7]:
-        for methode in ['pessimiste', 'optimiste']:
-            electre = ElectreTri(poids, profils, lambda_val)
-            df_temp = electre.classifier_base_donnees(df, methode)
-            
-            colonne = f'Classe_ELECTRE_{methode.capitalize()}'
-            matrice = AnalyseResultats.matrice_confusion(
-                df_temp['Label_Nutriscore'],
-                df_temp[colonne]
-            )
-            metriques = AnalyseResultats.calculer_metriques(matrice)
-            
-            comparaisons.append({
-                'Méthode': f'ELECTRE TRI {methode.capitalize()} (λ={lambda_val})',
-                'Accuracy': f"{metriques['accuracy']:.2%}"
-            })
+    electre = ElectreTri(poids, profils)
+    classes_lambda = electre.classifier_multi_lambda(df, [0.6, 0.7])
+    matrices = AnalyseResultats.matrices_confusion_lot(df['Label_Nutriscore'], classes_lambda)
+    
+    for (lambda_val, methode), matrice in zip(classes_lambda.columns, matrices):
+        metriques = AnalyseResultats.calculer_metriques(matrice)
+        
+        comparaisons.append({
+            'Méthode': f'ELECTRE TRI {methode.capitalize()} (λ={lambda_val})',
+            'Accuracy': f"{metriques['accuracy']:.2%}"
+        })
+    
+    # ELECTRE TRI complet (seuils q / p / v, discordance et veto)
+    electre_complet = ElectreTriComplet(poids, profils, definir_seuils_criteres(), lambda_seuil=0.6)
+    df_complet = electre_complet.classifier_deux_procedures(df)
+    for methode in ['pessimiste', 'optimiste']:
+        matrice = AnalyseResultats.matrice_confusion(
+            df['Label_Nutriscore'], df_complet[f'Classe_ELECTRE_{methode.capitalize()}']
+        )
+        comparaisons.append({
+            'Méthode': f'ELECTRE TRI complet {methode.capitalize()} (λ=0.6)',
+            'Accuracy': f"{AnalyseResultats.calculer_metriques(matrice)['accuracy']:.2%}"
+        })
+    
+    # Profils propres à chaque catégorie (profils globaux pour les petites catégories)
+    profils_categories = creer_profils_categories(df)
+    df_categories = electre.classifier_deux_procedures(df, profils_categories=profils_categories)
+    for methode in ['pessimiste', 'optimiste']:
+        matrice = AnalyseResultats.matrice_confusion(
+            df['Label_Nutriscore'], df_categories[f'Classe_ELECTRE_{methode.capitalize()}']
+        )
+        comparaisons.append({
+            'Méthode': f'ELECTRE TRI par catégorie {methode.capitalize()} (λ=0.6)',
+            'Accuracy': f"{AnalyseResultats.calculer_metriques(matrice)['accuracy']:.2%}"
+        })
     
     comparaisons.append({
         'Méthode': 'SuperNutri-Score',
@@ -198,19 +212,54 @@ def analyser_base_donnees():
     print(df_comparaison.to_string(index=False))
     print()
     
+    # Fronts de Pareto sur les critères ELECTRE
+    print("[PARETO] Fronts de Pareto (critères ELECTRE)")
+    print("-" * 80)
+    couches = calculer_couches_pareto(df)
+    couches_categorie = calculer_couches_pareto(df, par_categorie=True)
+    print(f"Nombre de couches: {couches.max()}")
+    print(f"Produits non dominés: {(couches == 1).sum()} sur toute la base, "
+          f"{(couches_categorie == 1).sum()} dans leur catégorie")
+    print("Nutri-Score des produits non dominés:")
+    print(df.loc[couches == 1, 'Label_Nutriscore'].value_counts()[lambda s: s > 0].sort_index())
+    print()
+    
+    # Changement d'un seul nutriment suffisant pour gagner une classe
+    print("[REFORMULATION] Passage à la classe Nutri-Score supérieure")
+    print("-" * 80)
+    contrefactuels = NutriScoreBoissons.calculer_contrefactuels_batch(df)
+    vises = contrefactuels['Classe_Visee'].notna()
+    print(f"Produits pouvant gagner une classe: {vises.sum()}")
+    leviers = [colonne for colonne in contrefactuels.columns
+               if colonne.startswith(('Reduction_', 'Augmentation_'))]
+    resume = pd.DataFrame({
+        'Levier': leviers,
+        'Produits': [contrefactuels[colonne].notna().sum() for colonne in leviers],
+        'Mediane': [contrefactuels[colonne].median() for colonne in leviers]
+    })
+    print(resume.to_string(index=False, float_format=lambda x: f"{x:.2f}"))
+    print(f"Retrait des édulcorants suffisant: {contrefactuels['Sans_Edulcorants'].sum()}")
+    print()
+    
     # Analyse par catégorie
     print("[CATEGORIE] Analyse par catégorie")
     print("-" * 80)
     
-    top_categories = df['Categorie'].value_counts().head(5)
+    top_categories = df['Categorie'].value_counts()[lambda s: s > 0].head(5)
+    groupes = df_categories.groupby('Categorie', observed=True)
+    categories_propres = profils_categories.index.get_level_values(0)
     
     for categorie in top_categories.index:
-        df_cat = df[df['Categorie'] == categorie]
+        df_cat = groupes.get_group(categorie)
         print(f"\nCatégorie: {categorie} ({len(df_cat)} produits)")
         print(f"Distribution Nutri-Score:")
-        print(df_cat['Label_Nutriscore'].value_counts().sort_index())
+        print(df_cat['Label_Nutriscore'].value_counts()[lambda s: s > 0].sort_index())
         print(f"Moyenne Sucres: {df_cat['Sucres_g'].mean():.1f}g/100ml")
         print(f"Moyenne Additifs: {df_cat['Nombre_Additifs'].mean():.1f}")
+        matrice = AnalyseResultats.matrice_confusion(df_cat['Label_Nutriscore'], df_cat['Classe_ELECTRE_Pessimiste'])
+        origine = 'de la catégorie' if categorie in categories_propres else 'globaux'
+        print(f"Accuracy ELECTRE TRI pessimiste (profils {origine}): "
+              f"{AnalyseResultats.calculer_metriques(matrice)['accuracy']:.2%}")
     
     print()
     print("=" * 80)
@@ -226,16 +275,21 @@ def analyser_base_donnees():
 
 
 def analyser_produit_specifique(nom_produit: str):
-    df = pd.read_csv('base_donnees_boissons.csv', encoding='utf-8')
-    df.columns = df.columns.str.strip()
+    df = charger_base()
+    index = charger_index(df=df)
     
-    produit = df[df['Nom_Produit'].str.contains(nom_produit, case=False, na=False)]
+    # Code-barres exact, sinon recherche dans les noms (casse et accents ignorés)
+    if nom_produit.strip().isdigit():
+        position = index.position_code_barres(nom_produit.strip())
+        positions = [position] if position is not None else []
+    else:
+        positions = index.rechercher(nom_produit)
     
-    if len(produit) == 0:
+    if len(positions) == 0:
         print(f"[ERREUR] Produit '{nom_produit}' non trouvé")
         return
     
-    produit = produit.iloc[0]
+    produit = df.iloc[positions[0]]
     
     print("=" * 80)
     print(f"ANALYSE DÉTAILLÉE : {produit['Nom_Produit']}")
@@ -249,30 +303,26 @@ def analyser_produit_specifique(nom_produit: str):
     print()
     
     print("[ANALYSE] Composition nutritionnelle (pour 100ml)")
-    print(f"Énergie: {produit['Energie_kJ']} kJ ({produit['Energie_kcal']} kcal)")
-    print(f"Sucres: {produit['Sucres_g']}g")
-    print(f"Acides gras saturés: {produit['Acides_Gras_Satures_g']}g")
-    print(f"Sel: {produit['Sel_g']}g")
-    print(f"Protéines: {produit['Proteines_g']}g")
-    print(f"Fibres: {produit['Fibres_g']}g")
-    print(f"Fruits/Légumes: {produit['Fruits_Legumes_Pct']}%")
+    print(f"Énergie: {produit['Energie_kJ']:g} kJ ({produit['Energie_kcal']:g} kcal)")
+    print(f"Sucres: {produit['Sucres_g']:g}g")
+    print(f"Acides gras saturés: {produit['Acides_Gras_Satures_g']:g}g")
+    print(f"Sel: {produit['Sel_g']:g}g")
+    print(f"Protéines: {produit['Proteines_g']:g}g")
+    print(f"Fibres: {produit['Fibres_g']:g}g")
+    print(f"Fruits/Légumes: {produit['Fruits_Legumes_Pct']:g}%")
     print(f"Nombre d'additifs: {produit['Nombre_Additifs']}")
     print()
     
     # Nutri-Score
     est_eau = produit['Categorie'].lower() == 'eau'
-    contient_edulcorants = False
-    if pd.notna(produit['Liste_Additifs']):
-        edulcorants_codes = ['e950', 'e951', 'e952', 'e954', 'e955']
-        contient_edulcorants = any(code in str(produit['Liste_Additifs']).lower() 
-                                  for code in edulcorants_codes)
+    edulcorants = bool(contient_edulcorants(produit['Masque_Additifs']))
     
     resultat_nutri = NutriScoreBoissons.calculer_score_nutritionnel(
         produit['Energie_kJ'],
         produit['Acides_Gras_Satures_g'],
         produit['Sucres_g'],
         produit['Sel_g'],
-        contient_edulcorants,
+        edulcorants,
         produit['Proteines_g'],
         produit['Fibres_g'],
         produit['Fruits_Legumes_Pct'],
@@ -0,0 +1,226 @@
+"""
+Cache des artefacts dérivés - SuperNutriScore
+
+Profils limites, comparaisons produits / profils, couches de Pareto et cubes
+SuperNutri-Score,
+indexés par l'empreinte du contenu de la base et par les paramètres :
+niveau mémoire LRU, niveau disque optionnel, éviction explicite.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from front_pareto import calculer_couches_pareto
+from supernutriscore import (
+    CRITERES, ElectreTri, SuperNutriScore, creer_profils_categories, creer_profils_limites
+)
+
+DOSSIER_ARTEFACTS = '.artefacts_supernutriscore'
+VERSION_ARTEFACTS = 3
+
+
+def empreinte_donnees(df: pd.DataFrame, colonnes: Optional[List[str]] = None) -> str:
+    # Empreinte du contenu (valeurs, noms et types des colonnes), indépendante de l'index
+    colonnes = list(df.columns) if colonnes is None else list(colonnes)
+    sha = hashlib.sha256()
+    sha.update(json.dumps([(c, str(df[c].dtype)) for c in colonnes]).encode('utf-8'))
+    sha.update(pd.util.hash_pandas_object(df[colonnes], index=False).to_numpy().tobytes())
+    return sha.hexdigest()
+
+
+def empreinte_profils(profils: pd.DataFrame) -> str:
+    return empreinte_donnees(profils.reset_index())
+
+
+class CacheArtefacts:
+    # Niveau mémoire : OrderedDict (le plus ancien en tête), au plus taille_max entrées.
+    # Niveau disque : un pickle par clé, préfixé par l'empreinte de la base ;
+    # au-delà de taille_max_disque octets, les fichiers les moins récemment lus
+    # sont supprimés
+
+    def __init__(self, taille_max: int = 32, dossier: Optional[str] = None,
+                 taille_max_disque: int = 512 * 2 ** 20):
+        self.taille_max = taille_max
+        self.dossier = dossier
+        self.taille_max_disque = taille_max_disque
+        self.memoire: 'OrderedDict[str, Tuple[str, object]]' = OrderedDict()
+        self.succes = 0
+        self.echecs = 0
+        if dossier is not None:
+            os.makedirs(dossier, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self.memoire)
+
+    def __repr__(self) -> str:
+        return (f"CacheArtefacts(memoire={len(self.memoire)}/{self.taille_max}, "
+                f"succes={self.succes}, echecs={self.echecs}, dossier={self.dossier!r})")
+
+    @staticmethod
+    def cle(nature: str, empreinte: str, **parametres) -> str:
+        description = json.dumps({'version': VERSION_ARTEFACTS, 'nature': nature, 'empreinte': empreinte,
+                                  'parametres': parametres}, sort_keys=True, default=repr)
+        return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+    def chemin_disque(self, cle: str, empreinte: str) -> str:
+        return os.path.join(self.dossier, f'{empreinte[:16] or "global"}_{cle}.pkl')
+
+    def obtenir(self, cle: str, empreinte: str = ''):
+        # Renvoie (trouvé, valeur)
+        if cle in self.memoire:
+            self.memoire.move_to_end(cle)
+            self.succes += 1
+            return True, self.memoire[cle][1]
+
+        if self.dossier is not None:
+            chemin = self.chemin_disque(cle, empreinte)
+            try:
+                with open(chemin, 'rb') as f:
+                    valeur = pickle.load(f)
+                os.utime(chemin)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+            else:
+                self.succes += 1
+                self.memoriser(cle, empreinte, valeur)
+                return True, valeur
+
+        self.echecs += 1
+        return False, None
+
+    def memoriser(self, cle: str, empreinte: str, valeur):
+        self.memoire[cle] = (empreinte, valeur)
+        self.memoire.move_to_end(cle)
+        while len(self.memoire) > self.taille_max:
+            self.memoire.popitem(last=False)
+
+    def enregistrer(self, cle: str, valeur, empreinte: str = ''):
+        self.memoriser(cle, empreinte, valeur)
+        if self.dossier is None:
+            return
+
+        chemin = self.chemin_disque(cle, empreinte)
+        temporaire = f'{chemin}.{os.getpid()}.tmp'
+        try:
+            with open(temporaire, 'wb') as f:
+                pickle.dump(valeur, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporaire, chemin)
+        except OSError:
+            if os.path.exists(temporaire):
+                os.remove(temporaire)
+            return
+        self.evincer_disque()
+
+    def fichiers_disque(self) -> List[Tuple[float, int, str]]:
+        fichiers = []
+        for nom in os.listdir(self.dossier):
+            if not nom.endswith('.pkl'):
+                continue
+            chemin = os.path.join(self.dossier, nom)
+            try:
+                stat = os.stat(chemin)
+            except OSError:
+                continue
+            fichiers.append((stat.st_mtime, stat.st_size, chemin))
+        return sorted(fichiers)
+
+    def evincer_disque(self):
+        fichiers = self.fichiers_disque()
+        total = sum(taille for _, taille, _ in fichiers)
+        for _, taille, chemin in fichiers:
+            if total <= self.taille_max_disque:
+                break
+            try:
+                os.remove(chemin)
+            except OSError:
+                continue
+            total -= taille
+
+    def invalider(self, empreinte: Optional[str] = None):
+        # Sans empreinte : tout le cache ; sinon les artefacts de cette base seulement
+        for cle in [c for c, (e, _) in self.memoire.items() if empreinte is None or e == empreinte]:
+            del self.memoire[cle]
+
+        if self.dossier is not None:
+            # Même préfixe que chemin_disque (empreinte vide -> « global »)
+            prefixe = '' if empreinte is None else f'{empreinte[:16] or "global"}_'
+            for _, _, chemin in self.fichiers_disque():
+                if os.path.basename(chemin).startswith(prefixe):
+                    try:
+                        os.remove(chemin)
+                    except OSError:
+                        pass
+
+    def obtenir_ou_calculer(self, nature: str, empreinte: str, calcul: Callable[[], object],
+                            **parametres):
+        cle = self.cle(nature, empreinte, **parametres)
+        trouve, valeur = self.obtenir(cle, empreinte)
+        if not trouve:
+            valeur = calcul()
+            self.enregistrer(cle, valeur, empreinte)
+        return valeur
+
+    # Artefacts
+
+    def profils_limites(self, df: pd.DataFrame, empreinte: Optional[str] = None) -> pd.DataFrame:
+        if empreinte is None:
+            empreinte = empreinte_donnees(df, CRITERES)
+        profils = self.obtenir_ou_calculer('profils', empreinte, lambda: creer_profils_limites(df))
+        return profils.copy()
+
+    def profils_categories(self, df: pd.DataFrame, colonne: str = 'Categorie',
+                           empreinte: Optional[str] = None) -> pd.DataFrame:
+        if empreinte is None:
+            empreinte = empreinte_donnees(df, CRITERES + [colonne])
+        profils = self.obtenir_ou_calculer('profils_categories', empreinte,
+                                           lambda: creer_profils_categories(df, colonne), colonne=colonne)
+        return profils.copy()
+
+    def comparaisons_profils(self, df: pd.DataFrame, electre: ElectreTri,
+                             empreinte: Optional[str] = None) -> Dict:
+        # Comparaisons empaquetées par ElectreTri.preparer : ne dépendent
+        # ni des poids ni de λ, seulement des profils et des critères. L'empreinte
+        # ignore l'index : il n'est pas conservé, preparer(df, ...) reprend celui de df
+        criteres = list(electre.poids.keys())
+        if empreinte is None:
+            empreinte = empreinte_donnees(df, criteres)
+
+        def calcul():
+            comparaisons = ElectreTri(electre.poids, electre.profils).preparer(df).comparaisons
+            for plans in (comparaisons['ab'], comparaisons['ba']):
+                plans.flags.writeable = False
+            return {cle: valeur for cle, valeur in comparaisons.items() if cle != 'index'}
+
+        return self.obtenir_ou_calculer('comparaisons', empreinte, calcul, criteres=sorted(criteres),
+                                        profils=empreinte_profils(electre.profils))
+
+    def couches_pareto(self, df: pd.DataFrame, par_categorie: bool = False, colonne: str = 'Categorie',
+                       empreinte: Optional[str] = None) -> pd.Series:
+        # Index exclu de l'empreinte : repris de df, comme pour comparaisons_profils
+        if empreinte is None:
+            empreinte = empreinte_donnees(df, CRITERES + [colonne] if par_categorie else CRITERES)
+        couches = self.obtenir_ou_calculer(
+            'couches_pareto', empreinte,
+            lambda: calculer_couches_pareto(df, par_categorie=par_categorie, colonne=colonne).to_numpy(),
+            par_categorie=par_categorie, colonne=colonne
+        )
+        nom = 'Couche_Pareto_Categorie' if par_categorie else 'Couche_Pareto'
+        return pd.Series(couches, index=df.index, name=nom)
+
+    def cube_super_score(self, poids_nutri: float = 0.5, poids_green: float = 0.3,
+                         poids_bio: float = 0.2) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        cube = self.obtenir_ou_calculer(
+            'cube_super_score', '',
+            lambda: SuperNutriScore.cube_super_score(poids_nutri, poids_green, poids_bio),
+            poids=[poids_nutri, poids_green, poids_bio]
+        )
+        for tableau in cube:
+            tableau.flags.writeable = False
+        return cube
+
@@ -0,0 +1,399 @@
+"""
+Chargement de la base de données - SuperNutriScore
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from pandas.api.types import CategoricalDtype
+from typing import Dict, List, Optional
+
+from additifs import masques_additifs
+
+CHEMIN_BASE = 'base_donnees_boissons.csv'
+
+LABELS_NUTRISCORE = ['A', 'B', 'C', 'D', 'E']
+LABELS_GREENSCORE = ['A-PLUS', 'A', 'B', 'C', 'D', 'E', 'F', 'NOT-APPLICABLE', 'UNKNOWN']
+LABELS_BIO = ['OUI', 'NON']
+
+# Schéma explicite : catégories pour les libellés, float32 pour les nutriments,
+# entiers compacts (nullables) pour les comptages et scores, codes-barres en
+# texte (zéros de tête conservés, valeurs manquantes admises)
+SCHEMA = {
+    'ID': 'int32',
+    'Nom_Produit': 'str',
+    'Marque': 'category',
+    'Code_Barres': 'str',
+    'Categorie': 'category',
+    'Energie_kJ': 'float32',
+    'Energie_kcal': 'float32',
+    'Acides_Gras_Satures_g': 'float32',
+    'Sucres_g': 'float32',
+    'Sodium_mg': 'float32',
+    'Sel_g': 'float32',
+    'Proteines_g': 'float32',
+    'Fibres_g': 'float32',
+    'Fruits_Legumes_Pct': 'float32',
+    'Score_Nutriscore': 'Int16',
+    'Label_Nutriscore': CategoricalDtype(LABELS_NUTRISCORE),
+    'Score_Greenscore': 'float32',
+    'Label_Greenscore': CategoricalDtype(LABELS_GREENSCORE),
+    'Label_Bio': CategoricalDtype(LABELS_BIO),
+    'Nombre_Additifs': 'Int16',
+    'Liste_Additifs': 'str'
+}
+
+COLONNES_OBLIGATOIRES = [
+    'Nom_Produit', 'Categorie', 'Energie_kJ', 'Acides_Gras_Satures_g', 'Sucres_g', 'Sel_g',
+    'Proteines_g', 'Fibres_g', 'Fruits_Legumes_Pct', 'Label_Nutriscore', 'Label_Greenscore',
+    'Label_Bio', 'Nombre_Additifs', 'Liste_Additifs'
+]
+
+# Plages physiquement plausibles (pour 100ml)
+PLAGES_VALEURS = {
+    'Energie_kJ': (0, 3800),
+    'Energie_kcal': (0, 900),
+    'Acides_Gras_Satures_g': (0, 100),
+    'Sucres_g': (0, 100),
+    'Sodium_mg': (0, 40000),
+    'Sel_g': (0, 100),
+    'Proteines_g': (0, 100),
+    'Fibres_g': (0, 100),
+    'Fruits_Legumes_Pct': (0, 100),
+    'Nombre_Additifs': (0, 100)
+}
+
+VERSION_CACHE = 4
+
+KJ_PAR_KCAL = 4.184
+SEL_PAR_SODIUM = 2.5 / 1000  # g de sel par mg de sodium
+
+
+# Codes EAN-8 / UPC-A / EAN-13 complétés par des zéros à gauche jusqu'à
+# cette longueur pour les comparer entre eux
+LONGUEUR_CODE_BARRES = 13
+
+
+class AvertissementDonnees(UserWarning):
+    pass
+
+
+def normaliser_codes_barres(codes) -> np.ndarray:
+    # Forme de comparaison des codes-barres : chiffres seuls, complétés à
+    # LONGUEUR_CODE_BARRES ('' si manquant ou non numérique). Accepte des
+    # entiers (zéros de tête perdus) comme des textes
+    textes = pd.Series(np.asarray(codes, dtype=object).ravel(), dtype='str').str.strip()
+    textes = textes.str.replace(r'\.0$', '', regex=True)
+    numeriques = textes.str.fullmatch(r'\d+').fillna(False).astype(bool)
+    normalises = textes.where(numeriques, '').str.zfill(LONGUEUR_CODE_BARRES)
+    return normalises.where(numeriques, '').to_numpy(dtype=str)
+
+
+def dtypes_lecture(colonnes: List[str]) -> Dict[str, object]:
+    # Les libellés sont d'abord lus en catégories libres pour pouvoir signaler
+    # les valeurs hors nomenclature avant de fixer les catégories
+    dtypes = {}
+    for colonne in colonnes:
+        dtype = SCHEMA.get(colonne.strip())
+        if dtype is None:
+            continue
+        dtypes[colonne] = 'category' if isinstance(dtype, CategoricalDtype) else dtype
+    return dtypes
+
+
+def valider_base(df: pd.DataFrame) -> pd.DataFrame:
+    anomalies = []
+
+    for colonne, (minimum, maximum) in PLAGES_VALEURS.items():
+        if colonne not in df.columns:
+            continue
+        valeurs = df[colonne].to_numpy(dtype=float, na_value=np.nan)
+        hors_plage = (valeurs < minimum) | (valeurs > maximum)
+        if hors_plage.any():
+            anomalies.append((colonne, f'hors plage [{minimum}, {maximum}]', int(hors_plage.sum())))
+
+    for colonne, dtype in SCHEMA.items():
+        if not isinstance(dtype, CategoricalDtype) or colonne not in df.columns:
+            continue
+        inconnus = df[colonne].notna() & ~df[colonne].isin(dtype.categories)
+        if inconnus.any():
+            anomalies.append((colonne, 'libellé inconnu', int(inconnus.sum())))
+
+    # Cohérence des unités : kJ / kcal et sel / sodium
+    if {'Energie_kJ', 'Energie_kcal'} <= set(df.columns):
+        kj = df['Energie_kJ'].to_numpy(dtype=float)
+        kcal = df['Energie_kcal'].to_numpy(dtype=float)
+        incoherent = np.abs(kj - KJ_PAR_KCAL * kcal) > np.maximum(10, 0.1 * kj)
+        if incoherent.any():
+            anomalies.append(('Energie_kJ', 'incohérent avec Energie_kcal', int(incoherent.sum())))
+
+    if {'Sel_g', 'Sodium_mg'} <= set(df.columns):
+        sel = df['Sel_g'].to_numpy(dtype=float)
+        sodium = df['Sodium_mg'].to_numpy(dtype=float)
+        incoherent = np.abs(sel - SEL_PAR_SODIUM * sodium) > np.maximum(0.01, 0.1 * sel)
+        if incoherent.any():
+            anomalies.append(('Sel_g', 'incohérent avec Sodium_mg', int(incoherent.sum())))
+
+    return pd.DataFrame(anomalies, columns=['Colonne', 'Anomalie', 'Nombre'])
+
+
+def appliquer_schema(df: pd.DataFrame) -> pd.DataFrame:
+    # Fixe les catégories des libellés (valeurs hors nomenclature -> NaN)
+    for colonne, dtype in SCHEMA.items():
+        if isinstance(dtype, CategoricalDtype) and colonne in df.columns:
+            df[colonne] = df[colonne].astype(dtype)
+    return df
+
+
+def lire_csv(chemin: str) -> pd.DataFrame:
+    colonnes = pd.read_csv(chemin, encoding='utf-8', nrows=0).columns
+    df = pd.read_csv(chemin, encoding='utf-8', dtype=dtypes_lecture(list(colonnes)))
+    df.columns = df.columns.str.strip()
+
+    manquantes = [colonne for colonne in COLONNES_OBLIGATOIRES if colonne not in df.columns]
+    if manquantes:
+        raise ValueError(f"Colonnes manquantes dans {chemin} : {', '.join(manquantes)}")
+    return df
+
+
+def avertir_anomalies(chemin: str, anomalies: pd.DataFrame):
+    if len(anomalies) > 0:
+        detail = '; '.join(f"{a.Colonne} {a.Anomalie} ({a.Nombre})" for a in anomalies.itertuples())
+        warnings.warn(f"{chemin} : {detail}", AvertissementDonnees, stacklevel=3)
+
+
+# Cache binaire : un dossier à côté du CSV contenant des versions complètes
+# (un fichier .npy par colonne, ouvert en mémoire mappée copie-sur-écriture, et
+# un meta.json avec la signature du CSV) et un fichier « courant » qui désigne
+# la version à lire. Une nouvelle version est écrite sous un nom unique puis
+# publiée en remplaçant « courant » (os.replace, atomique) : un lecteur voit
+# l'ancienne ou la nouvelle version, jamais un dossier incomplet
+
+FICHIER_COURANT = 'courant'
+PREFIXE_VERSION = 'v_'
+PREFIXE_TEMPORAIRE = '.tmp_'
+# Versions remplacées conservées ce délai (s) pour les lecteurs en cours ;
+# écritures inachevées supprimées après le second (écrivain interrompu)
+DELAI_VERSIONS_OBSOLETES = 60
+DELAI_ECRITURES_ABANDONNEES = 3600
+
+
+def dossier_cache(chemin: str) -> str:
+    dossier, nom = os.path.split(os.path.abspath(chemin))
+    return os.path.join(dossier, f'.{nom}.cache')
+
+
+def empreinte_fichier(chemin: str) -> str:
+    sha = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(1 << 20), b''):
+            sha.update(bloc)
+    return sha.hexdigest()
+
+
+def ecrire_atomique(chemin: str, contenu: str):
+    temporaire = f'{chemin}.{os.getpid()}.tmp'
+    try:
+        with open(temporaire, 'w', encoding='utf-8') as f:
+            f.write(contenu)
+        os.replace(temporaire, chemin)
+    finally:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+
+
+def lire_meta_cache(chemin: str) -> Optional[Dict]:
+    # meta['dossier'] : dossier de la version courante (non enregistré)
+    racine = dossier_cache(chemin)
+    try:
+        with open(os.path.join(racine, FICHIER_COURANT), encoding='utf-8') as f:
+            version = f.read().strip()
+        with open(os.path.join(racine, version, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != VERSION_CACHE:
+        return None
+    meta['dossier'] = os.path.join(racine, version)
+    return meta
+
+
+def cache_valide(chemin: str, meta: Optional[Dict]) -> bool:
+    # Taille + date de modification ; si seule la date diffère, l'empreinte
+    # SHA-256 du contenu tranche (fichier recopié ou simplement « touché »)
+    if meta is None:
+        return False
+    stat = os.stat(chemin)
+    if stat.st_size != meta['taille']:
+        return False
+    if stat.st_mtime_ns == meta['mtime_ns']:
+        return True
+    return empreinte_fichier(chemin) == meta['sha256']
+
+
+def rafraichir_meta_cache(chemin: str, meta: Dict):
+    # Contenu identique mais date différente : on mémorise la nouvelle date
+    # pour éviter de recalculer l'empreinte aux chargements suivants
+    mtime_ns = os.stat(chemin).st_mtime_ns
+    if meta['mtime_ns'] == mtime_ns:
+        return
+    meta['mtime_ns'] = mtime_ns
+    contenu = {cle: valeur for cle, valeur in meta.items() if cle != 'dossier'}
+    try:
+        ecrire_atomique(os.path.join(meta['dossier'], 'meta.json'), json.dumps(contenu, ensure_ascii=False))
+    except OSError:
+        pass
+
+
+def nettoyer_cache(racine: str, courante: str):
+    # Versions remplacées et écritures abandonnées, une fois le délai écoulé ;
+    # les fichiers encore projetés en mémoire restent lisibles (POSIX)
+    maintenant = time.time()
+    for nom in os.listdir(racine):
+        chemin_version = os.path.join(racine, nom)
+        if nom == courante or not os.path.isdir(chemin_version):
+            continue
+        if nom.startswith(PREFIXE_VERSION):
+            delai = DELAI_VERSIONS_OBSOLETES
+        elif nom.startswith(PREFIXE_TEMPORAIRE):
+            delai = DELAI_ECRITURES_ABANDONNEES
+        else:
+            continue
+        try:
+            if os.stat(chemin_version).st_mtime < maintenant - delai:
+                shutil.rmtree(chemin_version)
+        except OSError:
+            pass
+
+
+def ecrire_cache(chemin: str, df: pd.DataFrame, anomalies: pd.DataFrame):
+    stat = os.stat(chemin)
+    meta = {
+        'version': VERSION_CACHE,
+        'taille': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': empreinte_fichier(chemin),
+        'nb_lignes': len(df),
+        'colonnes': [],
+        'anomalies': anomalies.to_dict(orient='records')
+    }
+
+    racine = dossier_cache(chemin)
+    temporaire = None
+    try:
+        os.makedirs(racine, exist_ok=True)
+        temporaire = tempfile.mkdtemp(prefix=PREFIXE_TEMPORAIRE, dir=racine)
+        for i, (nom, serie) in enumerate(df.items()):
+            base = os.path.join(temporaire, f'colonne_{i}')
+            description = {'nom': nom, 'dtype': str(serie.dtype)}
+
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                description['type'] = 'categorie'
+                description['categories'] = [str(c) for c in serie.cat.categories]
+                description['ordonne'] = bool(serie.cat.ordered)
+                np.save(base + '_codes.npy', serie.cat.codes.to_numpy())
+            elif isinstance(serie.dtype, pd.api.extensions.ExtensionDtype) and serie.dtype.kind in 'iu':
+                description['type'] = 'entier_nullable'
+                np.save(base + '_valeurs.npy', serie.to_numpy(dtype=serie.dtype.numpy_dtype, na_value=0))
+                np.save(base + '_masque.npy', serie.isna().to_numpy())
+            elif serie.dtype.kind in 'biuf':
+                description['type'] = 'numerique'
+                np.save(base + '_valeurs.npy', serie.to_numpy())
+            else:
+                # Textes : codes (-1 = manquant) + valeurs distinctes en octets
+                # UTF-8 concaténés avec leurs positions de début/fin
+                description['type'] = 'texte'
+                codes, distincts = pd.factorize(serie)
+                encodes = [str(v).encode('utf-8') for v in distincts]
+                positions = np.zeros(len(encodes) + 1, dtype=np.int64)
+                np.cumsum([len(e) for e in encodes], out=positions[1:])
+                np.save(base + '_codes.npy', codes.astype(np.int32 if len(encodes) < 2 ** 31 else np.int64))
+                np.save(base + '_octets.npy', np.frombuffer(b''.join(encodes), dtype=np.uint8))
+                np.save(base + '_positions.npy', positions)
+
+            meta['colonnes'].append(description)
+
+        with open(os.path.join(temporaire, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        # Version complète renommée sous un nom unique, puis publiée
+        version = PREFIXE_VERSION + os.path.basename(temporaire)[len(PREFIXE_TEMPORAIRE):]
+        os.rename(temporaire, os.path.join(racine, version))
+        temporaire = None
+        ecrire_atomique(os.path.join(racine, FICHIER_COURANT), version)
+        nettoyer_cache(racine, version)
+    except OSError as e:
+        if temporaire is not None:
+            shutil.rmtree(temporaire, ignore_errors=True)
+        warnings.warn(f"Cache binaire non écrit pour {chemin} : {e}", AvertissementDonnees, stacklevel=3)
+
+
+def lire_cache(meta: Dict) -> pd.DataFrame:
+    # Copie-sur-écriture : le DataFrame reste modifiable, seules les pages
+    # modifiées sont copiées en mémoire et les fichiers ne changent jamais
+    dossier = meta['dossier']
+    colonnes = {}
+
+    for i, description in enumerate(meta['colonnes']):
+        base = os.path.join(dossier, f'colonne_{i}')
+        genre = description['type']
+
+        if genre == 'categorie':
+            codes = np.load(base + '_codes.npy', mmap_mode='c')
+            colonnes[description['nom']] = pd.Categorical.from_codes(
+                codes, categories=description['categories'], ordered=description['ordonne']
+            )
+        elif genre == 'entier_nullable':
+            valeurs = np.load(base + '_valeurs.npy', mmap_mode='c')
+            masque = np.load(base + '_masque.npy', mmap_mode='c')
+            colonnes[description['nom']] = pd.arrays.IntegerArray(np.array(valeurs), np.array(masque))
+        elif genre == 'numerique':
+            colonnes[description['nom']] = np.load(base + '_valeurs.npy', mmap_mode='c')
+        else:
+            codes = np.load(base + '_codes.npy', mmap_mode='c')
+            octets = np.load(base + '_octets.npy', mmap_mode='c').tobytes()
+            positions = np.load(base + '_positions.npy').tolist()
+            distincts = np.empty(len(positions), dtype=object)
+            distincts[:-1] = [octets[debut:fin].decode('utf-8')
+                              for debut, fin in zip(positions[:-1], positions[1:])]
+            distincts[-1] = None
+            colonnes[description['nom']] = pd.array(distincts[codes], dtype=description['dtype'])
+
+    return pd.DataFrame(colonnes, copy=False)
+
+
+def charger_base(chemin: str = CHEMIN_BASE, valider: bool = True,
+                 utiliser_cache: bool = True) -> pd.DataFrame:
+    if utiliser_cache:
+        meta = lire_meta_cache(chemin)
+        if cache_valide(chemin, meta):
+            rafraichir_meta_cache(chemin, meta)
+            try:
+                df = lire_cache(meta)
+            except (OSError, ValueError):
+                # Version retirée entre la lecture de « courant » et celle des
+                # colonnes : relecture du CSV
+                df = None
+            if df is not None:
+                if valider:
+                    avertir_anomalies(chemin, pd.DataFrame(meta['anomalies'],
+                                                           columns=['Colonne', 'Anomalie', 'Nombre']))
+                return df
+
+    df = lire_csv(chemin)
+    anomalies = valider_base(df)
+    if valider:
+        avertir_anomalies(chemin, anomalies)
+
+    df = appliquer_schema(df)
+    # Listes d'additifs analysées une fois : un bit par groupe (additifs.GROUPES_ADDITIFS)
+    df['Masque_Additifs'] = masques_additifs(df['Liste_Additifs'])
+    if utiliser_cache:
+        ecrire_cache(chemin, df, anomalies)
+    return df
@@ -0,0 +1,169 @@
+"""
+Classification ELECTRE TRI multi-processus - SuperNutriScore
+
+Les valeurs des critères sont copiées une fois dans un segment de mémoire
+partagée ; chaque processus classe des tranches de lignes et écrit les codes
+de classe dans un tableau de sortie partagé. Seuls les bornes des tranches
+transitent entre processus, jamais de DataFrame.
+"""
+
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, util
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from supernutriscore import ElectreTri
+
+TAILLE_TRANCHE = 200_000
+
+_etat_processus: Dict = {}
+
+
+def tableau_partage(forme: Tuple[int, ...], dtype) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    # Segment créé par le processus parent, seul responsable de sa destruction
+    taille = max(1, int(np.prod(forme)) * np.dtype(dtype).itemsize)
+    memoire = shared_memory.SharedMemory(create=True, size=taille)
+    return memoire, np.ndarray(forme, dtype=dtype, buffer=memoire.buf)
+
+
+def classer_tranche(electre: ElectreTri, valeurs: np.ndarray, codes: np.ndarray, methodes: List[str],
+                    debut: int, fin: int, table: Optional[np.ndarray] = None,
+                    indices: Optional[np.ndarray] = None):
+    # Les deux procédures partagent les mêmes surclassements
+    profils = None if table is None else table[indices[debut:fin]]
+    avec_ba = any(methode != 'pessimiste' for methode in methodes)
+    S_ab, S_ba = electre.surclassements(valeurs[debut:fin], avec_ba=avec_ba, profils=profils)
+    for j, methode in enumerate(methodes):
+        codes[debut:fin, j] = electre.codes_depuis_surclassements(S_ab, S_ba, methode)
+
+
+def _initialiser_processus(electre: ElectreTri, segments: Dict[str, Tuple[str, Tuple[int, ...], str]],
+                           methodes: List[str], table: Optional[np.ndarray]):
+    memoires, tableaux = [], {}
+    for nom, (segment, forme, dtype) in segments.items():
+        memoire = shared_memory.SharedMemory(name=segment)
+        memoires.append(memoire)
+        tableaux[nom] = np.ndarray(forme, dtype=dtype, buffer=memoire.buf)
+    _etat_processus.update(electre=electre, memoires=memoires, methodes=methodes, table=table, **tableaux)
+    # Les processus du pool sortent par os._exit : seuls les finaliseurs de
+    # multiprocessing (pas atexit) s'exécutent à leur arrêt
+    util.Finalize(None, _fermer_segments, exitpriority=10)
+
+
+def _fermer_segments():
+    # Vues numpy abandonnées avant la fermeture des segments du processus
+    memoires = _etat_processus.pop('memoires', [])
+    _etat_processus.clear()
+    for memoire in memoires:
+        memoire.close()
+
+
+def _classer_tranche(debut: int, fin: int):
+    classer_tranche(_etat_processus['electre'], _etat_processus['valeurs'], _etat_processus['codes'],
+                    _etat_processus['methodes'], debut, fin, _etat_processus['table'],
+                    _etat_processus.get('indices'))
+
+
+def classifier_parallele(electre: ElectreTri, df: pd.DataFrame,
+                         methodes: Tuple[str, ...] = ('pessimiste', 'optimiste'),
+                         nb_processus: Optional[int] = None, taille_tranche: int = TAILLE_TRANCHE,
+                         profils_categories: Optional[pd.DataFrame] = None,
+                         colonne: str = 'Categorie') -> pd.DataFrame:
+    # Une colonne Classe_ELECTRE_{Methode} par procédure, identique à
+    # classifier_deux_procedures (ElectreTri ou ElectreTriComplet, profils
+    # globaux ou par catégorie)
+    methodes = list(methodes)
+    criteres = list(electre.poids.keys())
+    n = len(df)
+    if nb_processus is None:
+        nb_processus = os.cpu_count() or 1
+    table = indices = None
+    if profils_categories is not None:
+        table, indices = electre.profils_par_produit(df, profils_categories, colonne)
+    tranches = [(debut, min(debut + taille_tranche, n)) for debut in range(0, n, taille_tranche)]
+
+    # Instance envoyée aux processus sans les comparaisons préparées éventuelles
+    electre = copy.copy(electre)
+    electre.comparaisons = None
+
+    if nb_processus <= 1 or len(tranches) <= 1:
+        valeurs = electre.valeurs_criteres(df)
+        codes = np.empty((n, len(methodes)), dtype=np.int8)
+        for debut, fin in tranches:
+            classer_tranche(electre, valeurs, codes, methodes, debut, fin, table, indices)
+        return pd.DataFrame({f'Classe_ELECTRE_{methode.capitalize()}': ElectreTri.CLASSES[codes[:, j]]
+                             for j, methode in enumerate(methodes)}, index=df.index)
+
+    memoires = []
+    try:
+        # Critères copiés colonne par colonne, sans tableau intermédiaire
+        memoire, valeurs = tableau_partage((n, len(criteres)), np.float64)
+        memoires.append(memoire)
+        for k, critere in enumerate(criteres):
+            valeurs[:, k] = df[critere].to_numpy(dtype=float, na_value=np.nan)
+        memoire, codes = tableau_partage((n, len(methodes)), np.int8)
+        memoires.append(memoire)
+        segments = {'valeurs': (memoires[0].name, valeurs.shape, valeurs.dtype.str),
+                    'codes': (memoires[1].name, codes.shape, codes.dtype.str)}
+        if indices is not None:
+            memoire, partage = tableau_partage(indices.shape, indices.dtype)
+            memoires.append(memoire)
+            partage[:] = indices
+            segments['indices'] = (memoire.name, partage.shape, partage.dtype.str)
+
+        with ProcessPoolExecutor(nb_processus, initializer=_initialiser_processus,
+                                 initargs=(electre, segments, methodes, table)) as executeur:
+            debuts, fins = zip(*tranches)
+            for _ in executeur.map(_classer_tranche, debuts, fins):
+                pass
+
+        resultats = pd.DataFrame({f'Classe_ELECTRE_{methode.capitalize()}': ElectreTri.CLASSES[codes[:, j]]
+                                  for j, methode in enumerate(methodes)}, index=df.index)
+    finally:
+        # Les vues numpy doivent disparaître avant la fermeture des segments
+        valeurs = codes = partage = None
+        for memoire in memoires:
+            memoire.close()
+            memoire.unlink()
+    return resultats
+
+
+def main():
+    import argparse
+    import time
+    from chargement_donnees import CHEMIN_BASE, charger_base
+    from supernutriscore import creer_profils_categories, creer_profils_limites, definir_poids_criteres
+
+    parser = argparse.ArgumentParser(description="Classification ELECTRE TRI répartie sur plusieurs processus")
+    parser.add_argument('entree', nargs='?', default=CHEMIN_BASE)
+    parser.add_argument('--sortie', help="Fichier CSV des classes")
+    parser.add_argument('--processus', type=int, default=None)
+    parser.add_argument('--taille-tranche', type=int, default=TAILLE_TRANCHE)
+    parser.add_argument('--lambda', dest='lambda_seuil', type=float, default=0.6)
+    parser.add_argument('--par-categorie', action='store_true',
+                        help="Profils propres à chaque catégorie (profils globaux pour les petites)")
+    args = parser.parse_args()
+
+    df = charger_base(args.entree)
+    electre = ElectreTri(definir_poids_criteres(), creer_profils_limites(df), lambda_seuil=args.lambda_seuil)
+    profils_categories = creer_profils_categories(df) if args.par_categorie else None
+
+    debut = time.perf_counter()
+    resultats = classifier_parallele(electre, df, nb_processus=args.processus,
+                                     taille_tranche=args.taille_tranche,
+                                     profils_categories=profils_categories)
+    duree = time.perf_counter() - debut
+    print(f"[OK] {len(df)} produits classés en {duree:.1f} s ({len(df) / max(duree, 1e-9):,.0f} produits/s)")
+    for colonne in resultats.columns:
+        print()
+        print(resultats[colonne].value_counts().sort_index().to_string())
+    if args.sortie:
+        pd.concat([df[['Nom_Produit']], resultats], axis=1).to_csv(args.sortie, index=False)
+        print(f"[OK] Classes écrites dans {args.sortie}")
+
+
+if __name__ == "__main__":
+    main()
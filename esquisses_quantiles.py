@@ -0,0 +1,161 @@
+"""
+Esquisses de quantiles fusionnables - SuperNutriScore
+
+Esquisse KLL (Karnin, Lang, Liberty) : mémoire en O(k), erreur de rang
+bornée, fusion par addition. Sert à construire les profils limites b1..b6
+à partir de données lues par blocs ou réparties sur plusieurs machines.
+"""
+
+import math
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional
+
+from supernutriscore import CRITERES, QUANTILES_PROFILS, profils_depuis_quantiles
+
+
+class EsquisseKLL:
+    # Compacteurs par niveau : un élément du niveau h représente 2**h valeurs.
+    # Tant que rien n'a été compacté, les quantiles sont exacts (interpolation
+    # linéaire, comme pandas)
+
+    FACTEUR_CAPACITE = 2 / 3
+    CAPACITE_MIN = 2
+
+    def __init__(self, erreur: float = 0.01, graine: Optional[int] = None):
+        if not 0 < erreur < 1:
+            raise ValueError(f"Erreur de rang invalide : {erreur}")
+        self.erreur = erreur
+        # Erreur de rang normalisée d'une esquisse KLL ≈ 2.296 / k**0.9723
+        # (ajustement empirique publié avec Apache DataSketches)
+        self.k = max(8, math.ceil((2.296 / erreur) ** (1 / 0.9723)))
+        self.n = 0
+        self.compacteurs: List[np.ndarray] = [np.empty(0)]
+        self.rng = np.random.default_rng(graine)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __repr__(self) -> str:
+        return f"EsquisseKLL(n={self.n}, k={self.k}, stockes={self.nb_stockes()})"
+
+    def nb_stockes(self) -> int:
+        return sum(len(c) for c in self.compacteurs)
+
+    def capacite(self, niveau: int) -> int:
+        profondeur = len(self.compacteurs) - 1 - niveau
+        return max(self.CAPACITE_MIN, math.ceil(self.k * self.FACTEUR_CAPACITE ** profondeur))
+
+    def compresser(self):
+        niveau = 0
+        while niveau < len(self.compacteurs):
+            compacteur = self.compacteurs[niveau]
+            if len(compacteur) <= self.capacite(niveau):
+                niveau += 1
+                continue
+            if niveau + 1 == len(self.compacteurs):
+                self.compacteurs.append(np.empty(0))
+
+            # Une valeur sur deux (décalage aléatoire) monte d'un niveau ;
+            # avec un nombre impair, la plus grande reste sur place
+            trie = np.sort(compacteur)
+            pair = len(trie) - len(trie) % 2
+            promus = trie[self.rng.integers(2):pair:2]
+            self.compacteurs[niveau] = trie[pair:]
+            self.compacteurs[niveau + 1] = np.concatenate([self.compacteurs[niveau + 1], promus])
+            # L'ajout d'un niveau réduit la capacité des niveaux inférieurs
+            niveau = 0
+
+    def mettre_a_jour(self, valeurs) -> 'EsquisseKLL':
+        valeurs = np.asarray(valeurs, dtype=float).ravel()
+        valeurs = valeurs[~np.isnan(valeurs)]
+        self.n += len(valeurs)
+        self.compacteurs[0] = np.concatenate([self.compacteurs[0], valeurs])
+        self.compresser()
+        return self
+
+    def __add__(self, autre: 'EsquisseKLL') -> 'EsquisseKLL':
+        if not isinstance(autre, EsquisseKLL):
+            return NotImplemented
+        if autre.k != self.k:
+            raise ValueError(f"Esquisses de précisions différentes (k={self.k} et k={autre.k})")
+        fusion = EsquisseKLL(self.erreur)
+        fusion.rng = np.random.default_rng(self.rng.integers(2 ** 63))
+        fusion.n = self.n + autre.n
+        hauteur = max(len(self.compacteurs), len(autre.compacteurs))
+        vide = np.empty(0)
+        fusion.compacteurs = [
+            np.concatenate([
+                self.compacteurs[h] if h < len(self.compacteurs) else vide,
+                autre.compacteurs[h] if h < len(autre.compacteurs) else vide
+            ])
+            for h in range(hauteur)
+        ]
+        fusion.compresser()
+        return fusion
+
+    def __radd__(self, autre) -> 'EsquisseKLL':
+        # Permet sum(esquisses)
+        if autre == 0:
+            return self
+        return self.__add__(autre)
+
+    def quantiles(self, q) -> np.ndarray:
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        if self.n == 0:
+            return np.full(len(q), np.nan)
+        if len(self.compacteurs) == 1:
+            return np.quantile(self.compacteurs[0], q)
+
+        valeurs = np.concatenate(self.compacteurs)
+        poids = np.concatenate([np.full(len(c), 2 ** h, dtype=np.int64)
+                                for h, c in enumerate(self.compacteurs)])
+        ordre = np.argsort(valeurs, kind='stable')
+        cumul = np.cumsum(poids[ordre])
+        rangs = np.searchsorted(cumul, q * (cumul[-1] - 1), side='right')
+        return valeurs[ordre][np.minimum(rangs, len(valeurs) - 1)]
+
+
+class EsquissesProfils:
+    # Une esquisse par critère ; fusionnables par addition entre blocs ou machines
+
+    def __init__(self, erreur: float = 0.01, criteres: Optional[List[str]] = None,
+                 graine: Optional[int] = None):
+        criteres = CRITERES if criteres is None else criteres
+        self.esquisses: Dict[str, EsquisseKLL] = {
+            critere: EsquisseKLL(erreur, graine) for critere in criteres
+        }
+
+    def mettre_a_jour(self, bloc: pd.DataFrame) -> 'EsquissesProfils':
+        for critere, esquisse in self.esquisses.items():
+            esquisse.mettre_a_jour(bloc[critere].to_numpy(dtype=float, na_value=np.nan))
+        return self
+
+    def __add__(self, autre: 'EsquissesProfils') -> 'EsquissesProfils':
+        if not isinstance(autre, EsquissesProfils):
+            return NotImplemented
+        fusion = EsquissesProfils.__new__(EsquissesProfils)
+        fusion.esquisses = {critere: esquisse + autre.esquisses[critere]
+                            for critere, esquisse in self.esquisses.items()}
+        return fusion
+
+    def __radd__(self, autre) -> 'EsquissesProfils':
+        if autre == 0:
+            return self
+        return self.__add__(autre)
+
+    def quantiles(self, quantiles: List[float] = QUANTILES_PROFILS) -> pd.DataFrame:
+        return pd.DataFrame({critere: esquisse.quantiles(quantiles)
+                             for critere, esquisse in self.esquisses.items()}, index=quantiles)
+
+    def profils(self) -> pd.DataFrame:
+        return profils_depuis_quantiles(self.quantiles())
+
+
+def creer_profils_limites_flux(blocs: Iterable[pd.DataFrame], erreur: float = 0.01,
+                               graine: Optional[int] = None) -> pd.DataFrame:
+    # Profils b1..b6 en une passe sur des blocs, sans matérialiser la base
+    esquisses = EsquissesProfils(erreur, graine=graine)
+    for bloc in blocs:
+        esquisses.mettre_a_jour(bloc)
+    return esquisses.profils()
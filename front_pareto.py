@@ -0,0 +1,226 @@
+"""
+Fronts de Pareto - SuperNutriScore
+
+Tri non dominé des produits sur les critères d'ElectreTri (à minimiser /
+à maximiser) : couche 1 = produits qu'aucun autre ne domine, couche 2 =
+non dominés une fois la couche 1 retirée, etc. Tri non dominé par
+dichotomie sur les critères (Jensen / Fortin), sur les vecteurs de
+critères distincts.
+"""
+
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+
+from supernutriscore import CRITERES_MAXIMISER, CRITERES_MINIMISER
+
+
+def valeurs_orientees(df: pd.DataFrame, criteres_minimiser: Optional[List[str]] = None,
+                      criteres_maximiser: Optional[List[str]] = None) -> np.ndarray:
+    # Tous les critères à minimiser (critères à maximiser changés de signe) ;
+    # une valeur manquante compte comme la pire possible
+    criteres_minimiser = CRITERES_MINIMISER if criteres_minimiser is None else criteres_minimiser
+    criteres_maximiser = CRITERES_MAXIMISER if criteres_maximiser is None else criteres_maximiser
+    valeurs = np.hstack([
+        df[criteres_minimiser].to_numpy(dtype=float, na_value=np.nan),
+        -df[criteres_maximiser].to_numpy(dtype=float, na_value=np.nan)
+    ])
+    valeurs[np.isnan(valeurs)] = np.inf
+    return valeurs
+
+
+# Couples (dominant potentiel, dominé potentiel) en deçà desquels un
+# sous-problème est résolu par comparaison directe
+SEUIL_COMPARAISON_DIRECTE = 2 ** 17
+
+
+def dominations_directes(valeurs: np.ndarray, domines: np.ndarray, dominants: np.ndarray,
+                         critere: int) -> np.ndarray:
+    # (dominés, dominants) : valeurs[dominant] <= valeurs[dominé] sur les
+    # critères 0..critere (les suivants sont déjà acquis)
+    a = valeurs[domines, :critere + 1].T.copy()
+    b = valeurs[dominants, :critere + 1].T.copy()
+    resultat = b[0, np.newaxis, :] <= a[0, :, np.newaxis]
+    comparaison = np.empty_like(resultat)
+    for k in range(1, critere + 1):
+        np.less_equal(b[k, np.newaxis, :], a[k, :, np.newaxis], out=comparaison)
+        resultat &= comparaison
+    return resultat
+
+
+def pivot(valeurs: np.ndarray) -> float:
+    # Médiane (valeur présente) ; la valeur distincte précédente si la médiane est
+    # le maximum, pour que les deux moitiés soient non vides
+    milieu = np.partition(valeurs, len(valeurs) // 2)[len(valeurs) // 2]
+    if milieu == valeurs.max():
+        milieu = valeurs[valeurs < milieu].max()
+    return milieu
+
+
+def trier_ensemble(valeurs: np.ndarray, rangs: np.ndarray, ensemble: np.ndarray, critere: int):
+    # Rangs définitifs des lignes de l'ensemble (positions croissantes, donc
+    # ordre lexicographique), rangs déjà minorés par tous leurs dominants extérieurs.
+    # Les critères au-delà de critere sont constants sur l'ensemble
+    if len(ensemble) < 2:
+        return
+    if len(ensemble) ** 2 <= SEUIL_COMPARAISON_DIRECTE:
+        # Lignes distinctes : i domine j si i <= j partout, i ≠ j ; plus long chemin
+        domine = dominations_directes(valeurs, ensemble, ensemble, critere)
+        np.fill_diagonal(domine, False)
+        minimum = rangs[ensemble]
+        courants = minimum
+        while True:
+            propages = np.maximum(minimum, np.where(domine, courants[np.newaxis, :] + 1, 0).max(axis=1))
+            if np.array_equal(propages, courants):
+                break
+            courants = propages
+        rangs[ensemble] = courants
+        return
+    if critere == 0:
+        # Lignes distinctes ne différant que par le premier critère : une chaîne
+        decalages = np.arange(len(ensemble))
+        rangs[ensemble] = decalages + np.maximum.accumulate(rangs[ensemble] - decalages)
+        return
+
+    colonne = valeurs[ensemble, critere]
+    if colonne.min() == colonne.max():
+        trier_ensemble(valeurs, rangs, ensemble, critere - 1)
+        return
+    seuil = pivot(colonne)
+    bas, haut = ensemble[colonne <= seuil], ensemble[colonne > seuil]
+    trier_ensemble(valeurs, rangs, bas, critere)
+    propager_rangs(valeurs, rangs, bas, haut, critere - 1)
+    trier_ensemble(valeurs, rangs, haut, critere)
+
+
+def propager_rangs(valeurs: np.ndarray, rangs: np.ndarray, dominants: np.ndarray,
+                   domines: np.ndarray, critere: int):
+    # Rangs des dominés relevés d'après les dominants (rangs définitifs), sachant
+    # dominants <= dominés sur les critères au-delà de critere
+    if len(dominants) == 0 or len(domines) == 0:
+        return
+    # Les rangs ne font que croître : inutile d'examiner un dominé déjà au-dessus
+    # de tous les dominants, ou un dominant trop bas pour relever un dominé
+    rangs_dominants = rangs[dominants]
+    domines = domines[rangs[domines] <= rangs_dominants.max()]
+    if len(domines) == 0:
+        return
+    dominants = dominants[rangs_dominants >= rangs[domines].min()]
+    if len(dominants) * len(domines) <= SEUIL_COMPARAISON_DIRECTE:
+        # Dominants par rang décroissant : le premier trouvé donne le plus haut
+        dominants = dominants[np.argsort(-rangs[dominants], kind='stable')]
+        domine = dominations_directes(valeurs, domines, dominants, critere)
+        premiers = domine.argmax(axis=1)
+        trouves = domine[np.arange(len(domines)), premiers]
+        candidats = np.where(trouves, rangs[dominants[premiers]] + 1, 0)
+        rangs[domines] = np.maximum(rangs[domines], candidats)
+        return
+    if critere == 0:
+        # Premier critère seul : plus haut rang parmi les dominants de valeur <=
+        ordre = np.argsort(valeurs[dominants, 0], kind='stable')
+        cles = valeurs[dominants[ordre], 0]
+        maximums = np.maximum.accumulate(rangs[dominants[ordre]])
+        positions = np.searchsorted(cles, valeurs[domines, 0], side='right')
+        candidats = np.where(positions > 0, maximums[np.maximum(positions - 1, 0)] + 1, 0)
+        rangs[domines] = np.maximum(rangs[domines], candidats)
+        return
+
+    colonne_dominants = valeurs[dominants, critere]
+    colonne_domines = valeurs[domines, critere]
+    if colonne_dominants.min() > colonne_domines.max():
+        return
+    if colonne_dominants.max() <= colonne_domines.min():
+        propager_rangs(valeurs, rangs, dominants, domines, critere - 1)
+        return
+    seuil = pivot(np.concatenate([colonne_dominants, colonne_domines]))
+    dominants_bas, dominants_haut = dominants[colonne_dominants <= seuil], dominants[colonne_dominants > seuil]
+    domines_bas, domines_haut = domines[colonne_domines <= seuil], domines[colonne_domines > seuil]
+    propager_rangs(valeurs, rangs, dominants_bas, domines_bas, critere)
+    propager_rangs(valeurs, rangs, dominants_bas, domines_haut, critere - 1)
+    propager_rangs(valeurs, rangs, dominants_haut, domines_haut, critere)
+
+
+# Lignes examinées ensemble, et non dominés déjà trouvés comparés à la fois,
+# lors de l'extraction de la première couche ; au-delà de ce nombre moyen de
+# comparaisons par ligne (première couche très grande, coût quadratique),
+# l'extraction est abandonnée
+BLOC_PREMIERE_COUCHE = 2048
+PAQUET_PREMIERE_COUCHE = 512
+COMPARAISONS_PREMIERE_COUCHE = 2048
+
+
+def premiere_couche(codes: np.ndarray) -> Optional[np.ndarray]:
+    # Positions des lignes distinctes qu'aucune autre ne domine (None si
+    # abandon). Par somme croissante, un dominant passe toujours avant ses
+    # dominés : chaque bloc est comparé aux non dominés déjà trouvés (les plus
+    # forts d'abord, une ligne écartée dès qu'un la domine) puis à lui-même
+    critere = codes.shape[1] - 1
+    ordre = np.argsort(codes.sum(axis=1, dtype=np.int64), kind='stable')
+    non_domines = np.empty(0, dtype=np.intp)
+    budget = COMPARAISONS_PREMIERE_COUCHE * len(codes)
+    for debut in range(0, len(ordre), BLOC_PREMIERE_COUCHE):
+        candidats = ordre[debut:debut + BLOC_PREMIERE_COUCHE]
+        for paquet in range(0, len(non_domines), PAQUET_PREMIERE_COUCHE):
+            if len(candidats) == 0:
+                break
+            dominants = non_domines[paquet:paquet + PAQUET_PREMIERE_COUCHE]
+            budget -= len(candidats) * len(dominants)
+            if budget < 0:
+                return None
+            candidats = candidats[~dominations_directes(codes, candidats, dominants, critere).any(axis=1)]
+        domine = dominations_directes(codes, candidats, candidats, critere)
+        np.fill_diagonal(domine, False)
+        non_domines = np.concatenate([non_domines, candidats[~domine.any(axis=1)]])
+    return non_domines
+
+
+def couches_pareto(valeurs: np.ndarray) -> np.ndarray:
+    # Couche (1 = non dominé) de chaque ligne, tous critères à minimiser.
+    # Les lignes identiques partagent la même couche et ne sont classées qu'une
+    # fois. La couche de x vaut 1 + la plus haute couche de ses dominants :
+    # tri non dominé par dichotomie sur les critères (Jensen, généralisé aux
+    # égalités par Fortin et al.), en O(n log^(m-1) n) comparaisons ; les
+    # sous-problèmes assez petits sont comparés directement. La première couche,
+    # isolée au préalable en O(n) comparaisons au plus, n'y entre pas
+    if len(valeurs) == 0:
+        return np.empty(0, dtype=np.int64)
+    # Lignes distinctes triées (np.lexsort, bien plus rapide que np.unique(axis=0))
+    ordre = np.lexsort(valeurs.T[::-1])
+    triees = valeurs[ordre]
+    nouvelles = np.concatenate([[True], (triees[1:] != triees[:-1]).any(axis=1)])
+    distinctes = np.ascontiguousarray(triees[nouvelles])
+    inverse = np.empty(len(valeurs), dtype=np.intp)
+    inverse[ordre] = np.cumsum(nouvelles) - 1
+
+    # Seul l'ordre compte : chaque critère remplacé par le rang de sa valeur,
+    # dans le plus petit type entier possible (comparaisons moins coûteuses)
+    colonnes = [np.unique(colonne, return_inverse=True) for colonne in distinctes.T]
+    type_codes = np.min_scalar_type(max(len(niveaux) for niveaux, _ in colonnes))
+    codes = np.column_stack([inverses.astype(type_codes) for _, inverses in colonnes])
+
+    # Première couche extraite à part si elle est peu coûteuse à isoler ; les
+    # couches suivantes sont alors celles du reste, décalées d'un rang
+    rangs = np.zeros(len(distinctes), dtype=np.int64)
+    non_domines = premiere_couche(codes)
+    if non_domines is None:
+        trier_ensemble(codes, rangs, np.arange(len(distinctes)), distinctes.shape[1] - 1)
+    else:
+        reste = np.setdiff1d(np.arange(len(distinctes)), non_domines, assume_unique=True)
+        trier_ensemble(codes, rangs, reste, distinctes.shape[1] - 1)
+        rangs[reste] += 1
+    return rangs[inverse] + 1
+
+
+def calculer_couches_pareto(df: pd.DataFrame, criteres_minimiser: Optional[List[str]] = None,
+                            criteres_maximiser: Optional[List[str]] = None,
+                            par_categorie: bool = False, colonne: str = 'Categorie') -> pd.Series:
+    # Couche de Pareto de chaque produit, sur toute la base ou dans sa catégorie
+    valeurs = valeurs_orientees(df, criteres_minimiser, criteres_maximiser)
+    if not par_categorie:
+        couches = couches_pareto(valeurs)
+    else:
+        couches = np.zeros(len(df), dtype=np.int64)
+        for _, positions in df.groupby(colonne, observed=True, sort=False, dropna=False).indices.items():
+            couches[positions] = couches_pareto(valeurs[positions])
+    nom = 'Couche_Pareto_Categorie' if par_categorie else 'Couche_Pareto'
+    return pd.Series(couches, index=df.index, name=nom)
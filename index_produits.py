@@ -0,0 +1,172 @@
+"""
+Index de recherche des produits - SuperNutriScore
+"""
+
+import bisect
+import os
+import pickle
+import unicodedata
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from chargement_donnees import (
+    CHEMIN_BASE, charger_base, lire_meta_cache, cache_valide, normaliser_codes_barres
+)
+
+VERSION_INDEX = 2
+FICHIER_INDEX = 'index_produits.pkl'
+
+
+def normaliser_nom(texte) -> str:
+    # Minuscules, accents retirés, espaces multiples réduits
+    if texte is None or (isinstance(texte, float) and np.isnan(texte)):
+        return ''
+    decompose = unicodedata.normalize('NFKD', str(texte))
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(sans_accents.lower().split())
+
+
+def ngrammes(texte: str, n: int) -> set:
+    return {texte[i:i + n] for i in range(len(texte) - n + 1)}
+
+
+class IndexProduits:
+    # Positions (iloc) des produits : code-barres normalisé -> tableau trié + argsort,
+    # nom normalisé -> positions, n-grammes -> listes de positions triées,
+    # noms triés pour la recherche par préfixe
+
+    TAILLE_NGRAMME = 3
+
+    def __init__(self, codes_tries: np.ndarray, positions_codes: np.ndarray,
+                 noms_normalises: List[str], index_noms: Dict[str, np.ndarray],
+                 index_ngrammes: Dict[str, np.ndarray], noms_tries: List[str],
+                 positions_noms_tries: np.ndarray):
+        self.codes_tries = codes_tries
+        self.positions_codes = positions_codes
+        self.noms_normalises = noms_normalises
+        self.index_noms = index_noms
+        self.index_ngrammes = index_ngrammes
+        self.noms_tries = noms_tries
+        self.positions_noms_tries = positions_noms_tries
+
+    def __len__(self) -> int:
+        return len(self.noms_normalises)
+
+    @classmethod
+    def construire(cls, df: pd.DataFrame) -> 'IndexProduits':
+        codes = normaliser_codes_barres(df['Code_Barres'])
+        positions_codes = np.argsort(codes, kind='stable')
+
+        noms_normalises = [normaliser_nom(nom) for nom in df['Nom_Produit'].to_numpy(dtype=object)]
+
+        index_noms: Dict[str, list] = {}
+        index_ngrammes: Dict[str, list] = {}
+        for position, nom in enumerate(noms_normalises):
+            index_noms.setdefault(nom, []).append(position)
+            for ngramme in ngrammes(nom, cls.TAILLE_NGRAMME):
+                index_ngrammes.setdefault(ngramme, []).append(position)
+
+        ordre_noms = sorted(range(len(noms_normalises)), key=noms_normalises.__getitem__)
+
+        return cls(
+            codes_tries=codes[positions_codes],
+            positions_codes=positions_codes,
+            noms_normalises=noms_normalises,
+            index_noms={nom: np.array(p, dtype=np.int64) for nom, p in index_noms.items()},
+            index_ngrammes={g: np.array(p, dtype=np.int64) for g, p in index_ngrammes.items()},
+            noms_tries=[noms_normalises[i] for i in ordre_noms],
+            positions_noms_tries=np.array(ordre_noms, dtype=np.int64)
+        )
+
+    def positions_codes_barres(self, codes) -> np.ndarray:
+        # Recherche groupée : -1 pour les codes absents, première occurrence sinon
+        # (codes en texte ou en entiers, comparés sous forme normalisée)
+        codes = normaliser_codes_barres(codes)
+        rang = np.searchsorted(self.codes_tries, codes, side='left')
+        rang_borne = np.minimum(rang, len(self.codes_tries) - 1)
+        trouve = ((rang < len(self.codes_tries)) & (self.codes_tries[rang_borne] == codes)
+                  & (codes != ''))
+        return np.where(trouve, self.positions_codes[rang_borne], -1)
+
+    def position_code_barres(self, code) -> Optional[int]:
+        if len(self.codes_tries) == 0:
+            return None
+        position = int(self.positions_codes_barres([code])[0])
+        return position if position >= 0 else None
+
+    def positions_nom(self, nom: str) -> np.ndarray:
+        return self.index_noms.get(normaliser_nom(nom), np.empty(0, dtype=np.int64))
+
+    def rechercher_prefixe(self, prefixe: str) -> np.ndarray:
+        prefixe = normaliser_nom(prefixe)
+        debut = bisect.bisect_left(self.noms_tries, prefixe)
+        fin = bisect.bisect_left(self.noms_tries, prefixe + '\U0010ffff')
+        return np.sort(self.positions_noms_tries[debut:fin])
+
+    def rechercher(self, texte: str) -> np.ndarray:
+        # Sous-chaîne (insensible à la casse et aux accents), positions croissantes
+        requete = normaliser_nom(texte)
+        if len(requete) < self.TAILLE_NGRAMME:
+            return np.array([i for i, nom in enumerate(self.noms_normalises) if requete in nom],
+                            dtype=np.int64)
+
+        listes = []
+        for ngramme in ngrammes(requete, self.TAILLE_NGRAMME):
+            positions = self.index_ngrammes.get(ngramme)
+            if positions is None:
+                return np.empty(0, dtype=np.int64)
+            listes.append(positions)
+
+        listes.sort(key=len)
+        candidats = listes[0]
+        for positions in listes[1:]:
+            candidats = np.intersect1d(candidats, positions, assume_unique=True)
+            if len(candidats) == 0:
+                break
+
+        # Les n-grammes communs ne garantissent pas la contiguïté : vérification finale
+        return np.array([p for p in candidats if requete in self.noms_normalises[p]], dtype=np.int64)
+
+    def sauvegarder(self, chemin: str, signature: str = ''):
+        temporaire = f'{chemin}.{os.getpid()}.tmp'
+        with open(temporaire, 'wb') as f:
+            pickle.dump({'version': VERSION_INDEX, 'signature': signature, 'index': self.__dict__},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporaire, chemin)
+
+    @classmethod
+    def charger(cls, chemin: str, signature: str = '') -> Optional['IndexProduits']:
+        try:
+            with open(chemin, 'rb') as f:
+                contenu = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if contenu.get('version') != VERSION_INDEX or contenu.get('signature') != signature:
+            return None
+        index = cls.__new__(cls)
+        index.__dict__.update(contenu['index'])
+        return index
+
+
+def charger_index(chemin: str = CHEMIN_BASE, df: Optional[pd.DataFrame] = None) -> IndexProduits:
+    # Index construit une fois puis conservé dans la version courante du cache
+    # binaire, associé à l'empreinte du CSV (il disparaît avec elle quand le CSV change)
+    if df is None:
+        df = charger_base(chemin)
+
+    meta = lire_meta_cache(chemin)
+    if not cache_valide(chemin, meta):
+        return IndexProduits.construire(df)
+
+    chemin_index = os.path.join(meta['dossier'], FICHIER_INDEX)
+    index = IndexProduits.charger(chemin_index, meta['sha256'])
+    if index is not None and len(index) == len(df):
+        return index
+
+    index = IndexProduits.construire(df)
+    try:
+        index.sauvegarder(chemin_index, meta['sha256'])
+    except OSError:
+        pass
+    return index
@@ -0,0 +1,309 @@
+"""
+Inférence des paramètres ELECTRE TRI - SuperNutriScore
+
+Recherche des poids, de λ et, au choix, des profils b1..b6 qui reproduisent
+au mieux le Nutri-Score de la base (accuracy ou kappa pondéré) : méthode de
+l'entropie croisée (population gaussienne recentrée sur les meilleurs
+candidats), évaluations réparties sur plusieurs processus, arrêt anticipé.
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+from supernutriscore import (
+    ElectreTri, AnalyseResultats, QUANTILES_PROFILS, creer_profils_limites,
+    definir_poids_criteres, profils_depuis_quantiles
+)
+from robustesse import motifs_comparaisons, tables_seuillees
+
+OBJECTIFS = ('accuracy', 'kappa')
+
+_etat_processus: Dict = {}
+
+
+def sigmoide(x: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-x))
+
+
+def logit(p) -> np.ndarray:
+    p = np.asarray(p, dtype=float)
+    return np.log(p / (1 - p))
+
+
+class ProblemeInference:
+    # Vecteur de paramètres θ : log-poids (un par critère), logit de λ ramené
+    # sur ]0.5, 1[, puis, si les profils sont ajustés, logits des 6 niveaux de
+    # quantile de chaque critère (triés au décodage, donc profils ordonnés)
+
+    def __init__(self, df: pd.DataFrame, poids: Optional[Dict[str, float]] = None,
+                 profils: Optional[pd.DataFrame] = None, ajuster_profils: bool = False,
+                 methode: str = 'pessimiste', objectif: str = 'accuracy', taille_lot: int = 32):
+        if objectif not in OBJECTIFS:
+            raise ValueError(f"Objectif inconnu : {objectif} (attendu : {', '.join(OBJECTIFS)})")
+        poids = definir_poids_criteres() if poids is None else poids
+        self.criteres = list(poids.keys())
+        self.methode = methode
+        self.objectif = objectif
+        self.ajuster_profils = ajuster_profils
+        self.taille_lot = taille_lot
+
+        # Seuls les produits étiquetés A..E comptent dans les matrices de confusion
+        vraies = AnalyseResultats.codes_classes(df['Label_Nutriscore'])
+        valide = vraies >= 0
+        self.vraies = vraies[valide]
+
+        if ajuster_profils:
+            # Profils tirés des quantiles de la base, comme creer_profils_limites
+            valeurs = df[self.criteres].to_numpy(dtype=float, na_value=np.nan)
+            self.colonnes_triees = [np.sort(colonne[~np.isnan(colonne)]) for colonne in valeurs.T]
+            self.valeurs = valeurs[valide]
+            self.profils = None
+        else:
+            # Profils fixes : les comparaisons ne changent pas d'un candidat à
+            # l'autre, seules les paires (motif, vraie classe) distinctes sont classées
+            self.profils = creer_profils_limites(df) if profils is None else profils
+            codes_ab, codes_ba, inverse = motifs_comparaisons(ElectreTri(poids, self.profils), df[valide])
+            nb_classes = len(ElectreTri.CLASSES)
+            paires, effectifs = np.unique(inverse * nb_classes + self.vraies, return_counts=True)
+            self.codes_ab, self.codes_ba = codes_ab, codes_ba
+            self.motifs, self.classes_motifs = np.divmod(paires, nb_classes)
+            self.effectifs = effectifs
+
+    @property
+    def dimension(self) -> int:
+        m = len(self.criteres)
+        return m + 1 + (len(ElectreTri.NOMS_PROFILS) * m if self.ajuster_profils else 0)
+
+    def theta_initial(self, poids: Dict[str, float], lambda_seuil: float = 0.6) -> np.ndarray:
+        reference = np.array([poids[c] for c in self.criteres], dtype=float)
+        theta = [np.log(reference / reference.sum()), logit([2 * lambda_seuil - 1])]
+        if self.ajuster_profils:
+            theta.append(np.repeat(logit(QUANTILES_PROFILS), len(self.criteres)))
+        return np.concatenate(theta)
+
+    def poids_lambdas(self, thetas: np.ndarray):
+        m = len(self.criteres)
+        poids = np.exp(thetas[:, :m] - thetas[:, :m].max(axis=1, keepdims=True))
+        poids /= poids.sum(axis=1, keepdims=True)
+        lambdas = 0.5 + 0.5 * sigmoide(thetas[:, m])
+        return poids, lambdas
+
+    def profils_candidat(self, theta: np.ndarray) -> pd.DataFrame:
+        if not self.ajuster_profils:
+            return self.profils
+        m = len(self.criteres)
+        niveaux = np.sort(sigmoide(theta[m + 1:].reshape(len(ElectreTri.NOMS_PROFILS), m)), axis=0)
+        # Interpolation linéaire entre valeurs triées (celle de DataFrame.quantile)
+        quantiles = np.empty_like(niveaux)
+        for j, colonne in enumerate(self.colonnes_triees):
+            if len(colonne) == 0:
+                quantiles[:, j] = np.nan
+                continue
+            position = niveaux[:, j] * (len(colonne) - 1)
+            bas = np.floor(position).astype(np.intp)
+            haut = np.minimum(bas + 1, len(colonne) - 1)
+            quantiles[:, j] = colonne[bas] + (colonne[haut] - colonne[bas]) * (position - bas)
+        return profils_depuis_quantiles(pd.DataFrame(quantiles, columns=self.criteres))
+
+    def parametres(self, theta: np.ndarray) -> Dict:
+        # Paramètres décodés, au format du constructeur d'ElectreTri
+        poids, lambdas = self.poids_lambdas(theta[np.newaxis, :])
+        return {
+            'poids': dict(zip(self.criteres, poids[0].tolist())),
+            'profils': self.profils_candidat(theta),
+            'lambda_seuil': float(lambdas[0])
+        }
+
+    def matrices_motifs(self, poids: np.ndarray, lambdas: np.ndarray) -> np.ndarray:
+        nb_candidats = len(poids)
+        nb_motifs, nb_profils = self.codes_ab.shape
+        k = len(ElectreTri.CLASSES)
+        tables = tables_seuillees(poids, lambdas)
+        lot = np.arange(nb_candidats)[:, np.newaxis, np.newaxis]
+        S_ab = tables[lot, self.codes_ab[np.newaxis]].reshape(-1, nb_profils)
+        if self.methode == 'pessimiste':
+            codes = ElectreTri.codes_pessimistes(S_ab)
+        else:
+            S_ba = tables[lot, self.codes_ba[np.newaxis]].reshape(-1, nb_profils)
+            codes = ElectreTri.codes_optimistes(S_ab, S_ba)
+        predites = codes.reshape(nb_candidats, nb_motifs)[:, self.motifs]
+
+        indices = np.arange(nb_candidats)[:, np.newaxis] * (k * k) + self.classes_motifs * k + predites
+        comptes = np.bincount(indices.ravel(), weights=np.tile(self.effectifs, nb_candidats),
+                              minlength=nb_candidats * k * k)
+        return comptes.reshape(nb_candidats, k, k)
+
+    def matrices_profils(self, thetas: np.ndarray) -> np.ndarray:
+        k = len(ElectreTri.CLASSES)
+        matrices = np.empty((len(thetas), k, k))
+        for i, theta in enumerate(thetas):
+            electre = ElectreTri(**self.parametres(theta))
+            predites = electre.classer_tableau(self.valeurs, self.methode)
+            matrices[i] = np.bincount(self.vraies * k + predites, minlength=k * k).reshape(k, k)
+        return matrices
+
+    def evaluer(self, thetas: np.ndarray) -> np.ndarray:
+        thetas = np.atleast_2d(thetas)
+        matrices = []
+        for debut in range(0, len(thetas), self.taille_lot):
+            lot = thetas[debut:debut + self.taille_lot]
+            if self.ajuster_profils:
+                matrices.append(self.matrices_profils(lot))
+            else:
+                matrices.append(self.matrices_motifs(*self.poids_lambdas(lot)))
+        matrices = np.concatenate(matrices)
+        if self.objectif == 'kappa':
+            return AnalyseResultats.kappas_ponderes_lot(matrices)
+        return AnalyseResultats.accuracies_lot(matrices)
+
+
+def _initialiser_processus(probleme: ProblemeInference):
+    _etat_processus['probleme'] = probleme
+
+
+def _evaluer_tranche(thetas: np.ndarray) -> np.ndarray:
+    return _etat_processus['probleme'].evaluer(thetas)
+
+
+def inferer_parametres(df: pd.DataFrame, poids: Optional[Dict[str, float]] = None,
+                       lambda_seuil: float = 0.6, profils: Optional[pd.DataFrame] = None,
+                       ajuster_profils: bool = False, methode: str = 'pessimiste',
+                       objectif: str = 'accuracy', taille_population: int = 64,
+                       part_elite: float = 0.2, ecart_initial: float = 0.5, lissage: float = 0.7,
+                       max_generations: int = 100, patience: int = 10, tolerance: float = 1e-4,
+                       nb_processus: Optional[int] = None, graine: Optional[int] = None) -> Dict:
+    # Renvoie poids, profils et lambda_seuil (utilisables tels quels par
+    # ElectreTri(**...)), le score obtenu, le score des paramètres de départ
+    # et l'historique par génération. Arrêt après `patience` générations sans
+    # gain supérieur à `tolerance`
+    poids = definir_poids_criteres() if poids is None else poids
+    probleme = ProblemeInference(df, poids, profils, ajuster_profils, methode, objectif)
+    rng = np.random.default_rng(graine)
+    nb_elite = max(2, int(round(part_elite * taille_population)))
+
+    if nb_processus is None:
+        nb_processus = os.cpu_count() or 1
+    executeur = None
+    if nb_processus > 1:
+        executeur = ProcessPoolExecutor(nb_processus, initializer=_initialiser_processus,
+                                        initargs=(probleme,))
+
+    def evaluer(population: np.ndarray) -> np.ndarray:
+        if executeur is None:
+            return probleme.evaluer(population)
+        tranches = [t for t in np.array_split(population, nb_processus) if len(t)]
+        return np.concatenate(list(executeur.map(_evaluer_tranche, tranches)))
+
+    moyenne = probleme.theta_initial(poids, lambda_seuil)
+    ecarts = np.full(probleme.dimension, ecart_initial)
+    meilleur_theta = moyenne.copy()
+    score_initial = meilleur_score = float(probleme.evaluer(moyenne)[0])
+    historique = []
+    sans_progres = 0
+
+    try:
+        for generation in range(1, max_generations + 1):
+            population = moyenne + ecarts * rng.standard_normal((taille_population, probleme.dimension))
+            # Le meilleur candidat reste dans la population (élitisme)
+            population[0] = meilleur_theta
+            scores = evaluer(population)
+
+            ordre = np.argsort(-scores, kind='stable')
+            elite = population[ordre[:nb_elite]]
+            moyenne = lissage * elite.mean(axis=0) + (1 - lissage) * moyenne
+            ecarts = lissage * elite.std(axis=0) + (1 - lissage) * ecarts
+
+            gain = scores[ordre[0]] - meilleur_score
+            if gain > 0:
+                meilleur_score = float(scores[ordre[0]])
+                meilleur_theta = population[ordre[0]].copy()
+            sans_progres = 0 if gain > tolerance else sans_progres + 1
+            historique.append({'generation': generation, 'meilleur_score': meilleur_score,
+                               'score_moyen': float(scores.mean()), 'ecart_moyen': float(ecarts.mean())})
+            if sans_progres >= patience:
+                break
+    finally:
+        if executeur is not None:
+            executeur.shutdown()
+
+    parametres = probleme.parametres(meilleur_theta)
+    parametres.update(methode=methode, objectif=objectif, score=meilleur_score,
+                      score_initial=score_initial, historique=pd.DataFrame(historique))
+    return parametres
+
+
+def creer_electre(parametres: Dict) -> ElectreTri:
+    return ElectreTri(parametres['poids'], parametres['profils'], lambda_seuil=parametres['lambda_seuil'])
+
+
+def sauvegarder_parametres(parametres: Dict, chemin: str):
+    contenu = {
+        'poids': parametres['poids'],
+        'lambda_seuil': parametres['lambda_seuil'],
+        'profils': parametres['profils'].to_dict(orient='index'),
+        'methode': parametres.get('methode', 'pessimiste'),
+        'objectif': parametres.get('objectif'),
+        'score': parametres.get('score')
+    }
+    with open(chemin, 'w', encoding='utf-8') as f:
+        json.dump(contenu, f, ensure_ascii=False, indent=2)
+
+
+def charger_parametres(chemin: str) -> Dict:
+    # Poids, profils (DataFrame b1..b6 × critères) et lambda_seuil pour ElectreTri
+    with open(chemin, encoding='utf-8') as f:
+        contenu = json.load(f)
+    profils = pd.DataFrame.from_dict(contenu['profils'], orient='index').astype(float)
+    manquants = [p for p in ElectreTri.NOMS_PROFILS if p not in profils.index]
+    if manquants:
+        raise ValueError(f"Profils manquants dans {chemin} : {', '.join(manquants)}")
+    contenu['profils'] = profils.loc[ElectreTri.NOMS_PROFILS, list(contenu['poids'].keys())]
+    return contenu
+
+
+def main():
+    import argparse
+    from chargement_donnees import CHEMIN_BASE, charger_base
+
+    parser = argparse.ArgumentParser(description="Ajustement des paramètres ELECTRE TRI sur le Nutri-Score")
+    parser.add_argument('--base', default=CHEMIN_BASE)
+    parser.add_argument('--methode', choices=['pessimiste', 'optimiste'], default='pessimiste')
+    parser.add_argument('--objectif', choices=OBJECTIFS, default='accuracy',
+                        help="accuracy ou kappa pondéré quadratique")
+    parser.add_argument('--ajuster-profils', action='store_true',
+                        help="Ajuste aussi les niveaux de quantile des profils b1..b6")
+    parser.add_argument('--population', type=int, default=64)
+    parser.add_argument('--generations', type=int, default=100)
+    parser.add_argument('--patience', type=int, default=10)
+    parser.add_argument('--processus', type=int, default=None)
+    parser.add_argument('--graine', type=int, default=None)
+    parser.add_argument('--sortie', help="Fichier JSON des paramètres ajustés")
+    parser.add_argument('--profils-sortie', help="Profils ajustés au format CSV (pipeline_streaming --profils)")
+    args = parser.parse_args()
+
+    df = charger_base(args.base)
+    parametres = inferer_parametres(
+        df, ajuster_profils=args.ajuster_profils, methode=args.methode, objectif=args.objectif,
+        taille_population=args.population, max_generations=args.generations,
+        patience=args.patience, nb_processus=args.processus, graine=args.graine
+    )
+
+    print(f"[STATS] {args.objectif} ({args.methode}) : {parametres['score_initial']:.2%} -> "
+          f"{parametres['score']:.2%} en {len(parametres['historique'])} générations")
+    print(f"λ = {parametres['lambda_seuil']:.3f}")
+    for critere, valeur in parametres['poids'].items():
+        print(f"  {critere}: {valeur:.3f}")
+    if args.sortie:
+        sauvegarder_parametres(parametres, args.sortie)
+        print(f"[OK] Paramètres écrits dans {args.sortie}")
+    if args.profils_sortie:
+        parametres['profils'].to_csv(args.profils_sortie)
+        print(f"[OK] Profils écrits dans {args.profils_sortie}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,15 @@ Interface Streamlit - SuperNutriScore
 
 import streamlit as st
 import pandas as pd
+from typing import Optional
 import plotly.express as px
+from chargement_donnees import charger_base
+from cache_artefacts import CacheArtefacts, DOSSIER_ARTEFACTS, empreinte_donnees, empreinte_profils
+from additifs import contient_edulcorants as edulcorants_presents
+from recommandations import IndexRecommandations
 from supernutriscore import (
-    NutriScoreBoissons, ElectreTri, SuperNutriScore, AnalyseResultats,
-    creer_profils_limites, definir_poids_criteres
+    NutriScoreBoissons, ElectreTri, ElectreTriComplet, SuperNutriScore, AnalyseResultats,
+    CRITERES, definir_poids_criteres, definir_seuils_criteres
 )
 
 st.set_page_config(
@@ -59,15 +64,47 @@ page = st.sidebar.selectbox(
 @st.cache_data
 def charger_donnees():
     try:
-        df = pd.read_csv('base_donnees_boissons.csv', encoding='utf-8')
-        df.columns = df.columns.str.strip()
-        return df
+        return charger_base()
     except Exception as e:
         st.error(f"Erreur lors du chargement : {e}")
         return None
 
 df = charger_donnees()
 
+# Profils, comparaisons et cubes conservés d'une interaction à l'autre
+# (et d'une session à l'autre sur disque), indexés par l'empreinte des données
+@st.cache_resource
+def cache_artefacts():
+    return CacheArtefacts(dossier=DOSSIER_ARTEFACTS)
+
+artefacts = cache_artefacts()
+empreinte = empreinte_donnees(df, CRITERES) if df is not None else None
+
+# Index de voisinage construit une fois par version des données
+@st.cache_resource
+def index_recommandations(empreinte: str):
+    return IndexRecommandations(df)
+
+def afficher_alternatives(valeurs: pd.Series, categorie: str, label: str, k: int = 5,
+                          position_exclue: Optional[int] = None):
+    # Produits proches de la même catégorie avec un meilleur Nutri-Score
+    # (hors produit affiché, dont le label de la base peut différer du calcul)
+    if df is None or label == 'A':
+        return
+    recommandations = index_recommandations(empreinte).recommander_valeurs(
+        [valeurs.reindex(CRITERES).to_numpy(dtype=float)], [categorie], [label], k + 1
+    )
+    recommandations = recommandations[recommandations['Position'] != position_exclue].head(k)
+    st.markdown("### Alternatives plus saines")
+    if recommandations.empty:
+        st.info(f"Aucun produit de la catégorie « {categorie} » n'a un meilleur Nutri-Score que {label}")
+        return
+    alternatives = df.iloc[recommandations['Position']][
+        ['Nom_Produit', 'Marque', 'Label_Nutriscore', 'Energie_kJ', 'Sucres_g', 'Nombre_Additifs']
+    ].copy()
+    alternatives['Distance'] = recommandations['Distance'].round(2).to_numpy()
+    st.dataframe(alternatives, use_container_width=True, hide_index=True)
+
 # PAGE ACCUEIL
 if page == "Accueil":
     st.markdown("## Bienvenue !")
@@ -173,13 +210,16 @@ elif page == "Calculateur Nutri-Score":
     if option == "Tester avec la base de données" and df is not None:
         st.info("""**Attention** : Il peut y avoir des différences entre le score de la BD et le score qui est affiché car OpenFoodFacts
         n'utilise pas l'algorithme spécifiquement pour les boissons comme nous l'avons fait""")
-        produit_choisi = st.selectbox(
+        # La sélection porte directement sur la position du produit (pas de
+        # recherche par nom à chaque rerun, produits homonymes distingués)
+        position_choisie = st.selectbox(
             "Sélectionnez un produit",
-            df['Nom_Produit'].tolist(),
-            index=6
+            range(len(df)),
+            index=6,
+            format_func=lambda i: df['Nom_Produit'].iat[i]
         )
         
-        produit = df[df['Nom_Produit'] == produit_choisi].iloc[0]
+        produit = df.iloc[position_choisie]
         
         col1, col2 = st.columns(2)
         with col1:
@@ -196,12 +236,8 @@ elif page == "Calculateur Nutri-Score":
         # Détection eau
         est_eau = produit['Categorie'].lower() == 'eau'
 
-        # Détection édulcorants
-        contient_edulcorants = False
-        if pd.notna(produit['Liste_Additifs']):
-            edulcorants_codes = ['e950', 'e951', 'e952', 'e954', 'e955', 'e960', 'e961']
-            contient_edulcorants = any(code in str(produit['Liste_Additifs']).lower() 
-                                      for code in edulcorants_codes)
+        # Détection édulcorants (masque calculé au chargement)
+        contient_edulcorants = bool(edulcorants_presents(produit['Masque_Additifs']))
         
         if st.button("Calculer le Nutri-Score", type="primary"):
             resultat = NutriScoreBoissons.calculer_score_nutritionnel(
@@ -262,6 +298,9 @@ elif page == "Calculateur Nutri-Score":
             else:
                 st.warning(f"Différence détectée : Calculé = {resultat['label']}, Base de données = {produit['Label_Nutriscore']}")
 
+            afficher_alternatives(produit, produit['Categorie'], resultat['label'],
+                                  position_exclue=position_choisie)
+
     else:
         col1, col2 = st.columns(2)
         
@@ -280,6 +319,11 @@ elif page == "Calculateur Nutri-Score":
             fruits_legumes = st.number_input("Fruits/Légumes (%)", 0, 100, 0)
             est_eau = st.checkbox("C'est de l'eau (automatiquement A)")
         
+        categorie = None
+        if df is not None:
+            categorie = st.selectbox("Catégorie (pour proposer des alternatives)",
+                                     sorted(df['Categorie'].dropna().unique()))
+        
         if st.button("Calculer le Nutri-Score", type="primary"):
             resultat = NutriScoreBoissons.calculer_score_nutritionnel(
                 energie_kj, acides_gras, sucres, sel, contient_edulcorants,
@@ -301,6 +345,14 @@ elif page == "Calculateur Nutri-Score":
                     unsafe_allow_html=True
                 )
 
+            if categorie is not None:
+                valeurs = pd.Series({
+                    'Energie_kJ': energie_kj, 'Acides_Gras_Satures_g': acides_gras, 'Sucres_g': sucres,
+                    'Sel_g': sel, 'Proteines_g': proteines, 'Fibres_g': fibres,
+                    'Fruits_Legumes_Pct': fruits_legumes
+                })
+                afficher_alternatives(valeurs, categorie, resultat['label'])
+
 # PAGE ELECTRE TRI
 elif page == "ELECTRE TRI":
     st.markdown("## Classification ELECTRE TRI")
@@ -313,6 +365,10 @@ elif page == "ELECTRE TRI":
         
         methode = st.sidebar.radio("Procédure", ["Pessimiste", "Optimiste"])
         lambda_seuil = st.sidebar.slider("Seuil λ (concordance)", 0.5, 0.9, 0.6, 0.05)
+        avec_seuils = st.sidebar.checkbox(
+            "Seuils q / p / v (indifférence, préférence, veto)",
+            help="ELECTRE TRI complet : concordance graduelle, discordance et crédibilité σ"
+        )
         
         st.sidebar.markdown("### Poids des critères")
         poids_default = definir_poids_criteres()
@@ -341,15 +397,23 @@ elif page == "ELECTRE TRI":
         
         if st.button("Lancer la classification", type="primary", use_container_width=True):
             with st.spinner("Classification en cours..."):
-                profils = creer_profils_limites(df)
+                profils = artefacts.profils_limites(df, empreinte)
                 
                 st.markdown("### Profils limites (b1 à b6)")
                 st.info("b6 = meilleur profil (A) | b1 = pire profil (E)")
                 st.dataframe(profils.T.style.background_gradient(cmap='RdYlGn_r', axis=1),
                            use_container_width=True)
                 
-                electre = ElectreTri(poids, profils, lambda_seuil)
-                df_resultat = electre.classifier_base_donnees(df, methode.lower())
+                # Comparaisons produits / profils reprises du cache : un changement
+                # de poids ou de λ ne coûte qu'une pondération et un seuillage
+                if avec_seuils:
+                    electre = ElectreTriComplet(poids, profils, definir_seuils_criteres(), lambda_seuil)
+                    electre.preparer(df)
+                else:
+                    electre = ElectreTri(poids, profils, lambda_seuil)
+                    electre.preparer(df, artefacts.comparaisons_profils(df, electre, empreinte))
+                df_resultat = df.copy()
+                df_resultat[f'Classe_ELECTRE_{methode}'] = electre.reclassifier(methode=methode.lower())
                 
                 colonne_classe = f'Classe_ELECTRE_{methode}'
                 
@@ -458,23 +522,11 @@ elif page == "SuperNutri-Score":
         
         if st.button("Calculer le SuperNutri-Score", type="primary"):
             with st.spinner("Calcul en cours..."):
-                resultats = []
-                
-                for idx, row in df.iterrows():
-                    super_score = SuperNutriScore.calculer_super_score(
-                        row['Label_Nutriscore'],
-                        row['Label_Greenscore'] if pd.notna(row['Label_Greenscore']) else 'NOT-APPLICABLE',
-                        row['Label_Bio'],
-                        poids_nutri, poids_green, poids_bio
-                    )
-                    resultats.append({
-                        'Nom_Produit': row['Nom_Produit'],
-                        'SuperNutri_Score': super_score['score'],
-                        'SuperNutri_Classe': super_score['classe']
-                    })
-                
-                df_super = pd.DataFrame(resultats)
-                df_final = df.merge(df_super, on='Nom_Produit')
+                df_super = SuperNutriScore.calculer_super_scores_batch(
+                    df, poids_nutri, poids_green, poids_bio,
+                    cube=artefacts.cube_super_score(poids_nutri, poids_green, poids_bio)
+                )
+                df_final = df.join(df_super[['SuperNutri_Score', 'SuperNutri_Classe']])
                 
                 st.markdown("### Résultats SuperNutri-Score")
                 
@@ -580,38 +632,46 @@ elif page == "Analyse Comparative":
         with st.spinner("Calcul en cours..."):
             resultats_comp = []
             
-            for lambda_val in [0.6, 0.7, 0.8]:
-                for methode in ['pessimiste', 'optimiste']:
-                    profils = creer_profils_limites(df)
-                    poids = definir_poids_criteres()
-                    
-                    electre = ElectreTri(poids, profils, lambda_val)
-                    df_temp = electre.classifier_base_donnees(df, methode)
-                    
-                    colonne = f'Classe_ELECTRE_{methode.capitalize()}'
-                    matrice = AnalyseResultats.matrice_confusion(
-                        df_temp['Label_Nutriscore'],
-                        df_temp[colonne]
-                    )
-                    metriques = AnalyseResultats.calculer_metriques(matrice)
-                    
-                    resultats_comp.append({
-                        'λ': lambda_val,
-                        'Méthode': methode.capitalize(),
-                        'Précision': metriques['accuracy']
-                    })
+            profils = artefacts.profils_limites(df, empreinte)
+            poids = definir_poids_criteres()
+            lambdas = [0.6, 0.7, 0.8]
+            electre = ElectreTri(poids, profils)
+            classes_lambda = artefacts.obtenir_ou_calculer(
+                'classes_multi_lambda', empreinte,
+                lambda: electre.classifier_multi_lambda(df, lambdas),
+                poids=poids, lambdas=lambdas, profils=empreinte_profils(profils)
+            )
+            matrices = AnalyseResultats.matrices_confusion_lot(df['Label_Nutriscore'], classes_lambda)
+            accuracies = AnalyseResultats.accuracies_lot(matrices)
+            
+            for (lambda_val, methode), accuracy in zip(classes_lambda.columns, accuracies):
+                resultats_comp.append({
+                    'λ': lambda_val,
+                    'Méthode': methode.capitalize(),
+                    'Précision': accuracy
+                })
+
+            # Profils propres à chaque catégorie, un seul appel pour toute la base
+            profils_categories = artefacts.profils_categories(df)
+            df_categories = ElectreTri(poids, profils).classifier_deux_procedures(
+                df, profils_categories=profils_categories
+            )
+            for methode in ['Pessimiste', 'Optimiste']:
+                matrice = AnalyseResultats.matrice_confusion(
+                    df['Label_Nutriscore'], df_categories[f'Classe_ELECTRE_{methode}']
+                )
+                resultats_comp.append({
+                    'λ': 0.6,
+                    'Méthode': f'{methode} (profils par catégorie)',
+                    'Précision': AnalyseResultats.calculer_metriques(matrice)['accuracy']
+                })
                     
             # SuperNutri-Score dans la comparaison
-            resultats_super = []
-            for idx, row in df.iterrows():
-                super_score = SuperNutriScore.calculer_super_score(
-                    row['Label_Nutriscore'],
-                    row['Label_Greenscore'] if pd.notna(row['Label_Greenscore']) else 'NOT-APPLICABLE',
-                    row['Label_Bio']
-                )
-                resultats_super.append(super_score['classe'])
+            resultats_super = SuperNutriScore.calculer_super_scores_batch(
+                df, cube=artefacts.cube_super_score()
+            )
             
-            df['SuperNutri_Classe'] = resultats_super
+            df['SuperNutri_Classe'] = resultats_super['SuperNutri_Classe']
             
             matrice_super = AnalyseResultats.matrice_confusion(
                 df['Label_Nutriscore'],
@@ -645,14 +705,38 @@ elif page == "Analyse Comparative":
                 use_container_width=True
             )
 
+        # Fronts de Pareto sur les critères ELECTRE, repris du cache tant que les
+        # données ne changent pas (l'empreinte inclut la catégorie si besoin)
+        st.markdown("### Fronts de Pareto")
+        pareto_categorie = st.checkbox("Fronts calculés dans chaque catégorie")
+        couches = artefacts.couches_pareto(df, par_categorie=pareto_categorie,
+                                           empreinte=None if pareto_categorie else empreinte)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            effectifs_couches = couches.value_counts().sort_index()
+            fig = px.bar(
+                x=effectifs_couches.index,
+                y=effectifs_couches.values,
+                labels={'x': 'Couche de Pareto', 'y': 'Nombre de produits'},
+                title="Produits par couche (1 = non dominés)"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            non_domines = df.loc[couches == 1, ['Nom_Produit', 'Marque', 'Categorie', 'Label_Nutriscore']]
+            st.markdown(f"#### Produits non dominés ({len(non_domines)})")
+            st.dataframe(non_domines, use_container_width=True, hide_index=True)
+
         # Analyse par catégorie
         st.markdown("### Analyse par catégorie de produits")
         
         top_categories = df['Categorie'].value_counts().head(5)
+        groupes = df_categories.groupby('Categorie', observed=True)
+        categories_propres = profils_categories.index.get_level_values(0)
         
         for categorie in top_categories.index:
             with st.expander(f"{categorie} ({top_categories[categorie]} produits)"):
-                df_cat = df[df['Categorie'] == categorie]
+                df_cat = groupes.get_group(categorie)
                 
                 col1, col2 = st.columns(2)
                 
@@ -675,6 +759,13 @@ elif page == "Analyse Comparative":
                     stats.index = ['Nombre', 'Moyenne']
                     st.dataframe(stats.T.round(1), use_container_width=True)
 
+                    matrice = AnalyseResultats.matrice_confusion(
+                        df_cat['Label_Nutriscore'], df_cat['Classe_ELECTRE_Pessimiste']
+                    )
+                    origine = 'de la catégorie' if categorie in categories_propres else 'globaux'
+                    st.metric(f"ELECTRE TRI pessimiste (profils {origine})",
+                              f"{AnalyseResultats.calculer_metriques(matrice)['accuracy']:.1%}")
+
 # Footer
 st.markdown("---")
 st.markdown("""
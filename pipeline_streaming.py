@@ -0,0 +1,202 @@
+"""
+Traitement par blocs - SuperNutriScore
+
+Lit la base par blocs de taille fixe, calcule Nutri-Score, ELECTRE TRI
+(profils fixés à l'avance) et SuperNutri-Score sur chaque bloc, et écrit
+les résultats au fur et à mesure : la mémoire reste bornée par la taille
+d'un bloc, quelle que soit la taille du fichier.
+"""
+
+import argparse
+import os
+import time
+import pandas as pd
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from additifs import masques_additifs
+from chargement_donnees import (
+    CHEMIN_BASE, COLONNES_OBLIGATOIRES, AvertissementDonnees, appliquer_schema,
+    charger_base, dtypes_lecture, valider_base
+)
+from supernutriscore import (
+    NutriScoreBoissons, ElectreTri, SuperNutriScore, MatriceConfusionCumulee,
+    creer_profils_limites, definir_poids_criteres
+)
+from esquisses_quantiles import creer_profils_limites_flux
+
+TAILLE_BLOC = 50_000
+
+# Colonnes d'origine recopiées dans le fichier de sortie
+COLONNES_IDENTIFIANTS = ['ID', 'Code_Barres', 'Nom_Produit', 'Categorie', 'Label_Nutriscore']
+
+
+def lire_par_blocs(chemin: str, taille_bloc: int = TAILLE_BLOC,
+                   anomalies: Optional[List[pd.DataFrame]] = None) -> Iterator[pd.DataFrame]:
+    # Même schéma que charger_base, appliqué bloc par bloc ; les anomalies de
+    # chaque bloc sont ajoutées à la liste fournie
+    colonnes = pd.read_csv(chemin, encoding='utf-8', nrows=0).columns
+    manquantes = [c for c in COLONNES_OBLIGATOIRES if c not in colonnes.str.strip()]
+    if manquantes:
+        raise ValueError(f"Colonnes manquantes dans {chemin} : {', '.join(manquantes)}")
+
+    lecteur = pd.read_csv(chemin, encoding='utf-8', dtype=dtypes_lecture(list(colonnes)),
+                          chunksize=taille_bloc)
+    with lecteur:
+        for bloc in lecteur:
+            bloc.columns = bloc.columns.str.strip()
+            if anomalies is not None:
+                anomalies.append(valider_base(bloc))
+            bloc = appliquer_schema(bloc)
+            bloc['Masque_Additifs'] = masques_additifs(bloc['Liste_Additifs'])
+            yield bloc
+
+
+def scorer_bloc(bloc: pd.DataFrame, electre: ElectreTri,
+                poids_super: Dict[str, float]) -> pd.DataFrame:
+    scores = NutriScoreBoissons.calculer_scores_batch(bloc)
+
+    S_ab, S_ba = electre.surclassements(electre.valeurs_criteres(bloc))
+    codes_pess = electre.codes_pessimistes(S_ab)
+    codes_opt = electre.codes_optimistes(S_ab, S_ba)
+
+    super_scores = SuperNutriScore.calculer_super_scores_batch(bloc, **poids_super)
+
+    identifiants = bloc[[c for c in COLONNES_IDENTIFIANTS if c in bloc.columns]]
+    return pd.concat([
+        identifiants,
+        scores,
+        pd.DataFrame({
+            'Classe_ELECTRE_Pessimiste': electre.CLASSES[codes_pess],
+            'Classe_ELECTRE_Optimiste': electre.CLASSES[codes_opt],
+            'Incomparabilite_ELECTRE': codes_pess != codes_opt
+        }, index=bloc.index),
+        super_scores
+    ], axis=1)
+
+
+def scorer_blocs(blocs: Iterable[pd.DataFrame], electre: ElectreTri,
+                 poids_super: Dict[str, float]) -> Iterator[pd.DataFrame]:
+    for bloc in blocs:
+        yield scorer_bloc(bloc, electre, poids_super)
+
+
+class StatistiquesFlux:
+    # Matrices de confusion cumulées (vs Label_Nutriscore de la base) :
+    # quelques octets par méthode, fusionnables entre processus ou machines
+
+    METHODES = {
+        'Nutri-Score recalculé': 'Label_Nutriscore_Calcule',
+        'ELECTRE TRI pessimiste': 'Classe_ELECTRE_Pessimiste',
+        'ELECTRE TRI optimiste': 'Classe_ELECTRE_Optimiste',
+        'SuperNutri-Score': 'SuperNutri_Classe'
+    }
+
+    def __init__(self):
+        self.nb_produits = 0
+        self.nb_blocs = 0
+        self.nb_incomparables = 0
+        self.matrices = {methode: MatriceConfusionCumulee() for methode in self.METHODES}
+
+    def mettre_a_jour(self, resultats: pd.DataFrame) -> 'StatistiquesFlux':
+        self.nb_produits += len(resultats)
+        self.nb_blocs += 1
+        self.nb_incomparables += int(resultats['Incomparabilite_ELECTRE'].sum())
+        if 'Label_Nutriscore' in resultats.columns:
+            for methode, colonne in self.METHODES.items():
+                self.matrices[methode].mettre_a_jour(resultats['Label_Nutriscore'], resultats[colonne])
+        return self
+
+    def accuracies(self) -> pd.Series:
+        return pd.Series({methode: matrice.calculer_metriques()['accuracy']
+                          for methode, matrice in self.matrices.items()})
+
+
+def ecrire_resultats(resultats: Iterable[pd.DataFrame], chemin_sortie: str,
+                     statistiques: Optional[StatistiquesFlux] = None) -> StatistiquesFlux:
+    # Écriture incrémentale dans un fichier temporaire, renommé à la fin :
+    # un traitement interrompu ne laisse pas de sortie tronquée
+    if statistiques is None:
+        statistiques = StatistiquesFlux()
+
+    temporaire = f'{chemin_sortie}.{os.getpid()}.tmp'
+    try:
+        with open(temporaire, 'w', encoding='utf-8', newline='') as f:
+            for i, bloc in enumerate(resultats):
+                bloc.to_csv(f, index=False, header=(i == 0))
+                statistiques.mettre_a_jour(bloc)
+        os.replace(temporaire, chemin_sortie)
+    except BaseException:
+        if os.path.exists(temporaire):
+            os.remove(temporaire)
+        raise
+    return statistiques
+
+
+def charger_profils(chemin: str) -> pd.DataFrame:
+    # Profils enregistrés par profils.to_csv(chemin) (index b1..b6, une colonne par critère)
+    profils = pd.read_csv(chemin, index_col=0).astype(float)
+    manquants = [p for p in ElectreTri.NOMS_PROFILS if p not in profils.index]
+    if manquants:
+        raise ValueError(f"Profils manquants dans {chemin} : {', '.join(manquants)}")
+    return profils.loc[ElectreTri.NOMS_PROFILS]
+
+
+def traiter_fichier(chemin: str, chemin_sortie: str, profils: pd.DataFrame,
+                    poids: Optional[Dict[str, float]] = None, lambda_seuil: float = 0.6,
+                    poids_super: Optional[Dict[str, float]] = None,
+                    taille_bloc: int = TAILLE_BLOC,
+                    anomalies: Optional[List[pd.DataFrame]] = None) -> StatistiquesFlux:
+    if poids is None:
+        poids = definir_poids_criteres()
+    if poids_super is None:
+        poids_super = {'poids_nutri': 0.5, 'poids_green': 0.3, 'poids_bio': 0.2}
+
+    electre = ElectreTri(poids, profils, lambda_seuil=lambda_seuil)
+    blocs = lire_par_blocs(chemin, taille_bloc, anomalies)
+    return ecrire_resultats(scorer_blocs(blocs, electre, poids_super), chemin_sortie)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcul par blocs des scores sur une base volumineuse")
+    parser.add_argument('entree', help="Fichier CSV des produits (même schéma que la base)")
+    parser.add_argument('sortie', help="Fichier CSV des résultats")
+    parser.add_argument('--profils', help="Profils limites (CSV b1..b6) ; par défaut, "
+                                          "quantiles de la base de référence")
+    parser.add_argument('--reference', default=CHEMIN_BASE,
+                        help="Base servant à construire les profils si --profils est absent")
+    parser.add_argument('--profils-entree', action='store_true',
+                        help="Profils estimés sur le fichier d'entrée (première passe, esquisses KLL)")
+    parser.add_argument('--erreur-quantiles', type=float, default=0.01,
+                        help="Erreur de rang tolérée pour --profils-entree")
+    parser.add_argument('--lambda', dest='lambda_seuil', type=float, default=0.6)
+    parser.add_argument('--taille-bloc', type=int, default=TAILLE_BLOC)
+    args = parser.parse_args()
+
+    if args.profils:
+        profils = charger_profils(args.profils)
+    elif args.profils_entree:
+        profils = creer_profils_limites_flux(lire_par_blocs(args.entree, args.taille_bloc),
+                                             erreur=args.erreur_quantiles)
+    else:
+        profils = creer_profils_limites(charger_base(args.reference))
+
+    debut = time.perf_counter()
+    anomalies: List[pd.DataFrame] = []
+    statistiques = traiter_fichier(args.entree, args.sortie, profils, lambda_seuil=args.lambda_seuil,
+                                   taille_bloc=args.taille_bloc, anomalies=anomalies)
+    duree = time.perf_counter() - debut
+
+    print(f"[OK] {statistiques.nb_produits} produits traités en {statistiques.nb_blocs} blocs "
+          f"({duree:.1f} s) -> {args.sortie}")
+    if anomalies:
+        cumul = pd.concat(anomalies).groupby(['Colonne', 'Anomalie'], sort=False)['Nombre'].sum()
+        for (colonne, anomalie), nombre in cumul.items():
+            print(f"[{AvertissementDonnees.__name__}] {colonne} {anomalie} ({nombre})")
+    print(f"Produits incomparables (pessimiste ≠ optimiste): {statistiques.nb_incomparables}")
+    print("\nConcordance avec le Nutri-Score de la base:")
+    for methode, accuracy in statistiques.accuracies().items():
+        print(f"  {methode}: {accuracy:.2%}")
+
+
+if __name__ == "__main__":
+    main()
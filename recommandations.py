@@ -0,0 +1,162 @@
+"""
+Alternatives plus saines - SuperNutriScore
+
+Pour un produit, les k produits les plus proches (critères nutritionnels
+normalisés) de la même catégorie avec un meilleur Nutri-Score. Un index de
+voisinage par couple (catégorie, label) : arbre k-d de scipy s'il est
+installé, sinon recherche exhaustive vectorisée par blocs.
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+from supernutriscore import AnalyseResultats, CRITERES
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# Distances calculées au plus par blocs de cette taille (requêtes × points)
+TAILLE_BLOC_DISTANCES = 2 ** 22
+
+
+class ArbreVoisins:
+    # k plus proches voisins (distance euclidienne) parmi des points fixes
+
+    def __init__(self, points: np.ndarray, utiliser_scipy: bool = True):
+        self.points = points
+        self.arbre = cKDTree(points) if utiliser_scipy and cKDTree is not None else None
+        if self.arbre is None:
+            self.normes = np.einsum('ij,ij->i', points, points)
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def requete(self, requetes: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        # (requêtes, k) distances croissantes et positions dans points ;
+        # inf et -1 au-delà du nombre de points
+        distances = np.full((len(requetes), k), np.inf)
+        positions = np.full((len(requetes), k), -1, dtype=np.intp)
+        nb = min(k, len(self.points))
+        if nb == 0 or len(requetes) == 0:
+            return distances, positions
+
+        if self.arbre is not None:
+            d, p = self.arbre.query(requetes, k=nb)
+            distances[:, :nb] = d.reshape(len(requetes), nb)
+            positions[:, :nb] = p.reshape(len(requetes), nb)
+            return distances, positions
+
+        taille = max(1, TAILLE_BLOC_DISTANCES // len(self.points))
+        for debut in range(0, len(requetes), taille):
+            q = requetes[debut:debut + taille]
+            carres = self.normes[np.newaxis, :] - 2 * (q @ self.points.T)
+            carres += np.einsum('ij,ij->i', q, q)[:, np.newaxis]
+            np.maximum(carres, 0, out=carres)
+            if nb < len(self.points):
+                proches = np.argpartition(carres, nb - 1, axis=1)[:, :nb]
+            else:
+                proches = np.broadcast_to(np.arange(nb), (len(q), nb))
+            carres = np.take_along_axis(carres, proches, axis=1)
+            ordre = np.argsort(carres, axis=1, kind='stable')
+            distances[debut:debut + len(q), :nb] = np.sqrt(np.take_along_axis(carres, ordre, axis=1))
+            positions[debut:debut + len(q), :nb] = np.take_along_axis(proches, ordre, axis=1)
+        return distances, positions
+
+
+class IndexRecommandations:
+    # Critères centrés-réduits (valeur manquante = moyenne) ; un ArbreVoisins
+    # par couple (catégorie, label) des produits de la base
+
+    def __init__(self, df: pd.DataFrame, criteres: Optional[List[str]] = None,
+                 colonne: str = 'Categorie', colonne_label: str = 'Label_Nutriscore',
+                 utiliser_scipy: bool = True):
+        self.criteres = CRITERES if criteres is None else criteres
+        self.index = df.index
+        valeurs = df[self.criteres].to_numpy(dtype=float, na_value=np.nan)
+        self.centre = np.nan_to_num(np.nanmean(valeurs, axis=0)) if len(df) else np.zeros(len(self.criteres))
+        echelle = np.nan_to_num(np.nanstd(valeurs, axis=0)) if len(df) else np.ones(len(self.criteres))
+        self.echelle = np.where(echelle > 0, echelle, 1.0)
+
+        codes_categories, self.categories = pd.factorize(df[colonne].astype(object))
+        labels = AnalyseResultats.codes_classes(df[colonne_label])
+        self.categories_produits = codes_categories
+        self.labels_produits = labels
+
+        self.points = self.normaliser(valeurs)
+        self.arbres: Dict[Tuple[int, int], ArbreVoisins] = {}
+        self.positions: Dict[Tuple[int, int], np.ndarray] = {}
+        valides = np.flatnonzero((codes_categories >= 0) & (labels >= 0))
+        cles = codes_categories[valides] * len(AnalyseResultats.CLASSES) + labels[valides]
+        ordre = np.argsort(cles, kind='stable')
+        distinctes, debuts = np.unique(cles[ordre], return_index=True)
+        for cle, positions in zip(distinctes, np.split(valides[ordre], debuts[1:])):
+            couple = divmod(int(cle), len(AnalyseResultats.CLASSES))
+            self.positions[couple] = positions
+            self.arbres[couple] = ArbreVoisins(self.points[positions], utiliser_scipy)
+
+    def __repr__(self) -> str:
+        moteur = 'scipy.cKDTree' if cKDTree is not None else 'exhaustif'
+        return f"IndexRecommandations(produits={len(self.index)}, arbres={len(self.arbres)}, moteur={moteur})"
+
+    def normaliser(self, valeurs: np.ndarray) -> np.ndarray:
+        points = (np.asarray(valeurs, dtype=float) - self.centre) / self.echelle
+        return np.nan_to_num(points, nan=0.0)
+
+    def recommander_valeurs(self, valeurs: np.ndarray, categories: Sequence, labels: Sequence,
+                            k: int = 5) -> pd.DataFrame:
+        # valeurs : (requêtes, critères) dans l'ordre de self.criteres ; une ligne
+        # par recommandation (Requete, Rang, Position, Distance), Position étant la
+        # position du produit recommandé dans la base
+        requetes = self.normaliser(np.atleast_2d(valeurs))
+        codes_categories = self.categories.get_indexer(pd.Index(categories, dtype=object))
+        codes_labels = AnalyseResultats.codes_classes(pd.Series(list(labels), dtype=object))
+        return self.recommander_codes(requetes, codes_categories, codes_labels, k)
+
+    def recommander(self, positions: Sequence[int], k: int = 5) -> pd.DataFrame:
+        # Requêtes par produits de la base (positions), comparés à leur propre label
+        positions = np.asarray(positions, dtype=np.intp)
+        return self.recommander_codes(self.points[positions], self.categories_produits[positions],
+                                      self.labels_produits[positions], k)
+
+    def recommander_codes(self, requetes: np.ndarray, codes_categories: np.ndarray,
+                          codes_labels: np.ndarray, k: int) -> pd.DataFrame:
+        nb_classes = len(AnalyseResultats.CLASSES)
+        resultats = []
+        valide = (codes_categories >= 0) & (codes_labels > 0)
+        cles = codes_categories * nb_classes + codes_labels
+        for cle in np.unique(cles[valide]):
+            categorie, label = divmod(int(cle), nb_classes)
+            numeros = np.flatnonzero(valide & (cles == cle))
+            q = requetes[numeros]
+
+            # Voisins parmi chaque meilleur label, puis les k plus proches au total
+            distances, positions = [], []
+            for meilleur in range(label):
+                arbre = self.arbres.get((categorie, meilleur))
+                if arbre is None:
+                    continue
+                d, p = arbre.requete(q, k)
+                distances.append(d)
+                positions.append(np.where(p >= 0, self.positions[(categorie, meilleur)][np.maximum(p, 0)], -1))
+            if not distances:
+                continue
+            distances, positions = np.hstack(distances), np.hstack(positions)
+            ordre = np.argsort(distances, axis=1, kind='stable')[:, :k]
+            distances = np.take_along_axis(distances, ordre, axis=1)
+            positions = np.take_along_axis(positions, ordre, axis=1)
+
+            trouve = positions >= 0
+            resultats.append(pd.DataFrame({
+                'Requete': np.repeat(numeros, ordre.shape[1]).reshape(ordre.shape)[trouve],
+                'Rang': np.broadcast_to(np.arange(1, ordre.shape[1] + 1), ordre.shape)[trouve],
+                'Position': positions[trouve],
+                'Distance': distances[trouve]
+            }))
+
+        if not resultats:
+            return pd.DataFrame({'Requete': pd.Series(dtype=np.intp), 'Rang': pd.Series(dtype=np.intp),
+                                 'Position': pd.Series(dtype=np.intp), 'Distance': pd.Series(dtype=float)})
+        return pd.concat(resultats, ignore_index=True).sort_values(['Requete', 'Rang'], ignore_index=True)
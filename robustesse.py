@@ -0,0 +1,193 @@
+"""
+Analyse de robustesse ELECTRE TRI - SuperNutriScore
+
+Tirages Monte-Carlo des poids (Dirichlet centrée sur les poids de référence)
+et de λ ; pour chaque produit, fréquence de chaque classe sur l'ensemble des
+tirages et score de stabilité (fréquence de la classe la plus fréquente).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from supernutriscore import ElectreTri, definir_poids_criteres
+
+# Bits des 256 codes empaquetés : BITS[k, code] = critère k concordant
+BITS = ((np.arange(256)[np.newaxis, :] >> np.arange(8)[:, np.newaxis]) & 1).astype(bool)
+
+_etat_processus: Dict = {}
+
+
+def echantillonner_parametres(nb_echantillons: int, poids: Optional[Dict[str, float]] = None,
+                              concentration: float = 200.0,
+                              intervalle_lambda: Tuple[float, float] = (0.5, 0.8),
+                              graine: Optional[int] = None) -> Tuple[pd.DataFrame, np.ndarray]:
+    # Poids ~ Dirichlet(concentration × poids de référence normalisés) : moyenne
+    # égale aux poids de référence, dispersion d'autant plus faible que la
+    # concentration est grande ; λ ~ uniforme sur l'intervalle
+    poids = definir_poids_criteres() if poids is None else poids
+    reference = np.array(list(poids.values()), dtype=float)
+    rng = np.random.default_rng(graine)
+    tirages = rng.dirichlet(concentration * reference / reference.sum(), size=nb_echantillons)
+    lambdas = rng.uniform(*intervalle_lambda, size=nb_echantillons)
+    return pd.DataFrame(tirages, columns=list(poids.keys())), lambdas
+
+
+def motifs_comparaisons(electre: ElectreTri, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Comparaisons empaquetées (un octet par profil avec au plus 8 critères) ;
+    # les produits aux mêmes comparaisons ont la même classe pour tout tirage,
+    # seuls les motifs distincts sont classés
+    if len(electre.poids) > 8:
+        raise ValueError("L'analyse de robustesse est limitée à 8 critères (un octet par comparaison)")
+    comparaisons = electre.preparer(df).comparaisons
+    electre.comparaisons = None
+    motifs = np.concatenate([comparaisons['ab'][..., 0], comparaisons['ba'][..., 0]], axis=1)
+    distincts, inverse = np.unique(motifs, axis=0, return_inverse=True)
+    nb_profils = len(ElectreTri.NOMS_PROFILS)
+    return distincts[:, :nb_profils], distincts[:, nb_profils:], inverse.ravel()
+
+
+def tables_seuillees(poids: np.ndarray, lambdas: np.ndarray) -> np.ndarray:
+    # (tirages, 256) : surclassement pour chaque code. Poids ajoutés un par un
+    # comme ElectreTri.tables_poids, pour des affectations identiques tirage par tirage
+    tables = np.zeros((len(poids), 256))
+    somme = np.zeros(len(poids))
+    for k in range(poids.shape[1]):
+        tables += poids[:, k, np.newaxis] * BITS[k]
+        somme += poids[:, k]
+    return tables / somme[:, np.newaxis] >= lambdas[:, np.newaxis]
+
+
+def compter_classes(codes_ab: np.ndarray, codes_ba: np.ndarray, poids: np.ndarray,
+                    lambdas: np.ndarray, methodes: Tuple[str, ...], taille_lot: int = 32) -> np.ndarray:
+    # Effectifs (procédures, motifs, classes) sur les tirages fournis
+    nb_motifs, nb_profils = codes_ab.shape
+    nb_classes = len(ElectreTri.CLASSES)
+    comptes = np.zeros((len(methodes), nb_motifs, nb_classes), dtype=np.int64)
+    cases = np.arange(nb_motifs) * nb_classes
+
+    for debut in range(0, len(poids), taille_lot):
+        fin = debut + taille_lot
+        tables = tables_seuillees(poids[debut:fin], lambdas[debut:fin])
+        lot = np.arange(len(tables))[:, np.newaxis, np.newaxis]
+        S_ab = tables[lot, codes_ab[np.newaxis]].reshape(-1, nb_profils)
+        S_ba = tables[lot, codes_ba[np.newaxis]].reshape(-1, nb_profils)
+
+        for m, methode in enumerate(methodes):
+            if methode == 'pessimiste':
+                codes = ElectreTri.codes_pessimistes(S_ab)
+            else:
+                codes = ElectreTri.codes_optimistes(S_ab, S_ba)
+            # Effectifs (motif, classe) du lot : un seul bincount
+            indices = (codes.reshape(len(tables), nb_motifs) + cases).ravel()
+            comptes[m] += np.bincount(indices, minlength=nb_motifs * nb_classes).reshape(nb_motifs, nb_classes)
+
+    return comptes
+
+
+def _initialiser_processus(codes_ab: np.ndarray, codes_ba: np.ndarray, methodes: Tuple[str, ...],
+                           taille_lot: int):
+    _etat_processus.update(codes_ab=codes_ab, codes_ba=codes_ba, methodes=methodes, taille_lot=taille_lot)
+
+
+def _compter_tranche(poids: np.ndarray, lambdas: np.ndarray) -> np.ndarray:
+    return compter_classes(_etat_processus['codes_ab'], _etat_processus['codes_ba'], poids, lambdas,
+                           _etat_processus['methodes'], _etat_processus['taille_lot'])
+
+
+def analyser_robustesse(df: pd.DataFrame, profils: pd.DataFrame,
+                        poids: Optional[Dict[str, float]] = None, lambda_seuil: float = 0.6,
+                        nb_echantillons: int = 1000, concentration: float = 200.0,
+                        intervalle_lambda: Tuple[float, float] = (0.5, 0.8),
+                        methodes: Tuple[str, ...] = ('pessimiste', 'optimiste'),
+                        nb_processus: Optional[int] = None, taille_lot: int = 32,
+                        graine: Optional[int] = None) -> pd.DataFrame:
+    # Colonnes (procédure, mesure) : fréquence de chaque classe, classe modale,
+    # stabilité (fréquence de la classe modale), classe et fréquence de la
+    # classe obtenue avec les paramètres de référence
+    poids = definir_poids_criteres() if poids is None else poids
+    electre = ElectreTri(poids, profils, lambda_seuil)
+    codes_ab, codes_ba, inverse = motifs_comparaisons(electre, df)
+    tirages, lambdas = echantillonner_parametres(nb_echantillons, poids, concentration,
+                                                 intervalle_lambda, graine)
+    tirages = tirages.to_numpy()
+
+    if nb_processus is None:
+        nb_processus = os.cpu_count() or 1
+    if nb_processus <= 1 or nb_echantillons < 2 * taille_lot:
+        comptes = compter_classes(codes_ab, codes_ba, tirages, lambdas, methodes, taille_lot)
+    else:
+        tranches = np.array_split(np.arange(nb_echantillons), nb_processus * 4)
+        with ProcessPoolExecutor(nb_processus, initializer=_initialiser_processus,
+                                 initargs=(codes_ab, codes_ba, methodes, taille_lot)) as executeur:
+            comptes = sum(executeur.map(_compter_tranche,
+                                        [tirages[t] for t in tranches if len(t)],
+                                        [lambdas[t] for t in tranches if len(t)]))
+
+    frequences = comptes[:, inverse] / nb_echantillons
+    colonnes = {}
+    for m, methode in enumerate(methodes):
+        codes_reference = electre.classer_tableau(electre.valeurs_criteres(df), methode)
+        for c, classe in enumerate(ElectreTri.CLASSES):
+            colonnes[(methode, classe)] = frequences[m, :, c]
+        colonnes[(methode, 'Classe_Modale')] = ElectreTri.CLASSES[frequences[m].argmax(axis=1)]
+        colonnes[(methode, 'Stabilite')] = frequences[m].max(axis=1)
+        colonnes[(methode, 'Classe_Reference')] = ElectreTri.CLASSES[codes_reference]
+        colonnes[(methode, 'Frequence_Reference')] = frequences[m, np.arange(len(df)), codes_reference]
+
+    resultats = pd.DataFrame(colonnes, index=df.index)
+    resultats.columns.names = ['methode', 'mesure']
+    return resultats
+
+
+def resume_robustesse(resultats: pd.DataFrame, seuil_stabilite: float = 0.9) -> pd.DataFrame:
+    # Par procédure : stabilité moyenne et part des produits stables
+    lignes = []
+    for methode in resultats.columns.get_level_values('methode').unique():
+        stabilite = resultats[(methode, 'Stabilite')]
+        lignes.append({
+            'Procédure': methode,
+            'Stabilité moyenne': stabilite.mean(),
+            f'Produits stables (≥ {seuil_stabilite:.0%})': (stabilite >= seuil_stabilite).mean(),
+            'Classe de référence majoritaire': (resultats[(methode, 'Classe_Modale')]
+                                                == resultats[(methode, 'Classe_Reference')]).mean()
+        })
+    return pd.DataFrame(lignes)
+
+
+def main():
+    import argparse
+    from chargement_donnees import CHEMIN_BASE, charger_base
+    from supernutriscore import creer_profils_limites
+
+    parser = argparse.ArgumentParser(description="Robustesse des affectations ELECTRE TRI (Monte-Carlo)")
+    parser.add_argument('--base', default=CHEMIN_BASE)
+    parser.add_argument('--echantillons', type=int, default=1000)
+    parser.add_argument('--concentration', type=float, default=200.0,
+                        help="Concentration de la loi de Dirichlet (plus grande = poids moins dispersés)")
+    parser.add_argument('--lambda-min', type=float, default=0.5)
+    parser.add_argument('--lambda-max', type=float, default=0.8)
+    parser.add_argument('--processus', type=int, default=None)
+    parser.add_argument('--graine', type=int, default=None)
+    parser.add_argument('--sortie', help="Fichier CSV des fréquences par produit")
+    args = parser.parse_args()
+
+    df = charger_base(args.base)
+    resultats = analyser_robustesse(
+        df, creer_profils_limites(df), nb_echantillons=args.echantillons,
+        concentration=args.concentration, intervalle_lambda=(args.lambda_min, args.lambda_max),
+        nb_processus=args.processus, graine=args.graine
+    )
+
+    print(f"[STATS] Robustesse sur {args.echantillons} tirages ({len(df)} produits)")
+    print(resume_robustesse(resultats).to_string(index=False))
+    if args.sortie:
+        resultats.columns = [f'{methode}_{mesure}' for methode, mesure in resultats.columns]
+        pd.concat([df[['Nom_Produit', 'Label_Nutriscore']], resultats], axis=1).to_csv(args.sortie, index=False)
+        print(f"[OK] Fréquences écrites dans {args.sortie}")
+
+
+if __name__ == "__main__":
+    main()
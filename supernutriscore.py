@@ -1,7 +1,10 @@
 import pandas as pd
 import numpy as np
+from functools import lru_cache
 from typing import Dict, Tuple, List, Optional
 
+from additifs import masques_additifs, contient_edulcorants
+
 
 class NutriScoreBoissons:
     # Tables de points (par 100ml)
@@ -48,6 +51,17 @@ class NutriScoreBoissons:
     
     MAX_POINTS_P = 7
 
+    # Colonnes de la base et tables de points (contrefactuels)
+    NUTRIMENTS_NEGATIFS = [
+        ('Energie_kJ', ENERGIE_POINTS), ('Acides_Gras_Satures_g', ACIDES_GRAS_SATURES_POINTS),
+        ('Sucres_g', SUCRES_POINTS), ('Sel_g', SEL_POINTS)
+    ]
+
+    NUTRIMENTS_POSITIFS = [
+        ('Proteines_g', PROTEINES_POINTS), ('Fibres_g', FIBRES_POINTS),
+        ('Fruits_Legumes_Pct', FRUITS_LEGUMES_POINTS)
+    ]
+
     # Classes Nutri-Score BOISSONS
     CLASSES_BOISSONS = [
         (-float('inf'), -2, 'A', '#038141'),
@@ -64,6 +78,61 @@ class NutriScoreBoissons:
                 return points
         return table[-1][1]
 
+    @staticmethod
+    def get_points_tableau(valeurs: np.ndarray, table: List[Tuple]) -> np.ndarray:
+        # Équivalent vectorisé de get_points : le premier seuil strictement
+        # supérieur à la valeur donne les points (NaN -> dernière tranche)
+        # Seuils exprimés dans la précision des valeurs (float32 depuis chargement_donnees)
+        valeurs = np.asarray(valeurs)
+        dtype_seuils = valeurs.dtype if valeurs.dtype.kind == 'f' else float
+        seuils = np.array([seuil for seuil, _ in table], dtype=dtype_seuils)
+        points = np.array([pts for _, pts in table], dtype=np.int64)
+        idx = np.searchsorted(seuils, valeurs, side='right')
+        return points[np.minimum(idx, len(table) - 1)]
+
+    @staticmethod
+    def seuils_au_plus(table: List[Tuple], dtype=float) -> np.ndarray:
+        # [t] : seuil sous lequel (strictement) une valeur obtient au plus t points
+        seuils = np.array([seuil for seuil, _ in table], dtype=dtype)
+        points = np.array([pts for _, pts in table], dtype=np.int64)
+        return np.array([seuils[points <= t].max() if (points <= t).any() else -np.inf
+                         for t in range(points.max() + 1)], dtype=float)
+
+    @staticmethod
+    def seuils_au_moins(table: List[Tuple], dtype=float) -> np.ndarray:
+        # [q] : plus petite valeur obtenant au moins q points (le seuil de la
+        # tranche précédente, atteint inclus)
+        seuils = np.array([seuil for seuil, _ in table], dtype=dtype)
+        points = np.array([pts for _, pts in table], dtype=np.int64)
+        premiers = [int(np.argmax(points >= q)) for q in range(points.max() + 1)]
+        return np.array([seuils[k - 1] if k > 0 else -np.inf for k in premiers], dtype=float)
+
+    @staticmethod
+    def arrondir_chiffres(valeurs: np.ndarray, references: np.ndarray, chiffres: int) -> np.ndarray:
+        # Arrondi à la décimale du chiffres-ième chiffre significatif des
+        # références : retire le bruit d'un float32 élargi en float64 (0.7 ->
+        # 0.699999988...) ou d'une différence de décimaux (1.2 - 0.7)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            exposants = np.floor(np.log10(np.abs(references)))
+        echelles = 10.0 ** (chiffres - 1 - np.where(np.isfinite(exposants), exposants, 0))
+        return np.round(valeurs * echelles) / echelles
+
+    @staticmethod
+    def valeurs_colonne(df: pd.DataFrame, nom: str) -> np.ndarray:
+        valeurs = df[nom].to_numpy()
+        if valeurs.dtype.kind not in 'fiu':
+            valeurs = df[nom].to_numpy(dtype=float, na_value=np.nan)
+        return valeurs
+
+    @staticmethod
+    def detecter_edulcorants(df: pd.DataFrame) -> np.ndarray:
+        # Masques calculés au chargement si disponibles, sinon analyse des listes
+        if 'Masque_Additifs' in df.columns:
+            masques = df['Masque_Additifs'].to_numpy()
+        else:
+            masques = masques_additifs(df['Liste_Additifs'])
+        return contient_edulcorants(masques)
+
     @classmethod
     def calculer_score_nutritionnel(cls,
                                    energie_kj: float,
@@ -144,12 +213,170 @@ class NutriScoreBoissons:
         }
 
 
+    @classmethod
+    def calculer_scores_tableaux(cls,
+                                 energie_kj: np.ndarray,
+                                 acides_gras_satures: np.ndarray,
+                                 sucres: np.ndarray,
+                                 sel: np.ndarray,
+                                 contient_edulcorants: np.ndarray,
+                                 proteines: np.ndarray,
+                                 fibres: np.ndarray,
+                                 fruits_legumes: np.ndarray,
+                                 est_eau: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        # Version vectorisée de calculer_score_nutritionnel (mêmes tables, mêmes règles)
+        edulcorants = np.asarray(contient_edulcorants, dtype=bool)
+
+        score_negatif = (cls.get_points_tableau(energie_kj, cls.ENERGIE_POINTS)
+                         + cls.get_points_tableau(acides_gras_satures, cls.ACIDES_GRAS_SATURES_POINTS)
+                         + cls.get_points_tableau(sucres, cls.SUCRES_POINTS)
+                         + cls.get_points_tableau(sel, cls.SEL_POINTS)
+                         + np.where(edulcorants, cls.POINTS_EDULCORANTS, 0))
+
+        score_positif = np.minimum(
+            cls.get_points_tableau(proteines, cls.PROTEINES_POINTS)
+            + cls.get_points_tableau(fibres, cls.FIBRES_POINTS)
+            + cls.get_points_tableau(fruits_legumes, cls.FRUITS_LEGUMES_POINTS),
+            cls.MAX_POINTS_P
+        )
+
+        score = score_negatif - score_positif
+
+        # Cas spécial : eau → automatiquement A (score -10)
+        if est_eau is not None:
+            eau = np.asarray(est_eau, dtype=bool)
+            score_negatif = np.where(eau, 0, score_negatif)
+            score_positif = np.where(eau, 0, score_positif)
+            score = np.where(eau, -10, score)
+
+        bornes = np.array([min_val for min_val, _, _, _ in cls.CLASSES_BOISSONS], dtype=float)
+        labels = np.array([classe for _, _, classe, _ in cls.CLASSES_BOISSONS], dtype=object)
+        couleurs = np.array([coul for _, _, _, coul in cls.CLASSES_BOISSONS], dtype=object)
+        idx_classe = np.searchsorted(bornes, score, side='right') - 1
+
+        return {
+            'score': score,
+            'label': labels[idx_classe],
+            'couleur': couleurs[idx_classe],
+            'score_negatif': score_negatif,
+            'score_positif': score_positif
+        }
+
+    @classmethod
+    def calculer_scores_batch(cls, df: pd.DataFrame,
+                              contient_edulcorants: Optional[np.ndarray] = None,
+                              est_eau: Optional[np.ndarray] = None) -> pd.DataFrame:
+        if contient_edulcorants is None:
+            contient_edulcorants = cls.detecter_edulcorants(df)
+        if est_eau is None:
+            est_eau = (df['Categorie'].astype(str).str.lower() == 'eau').to_numpy(dtype=bool)
+
+        def colonne(nom: str) -> np.ndarray:
+            return cls.valeurs_colonne(df, nom)
+
+        resultats = cls.calculer_scores_tableaux(
+            colonne('Energie_kJ'),
+            colonne('Acides_Gras_Satures_g'),
+            colonne('Sucres_g'),
+            colonne('Sel_g'),
+            contient_edulcorants,
+            colonne('Proteines_g'),
+            colonne('Fibres_g'),
+            colonne('Fruits_Legumes_Pct'),
+            est_eau
+        )
+
+        return pd.DataFrame({
+            'Score_Nutriscore_Calcule': resultats['score'],
+            'Label_Nutriscore_Calcule': resultats['label'],
+            'Couleur_Nutriscore_Calcule': resultats['couleur'],
+            'Score_Negatif': resultats['score_negatif'],
+            'Score_Positif': resultats['score_positif']
+        }, index=df.index)
+
+    @classmethod
+    def calculer_contrefactuels_batch(cls, df: pd.DataFrame,
+                                      contient_edulcorants: Optional[np.ndarray] = None,
+                                      est_eau: Optional[np.ndarray] = None) -> pd.DataFrame:
+        # Pour chaque produit, le plus petit changement d'un seul nutriment (les
+        # autres inchangés) qui le fait monter d'une classe. Reduction_X : la
+        # valeur doit passer strictement sous Cible_X = valeur - Reduction_X ;
+        # Augmentation_X : la valeur doit atteindre au moins Cible_X. NaN si ce
+        # nutriment seul ne suffit pas (ou valeur manquante) ; tout NaN pour les
+        # eaux et la classe A. Sans_Edulcorants : retirer les édulcorants suffit
+        if contient_edulcorants is None:
+            contient_edulcorants = cls.detecter_edulcorants(df)
+        if est_eau is None:
+            est_eau = (df['Categorie'].astype(str).str.lower() == 'eau').to_numpy(dtype=bool)
+        edulcorants = np.asarray(contient_edulcorants, dtype=bool)
+        valeurs = {nom: cls.valeurs_colonne(df, nom)
+                   for nom, _ in cls.NUTRIMENTS_NEGATIFS + cls.NUTRIMENTS_POSITIFS}
+        points = {nom: cls.get_points_tableau(valeurs[nom], table)
+                  for nom, table in cls.NUTRIMENTS_NEGATIFS + cls.NUTRIMENTS_POSITIFS}
+
+        scores = cls.calculer_scores_tableaux(
+            *(valeurs[nom] for nom, _ in cls.NUTRIMENTS_NEGATIFS), edulcorants,
+            *(valeurs[nom] for nom, _ in cls.NUTRIMENTS_POSITIFS), est_eau
+        )
+
+        # Points à perdre : score - borne haute de la classe suivante
+        labels = np.array([classe for _, _, classe, _ in cls.CLASSES_BOISSONS], dtype=object)
+        maximums = np.array([max_val for _, max_val, _, _ in cls.CLASSES_BOISSONS], dtype=float)
+        idx_classe = np.searchsorted(labels, scores['label'])
+        vise = (idx_classe > 0) & ~np.asarray(est_eau, dtype=bool)
+        ecart = np.where(vise, scores['score'] - maximums[np.maximum(idx_classe - 1, 0)], 0).astype(np.int64)
+
+        resultats = {
+            'Classe_Actuelle': scores['label'],
+            'Classe_Visee': np.where(vise, labels[np.maximum(idx_classe - 1, 0)], None),
+            'Points_A_Gagner': ecart
+        }
+
+        # Points comparés dans la précision des valeurs (get_points_tableau) ;
+        # cibles publiées telles qu'écrites dans les tables, écarts arrondis à
+        # la précision des valeurs
+        def decimales(v: np.ndarray) -> Tuple[np.ndarray, int]:
+            chiffres = np.finfo(v.dtype if v.dtype.kind == 'f' else float).precision + 1
+            return cls.arrondir_chiffres(v.astype(float), v, chiffres), chiffres
+
+        # Composante négative : points du nutriment ramenés à (points - écart)
+        for nom, table in cls.NUTRIMENTS_NEGATIFS:
+            v, chiffres = decimales(valeurs[nom])
+            cibles = cls.seuils_au_plus(table)
+            restants = points[nom] - ecart
+            possible = vise & (restants >= 0) & ~np.isnan(v)
+            cible = np.where(possible, cibles[np.clip(restants, 0, len(cibles) - 1)], np.nan)
+            resultats[f'Reduction_{nom}'] = cls.arrondir_chiffres(v - cible, v, chiffres)
+            resultats[f'Cible_{nom}'] = cible
+
+        resultats['Sans_Edulcorants'] = vise & edulcorants & (ecart <= cls.POINTS_EDULCORANTS)
+
+        # Composante positive : gain limité par le plafond MAX_POINTS_P
+        brut = sum(points[nom] for nom, _ in cls.NUTRIMENTS_POSITIFS)
+        sous_plafond = vise & (np.minimum(brut, cls.MAX_POINTS_P) + ecart <= cls.MAX_POINTS_P)
+        for nom, table in cls.NUTRIMENTS_POSITIFS:
+            v, chiffres = decimales(valeurs[nom])
+            cibles = cls.seuils_au_moins(table)
+            requis = points[nom] + ecart
+            possible = sous_plafond & (requis < len(cibles)) & ~np.isnan(v)
+            cible = np.where(possible, cibles[np.clip(requis, 0, len(cibles) - 1)], np.nan)
+            resultats[f'Augmentation_{nom}'] = cls.arrondir_chiffres(cible - v, v, chiffres)
+            resultats[f'Cible_{nom}'] = cible
+
+        return pd.DataFrame(resultats, index=df.index)
+
+
 class ElectreTri:
 
+    NOMS_PROFILS = ['b1', 'b2', 'b3', 'b4', 'b5', 'b6']
+    CLASSES = np.array(['A', 'B', 'C', 'D', 'E'], dtype=object)
+
     def __init__(self, poids: Dict[str, float], profils: pd.DataFrame, lambda_seuil: float = 0.6):
         self.poids = poids
         self.profils = profils
         self.lambda_seuil = lambda_seuil
+        # Comparaisons produits / profils conservées par preparer()
+        self.comparaisons: Optional[Dict] = None
 
         self.criteres_a_minimiser = [
             'Energie_kJ', 'Acides_Gras_Satures_g',
@@ -208,22 +435,425 @@ class ElectreTri:
                 return {1: 'E', 2: 'D', 3: 'C', 4: 'B', 5: 'A', 6: 'A'}[i]
         return 'A'
 
-    def classifier_base_donnees(self, df: pd.DataFrame, methode: str = 'pessimiste') -> pd.DataFrame:
-        resultats = []
-        for idx, aliment in df.iterrows():
-            if methode == 'pessimiste':
-                classe = self.affectation_pessimiste(aliment)
-            else:
-                classe = self.affectation_optimiste(aliment)
-            resultats.append(classe)
-        
+    def matrice_profils(self) -> np.ndarray:
+        # (profils, critères), critères dans l'ordre de self.poids
+        return self.profils.loc[self.NOMS_PROFILS, list(self.poids.keys())].to_numpy(dtype=float)
+
+    def comparer_aux_profils(self, valeurs: np.ndarray,
+                             profils: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        # Concordances partielles de tous les produits face à b1..b6 :
+        # tenseurs booléens (produits, profils, critères), critères dans l'ordre de self.poids.
+        # profils : (profils, critères) communs ou (produits, profils, critères) propres
+        # à chaque produit ; par défaut self.profils
+        criteres = list(self.poids.keys())
+        profils = self.matrice_profils() if profils is None else profils
+        maximiser = np.array([critere in self.criteres_a_maximiser for critere in criteres])
+
+        a = valeurs[:, np.newaxis, :]
+        b = profils if profils.ndim == 3 else profils[np.newaxis, :, :]
+        a_sup_b = a >= b
+        b_sup_a = b >= a
+
+        c_ab = np.where(maximiser, a_sup_b, b_sup_a)
+        c_ba = np.where(maximiser, b_sup_a, a_sup_b)
+        return c_ab, c_ba
+
+    @staticmethod
+    def empaqueter(comparaisons: np.ndarray) -> np.ndarray:
+        # (..., critères) booléen -> (..., groupes) uint8 : le bit i du groupe g
+        # correspond au critère 8 * g + i (produit par les puissances de 2,
+        # plus rapide que np.packbits sur un dernier axe aussi court)
+        nb_criteres = comparaisons.shape[-1]
+        complement = -nb_criteres % 8
+        if complement:
+            comparaisons = np.concatenate(
+                [comparaisons, np.zeros(comparaisons.shape[:-1] + (complement,), dtype=bool)], axis=-1
+            )
+        octets = np.ascontiguousarray(comparaisons, dtype=bool).view(np.uint8)
+        octets = octets.reshape(comparaisons.shape[:-1] + (-1, 8))
+        return octets @ (1 << np.arange(8, dtype=np.uint8))
+
+    def tables_poids(self, criteres: List[str]) -> np.ndarray:
+        # Table (groupes, 256) : somme des poids des critères dont le bit est à 1,
+        # divisée par la somme des poids. Les poids sont ajoutés un par un dans
+        # l'ordre de self.poids, comme dans concordance_globale : avec au plus
+        # 8 critères (un seul groupe) les concordances sont identiques au bit près
+        position = {critere: k for k, critere in enumerate(criteres)}
+        codes = np.arange(256)
+        tables = np.zeros(((len(criteres) + 7) // 8, 256))
+        for critere, poids in self.poids.items():
+            groupe, bit = divmod(position[critere], 8)
+            np.add(tables[groupe], poids, out=tables[groupe], where=((codes >> bit) & 1) == 1)
+        return tables / sum(self.poids.values())
+
+    @staticmethod
+    def concordances_tables(tables: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        C = tables[0][codes[..., 0]]
+        for groupe in range(1, len(tables)):
+            C += tables[groupe][codes[..., groupe]]
+        return C
+
+    @classmethod
+    def surclassements_tables(cls, tables: np.ndarray, codes: np.ndarray, lambda_seuil: float) -> np.ndarray:
+        # Un seul groupe : seuillage de la table (256 valeurs) puis lecture,
+        # sans tenseur flottant intermédiaire
+        if len(tables) == 1:
+            return (tables[0] >= lambda_seuil)[codes[..., 0]]
+        return cls.concordances_tables(tables, codes) >= lambda_seuil
+
+    def concordances_depuis_comparaisons(self, c_ab: np.ndarray, c_ba: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        tables = self.tables_poids(list(self.poids.keys()))
+        return (self.concordances_tables(tables, self.empaqueter(c_ab)),
+                self.concordances_tables(tables, self.empaqueter(c_ba)))
+
+    @staticmethod
+    def codes_pessimistes(S_ab: np.ndarray) -> np.ndarray:
+        # Premier profil surclassé en partant de b6 ; rang 0 = aucun
+        carte = np.array([4, 4, 4, 3, 2, 1, 0], dtype=np.int8)
+        rang = np.where(S_ab.any(axis=1), S_ab.shape[1] - np.argmax(S_ab[:, ::-1], axis=1), 0)
+        return carte[rang]
+
+    @staticmethod
+    def codes_optimistes(S_ab: np.ndarray, S_ba: np.ndarray) -> np.ndarray:
+        # Premier profil qui domine strictement le produit en partant de b1 ; rang 0 = aucun
+        carte = np.array([0, 4, 3, 2, 1, 0, 0], dtype=np.int8)
+        preference = S_ba & ~S_ab
+        rang = np.where(preference.any(axis=1), np.argmax(preference, axis=1) + 1, 0)
+        return carte[rang]
+
+    def codes_depuis_surclassements(self, S_ab: np.ndarray, S_ba: Optional[np.ndarray],
+                                    methode: str = 'pessimiste') -> np.ndarray:
+        if methode == 'pessimiste':
+            return self.codes_pessimistes(S_ab)
+        return self.codes_optimistes(S_ab, S_ba)
+
+    def codes_depuis_concordances(self, C_ab: np.ndarray, C_ba: np.ndarray,
+                                  lambda_seuil: float, methode: str = 'pessimiste') -> np.ndarray:
+        S_ba = C_ba >= lambda_seuil if methode != 'pessimiste' else None
+        return self.codes_depuis_surclassements(C_ab >= lambda_seuil, S_ba, methode)
+
+    def surclassements(self, valeurs: np.ndarray, avec_ba: bool = True,
+                       profils: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        # S_ab / S_ba (produits, profils) via les comparaisons empaquetées et la table des poids
+        c_ab, c_ba = self.comparer_aux_profils(valeurs, profils)
+        tables = self.tables_poids(list(self.poids.keys()))
+        S_ab = self.surclassements_tables(tables, self.empaqueter(c_ab), self.lambda_seuil)
+        S_ba = self.surclassements_tables(tables, self.empaqueter(c_ba), self.lambda_seuil) if avec_ba else None
+        return S_ab, S_ba
+
+    def classer_tableau(self, valeurs: np.ndarray, methode: str = 'pessimiste') -> np.ndarray:
+        S_ab, S_ba = self.surclassements(valeurs, avec_ba=(methode != 'pessimiste'))
+        return self.codes_depuis_surclassements(S_ab, S_ba, methode)
+
+    def valeurs_criteres(self, df: pd.DataFrame) -> np.ndarray:
+        return df[list(self.poids.keys())].to_numpy(dtype=float, na_value=np.nan)
+
+    def classifier_base_donnees(self, df: pd.DataFrame, methode: str = 'pessimiste',
+                                taille_bloc: int = 100_000) -> pd.DataFrame:
+        # Classification vectorisée, par blocs de lignes pour borner la mémoire
+        valeurs = self.valeurs_criteres(df)
+        codes = np.empty(len(df), dtype=np.int8)
+
+        for debut in range(0, len(df), taille_bloc):
+            fin = debut + taille_bloc
+            codes[debut:fin] = self.classer_tableau(valeurs[debut:fin], methode)
+
         df_resultat = df.copy()
-        df_resultat[f'Classe_ELECTRE_{methode.capitalize()}'] = resultats
+        df_resultat[f'Classe_ELECTRE_{methode.capitalize()}'] = self.CLASSES[codes]
         return df_resultat
 
+    def profils_par_produit(self, df: pd.DataFrame, profils_categories: pd.DataFrame,
+                            colonne: str = 'Categorie') -> Tuple[np.ndarray, np.ndarray]:
+        # Table (catégories + 1, profils, critères) et indice de ligne de chaque
+        # produit ; la dernière entrée (self.profils) sert aux catégories absentes
+        # de profils_categories (trop petites, inconnues ou manquantes)
+        criteres = list(self.poids.keys())
+        categories = profils_categories.index.get_level_values(0).unique()
+        lignes = pd.MultiIndex.from_product([categories, self.NOMS_PROFILS])
+        table = profils_categories.reindex(lignes)[criteres].to_numpy(dtype=float)
+        table = np.concatenate([table.reshape(len(categories), len(self.NOMS_PROFILS), len(criteres)),
+                                self.matrice_profils()[np.newaxis]])
+
+        indices = categories.get_indexer(df[colonne].astype(object))
+        indices[indices < 0] = len(categories)
+        return table, indices
+
+    def classifier_deux_procedures(self, df: pd.DataFrame, taille_bloc: int = 100_000,
+                                   profils_categories: Optional[pd.DataFrame] = None,
+                                   colonne: str = 'Categorie') -> pd.DataFrame:
+        # Chaque relation de surclassement produit/profil n'est évaluée qu'une fois
+        # et alimente les deux procédures ; les produits où elles divergent sont
+        # incomparables avec au moins un profil. Avec profils_categories
+        # (creer_profils_categories), chaque produit est comparé aux profils de sa
+        # catégorie, ou aux profils globaux à défaut (colonne Profils_Categorie)
+        valeurs = self.valeurs_criteres(df)
+        codes_pess = np.empty(len(df), dtype=np.int8)
+        codes_opt = np.empty(len(df), dtype=np.int8)
+        if profils_categories is not None:
+            table, indices = self.profils_par_produit(df, profils_categories, colonne)
+
+        for debut in range(0, len(df), taille_bloc):
+            fin = debut + taille_bloc
+            profils = None if profils_categories is None else table[indices[debut:fin]]
+            S_ab, S_ba = self.surclassements(valeurs[debut:fin], profils=profils)
+            codes_pess[debut:fin] = self.codes_pessimistes(S_ab)
+            codes_opt[debut:fin] = self.codes_optimistes(S_ab, S_ba)
+
+        df_resultat = df.copy()
+        df_resultat['Classe_ELECTRE_Pessimiste'] = self.CLASSES[codes_pess]
+        df_resultat['Classe_ELECTRE_Optimiste'] = self.CLASSES[codes_opt]
+        df_resultat['Incomparabilite_ELECTRE'] = codes_pess != codes_opt
+        if profils_categories is not None:
+            df_resultat['Profils_Categorie'] = indices < len(table) - 1
+        return df_resultat
+
+    def preparer(self, df: pd.DataFrame, comparaisons: Optional[Dict] = None,
+                 taille_bloc: int = 100_000) -> 'ElectreTri':
+        # Les concordances partielles ne dépendent ni des poids ni de λ : elles sont
+        # calculées une fois, empaquetées (un code uint8 par produit, profil et
+        # groupe de 8 critères), et reclassifier() n'a plus qu'à les lire dans la
+        # table des poids. À refaire si les profils ou les données changent.
+        # Comparaisons fournies (cache) : l'index est toujours celui de df
+        criteres = list(self.poids.keys())
+        if comparaisons is not None:
+            if (sorted(comparaisons['criteres']) != sorted(criteres)
+                    or self.nb_produits_prepares(comparaisons) != len(df)):
+                raise ValueError("Comparaisons incompatibles avec ces critères ou ces données")
+            self.comparaisons = {**comparaisons, 'index': df.index}
+            return self
+
+        valeurs = self.valeurs_criteres(df)
+        forme = (len(df), len(self.NOMS_PROFILS), (len(criteres) + 7) // 8)
+        codes_ab = np.empty(forme, dtype=np.uint8)
+        codes_ba = np.empty(forme, dtype=np.uint8)
+
+        for debut in range(0, len(df), taille_bloc):
+            fin = debut + taille_bloc
+            c_ab, c_ba = self.comparer_aux_profils(valeurs[debut:fin])
+            codes_ab[debut:fin] = self.empaqueter(c_ab)
+            codes_ba[debut:fin] = self.empaqueter(c_ba)
+
+        self.comparaisons = {'criteres': criteres, 'ab': codes_ab, 'ba': codes_ba, 'index': df.index}
+        return self
+
+    @staticmethod
+    def nb_produits_prepares(comparaisons: Dict) -> int:
+        return len(comparaisons['ab'])
+
+    def concordances_preparees(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self.comparaisons is None:
+            raise ValueError("preparer(df) doit être appelé avant reclassifier()")
+        tables = self.tables_poids(self.comparaisons['criteres'])
+        return (self.concordances_tables(tables, self.comparaisons['ab']),
+                self.concordances_tables(tables, self.comparaisons['ba']))
+
+    def reclassifier(self, poids: Optional[Dict[str, float]] = None, lambda_seuil: Optional[float] = None,
+                     methode: str = 'pessimiste') -> pd.Series:
+        if self.comparaisons is None:
+            raise ValueError("preparer(df) doit être appelé avant reclassifier()")
+        if poids is not None:
+            if sorted(poids) != sorted(self.comparaisons['criteres']):
+                raise ValueError("Les poids doivent porter sur les critères préparés")
+            self.poids = poids
+        if lambda_seuil is not None:
+            self.lambda_seuil = lambda_seuil
+
+        tables = self.tables_poids(self.comparaisons['criteres'])
+        S_ab = self.surclassements_tables(tables, self.comparaisons['ab'], self.lambda_seuil)
+        S_ba = None
+        if methode != 'pessimiste':
+            S_ba = self.surclassements_tables(tables, self.comparaisons['ba'], self.lambda_seuil)
+
+        codes = self.codes_depuis_surclassements(S_ab, S_ba, methode)
+        return pd.Series(self.CLASSES[codes], index=self.comparaisons['index'],
+                         name=f'Classe_ELECTRE_{methode.capitalize()}')
+
+    def classifier_multi_lambda(self, df: pd.DataFrame, lambdas: List[float],
+                                methodes: Tuple[str, ...] = ('pessimiste', 'optimiste'),
+                                taille_bloc: int = 100_000) -> pd.DataFrame:
+        # Les comparaisons empaquetées ne dépendent pas de λ : calculées une
+        # seule fois par bloc puis lues dans la table seuillée de chaque (λ, procédure)
+        colonnes = pd.MultiIndex.from_product([list(lambdas), list(methodes)], names=['lambda', 'methode'])
+        valeurs = self.valeurs_criteres(df)
+        codes = np.empty((len(df), len(colonnes)), dtype=np.int8)
+        tables = self.tables_poids(list(self.poids.keys()))
+
+        for debut in range(0, len(df), taille_bloc):
+            fin = debut + taille_bloc
+            c_ab, c_ba = self.comparer_aux_profils(valeurs[debut:fin])
+            codes_ab, codes_ba = self.empaqueter(c_ab), self.empaqueter(c_ba)
+            for j, (lambda_seuil, methode) in enumerate(colonnes):
+                S_ab = self.surclassements_tables(tables, codes_ab, lambda_seuil)
+                S_ba = self.surclassements_tables(tables, codes_ba, lambda_seuil) if methode != 'pessimiste' else None
+                codes[debut:fin, j] = self.codes_depuis_surclassements(S_ab, S_ba, methode)
+
+        return pd.DataFrame(self.CLASSES[codes], index=df.index, columns=colonnes)
+
+
+class ElectreTriComplet(ElectreTri):
+    # ELECTRE TRI avec seuils d'indifférence q, de préférence p et de veto v par
+    # critère : concordance partielle linéaire par morceaux, indices de
+    # discordance et indice de crédibilité σ(a, b). Avec q = p = 0 et sans veto,
+    # on retrouve exactement ElectreTri.
+
+    def __init__(self, poids: Dict[str, float], profils: pd.DataFrame, seuils: pd.DataFrame,
+                 lambda_seuil: float = 0.6):
+        super().__init__(poids, profils, lambda_seuil)
+        self.seuils = self.verifier_seuils(seuils)
+
+    def verifier_seuils(self, seuils) -> pd.DataFrame:
+        # seuils : lignes q, p, v et une colonne par critère (v = inf : pas de veto)
+        seuils = pd.DataFrame(seuils).loc[['q', 'p', 'v'], list(self.poids.keys())].astype(float)
+        q, p, v = seuils.to_numpy()
+        if (q < 0).any() or (p < q).any() or (v < p).any():
+            raise ValueError("Les seuils doivent vérifier 0 <= q <= p <= v pour chaque critère")
+        return seuils
+
+    def ecarts_aux_profils(self, valeurs: np.ndarray, profils: Optional[np.ndarray] = None) -> np.ndarray:
+        # Avance du profil b sur le produit a, un plan (produits, profils) par critère
+        # dans l'ordre de self.poids : positive quand b est meilleur ; l'écart de b
+        # face à a est son opposé. profils : comme pour comparer_aux_profils
+        criteres = list(self.poids.keys())
+        profils = self.matrice_profils() if profils is None else profils
+        ecarts = np.empty((len(criteres), len(valeurs), len(self.NOMS_PROFILS)))
+        for k, critere in enumerate(criteres):
+            np.subtract(profils[..., k], valeurs[:, k, np.newaxis], out=ecarts[k])
+            if critere not in self.criteres_a_maximiser:
+                np.negative(ecarts[k], out=ecarts[k])
+        return ecarts
+
+    def indices_partiels(self, ecarts: np.ndarray, criteres: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        # Concordance : 1 jusqu'à q, 0 à partir de p, linéaire entre les deux.
+        # Discordance : 0 jusqu'à p, 1 à partir de v, linéaire entre les deux.
+        # Valeur manquante : ni concordance ni discordance (fmax renvoie 0 pour NaN),
+        # comme la comparaison stricte. criteres : ordre des plans (par défaut self.poids)
+        criteres = list(self.poids.keys()) if criteres is None else criteres
+        concordance = np.empty_like(ecarts)
+        discordance = np.empty_like(ecarts)
+
+        for k, (q, p, v) in enumerate(self.seuils[criteres].to_numpy().T):
+            ecart = ecarts[k]
+            if p == q:
+                concordance[k] = ecart <= q
+            else:
+                np.fmin(np.fmax((p - ecart) / (p - q), 0.0), 1.0, out=concordance[k])
+            if v == p:
+                discordance[k] = ecart > p
+            else:
+                np.fmin(np.fmax((ecart - p) / (v - p), 0.0), 1.0, out=discordance[k])
+        return concordance, discordance
+
+    def credibilites(self, concordance: np.ndarray, discordance: np.ndarray,
+                     criteres: Optional[List[str]] = None) -> np.ndarray:
+        # σ = C × Π (1 - d_j) / (1 - C) sur les critères où d_j > C ;
+        # C accumulée critère par critère dans l'ordre de self.poids, comme concordance_globale
+        criteres = list(self.poids.keys()) if criteres is None else criteres
+        position = {critere: k for k, critere in enumerate(criteres)}
+        somme_poids = sum(self.poids.values())
+        C = np.zeros(concordance.shape[1:])
+        for critere, poids in self.poids.items():
+            C += poids * concordance[position[critere]]
+        C /= somme_poids
+
+        sigma = C.copy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for d in discordance:
+                if d.any():
+                    sigma *= np.where(d > C, (1 - d) / (1 - C), 1.0)
+        return sigma
+
+    def credibilites_ecarts(self, ecarts: np.ndarray, avec_ba: bool = True) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        sigma_ab = self.credibilites(*self.indices_partiels(ecarts))
+        sigma_ba = self.credibilites(*self.indices_partiels(-ecarts)) if avec_ba else None
+        return sigma_ab, sigma_ba
+
+    def credibilites_aux_profils(self, valeurs: np.ndarray, avec_ba: bool = True,
+                                 profils: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        return self.credibilites_ecarts(self.ecarts_aux_profils(valeurs, profils), avec_ba)
+
+    def surclassements_ecarts(self, ecarts: np.ndarray, avec_ba: bool = True) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        sigma_ab, sigma_ba = self.credibilites_ecarts(ecarts, avec_ba)
+        S_ba = sigma_ba >= self.lambda_seuil if avec_ba else None
+        return sigma_ab >= self.lambda_seuil, S_ba
+
+    def surclassements(self, valeurs: np.ndarray, avec_ba: bool = True,
+                       profils: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        return self.surclassements_ecarts(self.ecarts_aux_profils(valeurs, profils), avec_ba)
+
+    def classifier_multi_lambda(self, df: pd.DataFrame, lambdas: List[float],
+                                methodes: Tuple[str, ...] = ('pessimiste', 'optimiste'),
+                                taille_bloc: int = 100_000) -> pd.DataFrame:
+        # Les crédibilités ne dépendent pas de λ : calculées une fois par bloc
+        colonnes = pd.MultiIndex.from_product([list(lambdas), list(methodes)], names=['lambda', 'methode'])
+        valeurs = self.valeurs_criteres(df)
+        codes = np.empty((len(df), len(colonnes)), dtype=np.int8)
+
+        for debut in range(0, len(df), taille_bloc):
+            fin = debut + taille_bloc
+            sigma_ab, sigma_ba = self.credibilites_aux_profils(valeurs[debut:fin])
+            for j, (lambda_seuil, methode) in enumerate(colonnes):
+                codes[debut:fin, j] = self.codes_depuis_concordances(sigma_ab, sigma_ba, lambda_seuil, methode)
+
+        return pd.DataFrame(self.CLASSES[codes], index=df.index, columns=colonnes)
+
+    def preparer(self, df: pd.DataFrame, comparaisons: Optional[Dict] = None,
+                 taille_bloc: int = 100_000) -> 'ElectreTriComplet':
+        # Les seuils pouvant changer à chaque reclassification, on ne garde que les
+        # valeurs des critères (float32 si la conversion est exacte, soit 4 octets
+        # par produit et critère) ; les écarts aux profils sont recalculés par
+        # blocs de taille_bloc produits, à l'identique de classifier_base_donnees
+        if comparaisons is not None:
+            if 'valeurs' not in comparaisons:
+                raise ValueError("Comparaisons préparées par ElectreTri, sans les valeurs des critères")
+            return super().preparer(df, comparaisons, taille_bloc)
+        valeurs = self.valeurs_criteres(df)
+        compactes = valeurs.astype(np.float32)
+        if np.array_equal(compactes, valeurs, equal_nan=True):
+            valeurs = compactes
+        self.comparaisons = {'criteres': list(self.poids.keys()), 'valeurs': valeurs,
+                             'taille_bloc': taille_bloc, 'index': df.index}
+        return self
+
+    @staticmethod
+    def nb_produits_prepares(comparaisons: Dict) -> int:
+        return len(comparaisons['valeurs'])
+
+    def reclassifier(self, poids: Optional[Dict[str, float]] = None, lambda_seuil: Optional[float] = None,
+                     methode: str = 'pessimiste', seuils: Optional[pd.DataFrame] = None) -> pd.Series:
+        if self.comparaisons is None:
+            raise ValueError("preparer(df) doit être appelé avant reclassifier()")
+        criteres = self.comparaisons['criteres']
+        if poids is not None:
+            if sorted(poids) != sorted(criteres):
+                raise ValueError("Les poids doivent porter sur les critères préparés")
+            self.poids = poids
+        if lambda_seuil is not None:
+            self.lambda_seuil = lambda_seuil
+        if seuils is not None:
+            self.seuils = self.verifier_seuils(seuils)
+
+        # Écarts calculés dans l'ordre des critères préparés (ordre des plans)
+        valeurs = self.comparaisons['valeurs']
+        taille_bloc = self.comparaisons['taille_bloc']
+        position = {critere: k for k, critere in enumerate(criteres)}
+        ordre = [position[critere] for critere in self.poids]
+        codes = np.empty(len(valeurs), dtype=np.int8)
+        for debut in range(0, len(valeurs), taille_bloc):
+            fin = debut + taille_bloc
+            ecarts = self.ecarts_aux_profils(valeurs[debut:fin, ordre].astype(float))
+            S_ab, S_ba = self.surclassements_ecarts(ecarts, methode != 'pessimiste')
+            codes[debut:fin] = self.codes_depuis_surclassements(S_ab, S_ba, methode)
+
+        return pd.Series(self.CLASSES[codes], index=self.comparaisons['index'],
+                         name=f'Classe_ELECTRE_{methode.capitalize()}')
+
 
 class SuperNutriScore:
 
+    NUTRI_MAPPING = {'A': 0, 'B': 1, 'C': 2, 'D': 3, 'E': 4}
+    GREEN_MAPPING = {'A-PLUS': 0, 'A': 1, 'B': 2, 'C': 3, 'D': 4, 'E': 5, 'F': 6, 'NOT-APPLICABLE': 3}
+    BIO_MAPPING = {'OUI': 0, 'NON': 1}
+
     @staticmethod
     def normaliser_score(score: int, min_val: int, max_val: int) -> float:
         if max_val == min_val:
@@ -235,13 +865,9 @@ class SuperNutriScore:
                             poids_nutri: float = 0.5, poids_green: float = 0.3,
                             poids_bio: float = 0.2) -> Dict:
 
-        nutri_mapping = {'A': 0, 'B': 1, 'C': 2, 'D': 3, 'E': 4}
-        green_mapping = {'A-PLUS': 0, 'A': 1, 'B': 2, 'C': 3, 'D': 4, 'E': 5, 'F': 6, 'NOT-APPLICABLE': 3}
-        bio_mapping = {'OUI': 0, 'NON': 1}
-        
-        score_nutri = nutri_mapping.get(nutriscore, 4)
-        score_green = green_mapping.get(greenscore, 3)
-        score_bio = bio_mapping.get(label_bio, 1)
+        score_nutri = cls.NUTRI_MAPPING.get(nutriscore, 4)
+        score_green = cls.GREEN_MAPPING.get(greenscore, 3)
+        score_bio = cls.BIO_MAPPING.get(label_bio, 1)
         
         nutri_norm = cls.normaliser_score(score_nutri, 0, 4)
         green_norm = cls.normaliser_score(score_green, 0, 6)
@@ -276,74 +902,283 @@ class SuperNutriScore:
         }
 
 
+    @classmethod
+    @lru_cache(maxsize=64)
+    def cube_super_score(cls, poids_nutri: float = 0.5, poids_green: float = 0.3,
+                         poids_bio: float = 0.2) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Toutes les combinaisons (nutri, green, bio) pour un jeu de poids :
+        # 5 x 8 x 2 cellules calculées avec calculer_super_score, mémorisées par poids
+        forme = (len(cls.NUTRI_MAPPING), len(cls.GREEN_MAPPING), len(cls.BIO_MAPPING))
+        scores = np.empty(forme)
+        classes = np.empty(forme, dtype=object)
+        couleurs = np.empty(forme, dtype=object)
+
+        for i, nutriscore in enumerate(cls.NUTRI_MAPPING):
+            for j, greenscore in enumerate(cls.GREEN_MAPPING):
+                for k, label_bio in enumerate(cls.BIO_MAPPING):
+                    resultat = cls.calculer_super_score(nutriscore, greenscore, label_bio,
+                                                        poids_nutri, poids_green, poids_bio)
+                    scores[i, j, k] = resultat['score']
+                    classes[i, j, k] = resultat['classe']
+                    couleurs[i, j, k] = resultat['couleur']
+
+        for cube in (scores, classes, couleurs):
+            cube.flags.writeable = False
+        return scores, classes, couleurs
+
+    @staticmethod
+    def codes_modalites(serie: pd.Series, modalites: List[str], defaut: str) -> np.ndarray:
+        # Valeurs inconnues ou manquantes -> modalité par défaut (comme les .get de calculer_super_score)
+        codes = pd.Categorical(serie, categories=modalites).codes.astype(np.intp)
+        codes[codes < 0] = modalites.index(defaut)
+        return codes
+
+    @classmethod
+    def calculer_super_scores_batch(cls, df: pd.DataFrame, poids_nutri: float = 0.5,
+                                    poids_green: float = 0.3, poids_bio: float = 0.2,
+                                    cube: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> pd.DataFrame:
+        # cube : résultat de cube_super_score pour ces poids (par exemple lu dans un cache)
+        if cube is None:
+            cube = cls.cube_super_score(poids_nutri, poids_green, poids_bio)
+        scores, classes, couleurs = cube
+
+        i = cls.codes_modalites(df['Label_Nutriscore'], list(cls.NUTRI_MAPPING), 'E')
+        j = cls.codes_modalites(df['Label_Greenscore'], list(cls.GREEN_MAPPING), 'NOT-APPLICABLE')
+        k = cls.codes_modalites(df['Label_Bio'], list(cls.BIO_MAPPING), 'NON')
+
+        return pd.DataFrame({
+            'SuperNutri_Score': scores[i, j, k],
+            'SuperNutri_Classe': classes[i, j, k],
+            'SuperNutri_Couleur': couleurs[i, j, k]
+        }, index=df.index)
+
+
 class AnalyseResultats:
 
+    CLASSES = ['A', 'B', 'C', 'D', 'E']
+
+    @classmethod
+    def codes_classes(cls, valeurs) -> np.ndarray:
+        # Codes 0..4 pour A..E (apostrophes et espaces retirés), -1 sinon ;
+        # le nettoyage ne porte que sur les modalités distinctes
+        if not isinstance(valeurs, (pd.Series, pd.Index, np.ndarray)):
+            valeurs = pd.Series(valeurs, dtype=object)
+        codes, modalites = pd.factorize(valeurs)
+
+        correspondance = {classe: i for i, classe in enumerate(cls.CLASSES)}
+        table = np.array(
+            [correspondance.get(str(m).replace("'", "").strip(), -1) for m in modalites] + [-1],
+            dtype=np.intp
+        )
+        return table[codes]
+
+    @classmethod
+    def matrice_confusion(cls, vraies_classes: pd.Series, classes_predites: pd.Series) -> pd.DataFrame:
+        vraies = cls.codes_classes(vraies_classes)
+        predites = cls.codes_classes(classes_predites)
+        n = min(len(vraies), len(predites))
+        vraies, predites = vraies[:n], predites[:n]
+
+        valide = (vraies >= 0) & (predites >= 0)
+        k = len(cls.CLASSES)
+        comptes = np.bincount(vraies[valide] * k + predites[valide], minlength=k * k)
+
+        return pd.DataFrame(comptes.reshape(k, k), index=cls.CLASSES, columns=cls.CLASSES)
+
+    @classmethod
+    def matrices_confusion_lot(cls, vraies_classes: pd.Series, predictions) -> np.ndarray:
+        # predictions : DataFrame (une colonne par jeu de paramètres) ou tableau (jeux, produits) ;
+        # renvoie la pile (jeux, 5, 5) des matrices de confusion
+        if isinstance(predictions, pd.DataFrame):
+            predictions = predictions.to_numpy().T
+        predictions = np.asarray(predictions)
+        if predictions.ndim == 1:
+            predictions = predictions[np.newaxis, :]
+
+        vraies = cls.codes_classes(vraies_classes)
+        predites = cls.codes_classes(predictions.ravel()).reshape(predictions.shape)
+        n = min(len(vraies), predites.shape[1])
+        vraies, predites = vraies[:n], predites[:, :n]
+
+        k = len(cls.CLASSES)
+        n_jeux = predites.shape[0]
+        valide = (vraies >= 0) & (predites >= 0)
+        indices = np.arange(n_jeux)[:, np.newaxis] * (k * k) + vraies * k + predites
+
+        comptes = np.bincount(indices[valide], minlength=n_jeux * k * k)
+        return comptes.reshape(n_jeux, k, k)
+
     @staticmethod
-    def matrice_confusion(vraies_classes: pd.Series, classes_predites: pd.Series) -> pd.DataFrame:
-        classes = ['A', 'B', 'C', 'D', 'E']
-        matrice = pd.DataFrame(0, index=classes, columns=classes)
-        
-        for vrai, pred in zip(vraies_classes, classes_predites):
-            vrai_clean = str(vrai).replace("'", "").strip()
-            pred_clean = str(pred).replace("'", "").strip()
-            
-            if vrai_clean in classes and pred_clean in classes:
-                matrice.loc[vrai_clean, pred_clean] += 1
-        
-        return matrice
+    def accuracies_lot(matrices: np.ndarray) -> np.ndarray:
+        totaux = matrices.sum(axis=(1, 2))
+        corrects = np.trace(matrices, axis1=1, axis2=2)
+        return np.divide(corrects, totaux, out=np.zeros(len(matrices)), where=totaux > 0)
 
     @staticmethod
-    def calculer_metriques(matrice: pd.DataFrame) -> Dict:
-        total = matrice.sum().sum()
-        correct = np.trace(matrice)
+    def kappas_ponderes_lot(matrices: np.ndarray, ponderation: str = 'quadratique') -> np.ndarray:
+        # Kappa de Cohen pondéré (désaccords pénalisés selon l'écart entre classes,
+        # linéairement ou au carré) pour une pile (jeux, k, k) de matrices
+        matrices = np.asarray(matrices, dtype=float)
+        k = matrices.shape[-1]
+        ecarts = np.abs(np.subtract.outer(np.arange(k), np.arange(k))) / (k - 1)
+        penalites = ecarts ** 2 if ponderation == 'quadratique' else ecarts
+
+        totaux = matrices.sum(axis=(-2, -1))
+        attendues = (matrices.sum(axis=-1)[..., :, np.newaxis] * matrices.sum(axis=-2)[..., np.newaxis, :])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            attendues = attendues / totaux[..., np.newaxis, np.newaxis]
+            desaccord_observe = (penalites * matrices).sum(axis=(-2, -1))
+            desaccord_attendu = (penalites * attendues).sum(axis=(-2, -1))
+            return np.where(desaccord_attendu > 0, 1 - desaccord_observe / desaccord_attendu, 0.0)
+
+    @classmethod
+    def calculer_metriques(cls, matrice: pd.DataFrame) -> Dict:
+        if not isinstance(matrice, pd.DataFrame):
+            matrice = pd.DataFrame(matrice, index=cls.CLASSES, columns=cls.CLASSES)
+
+        valeurs = matrice.to_numpy()
+        total = valeurs.sum()
+        correct = np.trace(valeurs)
         accuracy = correct / total if total > 0 else 0
-        
-        metriques_par_classe = {}
-        for classe in matrice.index:
-            tp = matrice.loc[classe, classe]
-            fp = matrice[classe].sum() - tp
-            fn = matrice.loc[classe].sum() - tp
-            
-            precision = tp / (tp + fp) if (tp + fp) > 0 else 0
-            rappel = tp / (tp + fn) if (tp + fn) > 0 else 0
-            f1 = 2 * (precision * rappel) / (precision + rappel) if (precision + rappel) > 0 else 0
-            
-            metriques_par_classe[classe] = {
-                'precision': precision,
-                'rappel': rappel,
-                'f1_score': f1
+
+        tp = np.diag(valeurs)
+        predits = valeurs.sum(axis=0)
+        reels = valeurs.sum(axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.where(predits > 0, tp / predits, 0.0)
+            rappel = np.where(reels > 0, tp / reels, 0.0)
+            f1 = np.where(precision + rappel > 0,
+                          2 * (precision * rappel) / (precision + rappel), 0.0)
+
+        metriques_par_classe = {
+            classe: {
+                'precision': precision[i],
+                'rappel': rappel[i],
+                'f1_score': f1[i]
             }
-        
+            for i, classe in enumerate(matrice.index)
+        }
+
         return {'accuracy': accuracy, 'par_classe': metriques_par_classe}
 
 
-def creer_profils_limites(df: pd.DataFrame) -> pd.DataFrame:
-    # Création des 6 profils limites (b1 à b6) basés sur les quantiles
-    criteres = ['Energie_kJ', 'Acides_Gras_Satures_g', 'Sucres_g', 'Sel_g',
-                'Proteines_g', 'Fibres_g', 'Fruits_Legumes_Pct', 'Nombre_Additifs']
-    
-    profils = pd.DataFrame(index=['b1', 'b2', 'b3', 'b4', 'b5', 'b6'], columns=criteres)
-    
-    criteres_minimiser = ['Energie_kJ', 'Acides_Gras_Satures_g', 'Sucres_g', 'Sel_g', 'Nombre_Additifs']
-    criteres_maximiser = ['Proteines_g', 'Fibres_g', 'Fruits_Legumes_Pct']
-    
-    for critere in criteres:
-        if critere in criteres_minimiser:
-            profils.loc['b6', critere] = df[critere].quantile(0.05)
-            profils.loc['b5', critere] = df[critere].quantile(0.20)
-            profils.loc['b4', critere] = df[critere].quantile(0.40)
-            profils.loc['b3', critere] = df[critere].quantile(0.60)
-            profils.loc['b2', critere] = df[critere].quantile(0.80)
-            profils.loc['b1', critere] = df[critere].quantile(0.95)
+class MatriceConfusionCumulee:
+    # Matrice de confusion alimentée bloc par bloc, fusionnable entre
+    # processus (addition associative) et sérialisable en quelques octets
+
+    ENTETE = b'MCC'
+
+    def __init__(self, comptes: Optional[np.ndarray] = None):
+        k = len(AnalyseResultats.CLASSES)
+        if comptes is None:
+            self.comptes = np.zeros((k, k), dtype=np.int64)
         else:
-            profils.loc['b6', critere] = df[critere].quantile(0.95)
-            profils.loc['b5', critere] = df[critere].quantile(0.80)
-            profils.loc['b4', critere] = df[critere].quantile(0.60)
-            profils.loc['b3', critere] = df[critere].quantile(0.40)
-            profils.loc['b2', critere] = df[critere].quantile(0.20)
-            profils.loc['b1', critere] = df[critere].quantile(0.05)
-    
-    return profils.astype(float)
+            self.comptes = np.array(comptes, dtype=np.int64).reshape(k, k)
+
+    def mettre_a_jour(self, vraies_classes: pd.Series, classes_predites: pd.Series) -> 'MatriceConfusionCumulee':
+        self.comptes += AnalyseResultats.matrice_confusion(vraies_classes, classes_predites).to_numpy()
+        return self
+
+    def __add__(self, autre: 'MatriceConfusionCumulee') -> 'MatriceConfusionCumulee':
+        if not isinstance(autre, MatriceConfusionCumulee):
+            return NotImplemented
+        return MatriceConfusionCumulee(self.comptes + autre.comptes)
+
+    def __radd__(self, autre) -> 'MatriceConfusionCumulee':
+        # Permet sum(accumulateurs)
+        if isinstance(autre, int) and autre == 0:
+            return MatriceConfusionCumulee(self.comptes)
+        return self.__add__(autre)
+
+    def __eq__(self, autre) -> bool:
+        if not isinstance(autre, MatriceConfusionCumulee):
+            return NotImplemented
+        return bool(np.array_equal(self.comptes, autre.comptes))
+
+    def __repr__(self) -> str:
+        return f"MatriceConfusionCumulee(total={self.total})"
+
+    @property
+    def total(self) -> int:
+        return int(self.comptes.sum())
+
+    @property
+    def matrice(self) -> pd.DataFrame:
+        classes = AnalyseResultats.CLASSES
+        return pd.DataFrame(self.comptes.copy(), index=classes, columns=classes)
+
+    def calculer_metriques(self) -> Dict:
+        return AnalyseResultats.calculer_metriques(self.matrice)
+
+    def en_octets(self) -> bytes:
+        # Entête + largeur des entiers (1, 2, 4 ou 8 octets) + 25 compteurs little-endian
+        maximum = int(self.comptes.max(initial=0))
+        for largeur, dtype in ((1, '<u1'), (2, '<u2'), (4, '<u4'), (8, '<u8')):
+            if maximum < 2 ** (8 * largeur):
+                break
+        return self.ENTETE + bytes([largeur]) + self.comptes.astype(dtype).tobytes()
+
+    @classmethod
+    def depuis_octets(cls, donnees: bytes) -> 'MatriceConfusionCumulee':
+        # Entête, largeur des comptes (1, 2, 4 ou 8 octets) puis k × k comptes
+        k = len(AnalyseResultats.CLASSES)
+        if len(donnees) <= len(cls.ENTETE) or donnees[:len(cls.ENTETE)] != cls.ENTETE:
+            raise ValueError("Données de matrice de confusion invalides")
+        largeur = donnees[len(cls.ENTETE)]
+        charge = donnees[len(cls.ENTETE) + 1:]
+        if largeur not in (1, 2, 4, 8) or len(charge) != largeur * k * k:
+            raise ValueError("Données de matrice de confusion invalides")
+        comptes = np.frombuffer(charge, dtype=f'<u{largeur}')
+        return cls(comptes)
+
+
+CRITERES = ['Energie_kJ', 'Acides_Gras_Satures_g', 'Sucres_g', 'Sel_g',
+             'Proteines_g', 'Fibres_g', 'Fruits_Legumes_Pct', 'Nombre_Additifs']
+CRITERES_MINIMISER = ['Energie_kJ', 'Acides_Gras_Satures_g', 'Sucres_g', 'Sel_g', 'Nombre_Additifs']
+CRITERES_MAXIMISER = ['Proteines_g', 'Fibres_g', 'Fruits_Legumes_Pct']
+
+# Quantiles des profils, dans l'ordre b1..b6 pour un critère à maximiser
+# (ordre inverse pour un critère à minimiser)
+QUANTILES_PROFILS = [0.05, 0.20, 0.40, 0.60, 0.80, 0.95]
+
+# Nombre minimal de valeurs par critère pour des profils propres à une catégorie
+EFFECTIF_MIN_CATEGORIE = 30
+
+
+def profils_depuis_quantiles(quantiles: pd.DataFrame) -> pd.DataFrame:
+    # quantiles : une ligne par valeur de QUANTILES_PROFILS, une colonne par critère
+    valeurs = quantiles.to_numpy(dtype=float)
+    profils = pd.DataFrame(valeurs, index=['b1', 'b2', 'b3', 'b4', 'b5', 'b6'], columns=quantiles.columns)
+    minimiser = [c for c in quantiles.columns if c in CRITERES_MINIMISER]
+    profils[minimiser] = valeurs[::-1, quantiles.columns.get_indexer(minimiser)]
+    return profils
+
+
+def creer_profils_limites(df: pd.DataFrame) -> pd.DataFrame:
+    # Création des 6 profils limites (b1 à b6) basés sur les quantiles,
+    # tous calculés en une passe par critère
+    valeurs = df[CRITERES].astype(float)
+    return profils_depuis_quantiles(valeurs.quantile(QUANTILES_PROFILS))
+
+
+def creer_profils_categories(df: pd.DataFrame, colonne: str = 'Categorie',
+                             effectif_min: int = EFFECTIF_MIN_CATEGORIE) -> pd.DataFrame:
+    # Profils b1..b6 de chaque catégorie (index (catégorie, profil)) en un seul
+    # groupby ; les catégories avec moins de effectif_min valeurs sur un critère
+    # sont omises et classées avec les profils globaux
+    groupes = df[CRITERES].astype(float).groupby(df[colonne], observed=True, sort=True)
+    effectifs = groupes.count().min(axis=1)
+    retenues = effectifs.index[effectifs >= effectif_min]
+
+    quantiles = groupes.quantile(QUANTILES_PROFILS)
+    quantiles = quantiles.reindex(pd.MultiIndex.from_product([retenues, QUANTILES_PROFILS]))
+    valeurs = quantiles.to_numpy().reshape(len(retenues), len(QUANTILES_PROFILS), len(CRITERES))
+    minimiser = [CRITERES.index(c) for c in CRITERES_MINIMISER]
+    valeurs[:, :, minimiser] = valeurs[:, ::-1, minimiser]
+
+    index = pd.MultiIndex.from_product([retenues, ElectreTri.NOMS_PROFILS], names=[colonne, 'profil'])
+    return pd.DataFrame(valeurs.reshape(-1, len(CRITERES)), index=index, columns=CRITERES)
 
 
 def definir_poids_criteres() -> Dict[str, float]:
@@ -357,3 +1192,17 @@ def definir_poids_criteres() -> Dict[str, float]:
         'Fruits_Legumes_Pct': 0.15,
         'Nombre_Additifs': 0.10
     }
+
+
+def definir_seuils_criteres() -> pd.DataFrame:
+    # Seuils d'indifférence (q), de préférence (p) et de veto (v), pour 100ml
+    return pd.DataFrame({
+        'Energie_kJ': {'q': 10, 'p': 40, 'v': 250},
+        'Acides_Gras_Satures_g': {'q': 0.1, 'p': 0.5, 'v': 3},
+        'Sucres_g': {'q': 0.5, 'p': 2, 'v': 12},
+        'Sel_g': {'q': 0.05, 'p': 0.2, 'v': 1},
+        'Proteines_g': {'q': 0.2, 'p': 1, 'v': np.inf},
+        'Fibres_g': {'q': 0.2, 'p': 1, 'v': np.inf},
+        'Fruits_Legumes_Pct': {'q': 5, 'p': 20, 'v': np.inf},
+        'Nombre_Additifs': {'q': 0, 'p': 1, 'v': 6}
+    }, dtype=float)
@@ -0,0 +1,188 @@
+"""
+Surclassement produit / produit - SuperNutriScore
+
+Relation a S b entre tous les couples de produits (concordance pondérée ≥ λ,
+mêmes poids et mêmes critères à minimiser / maximiser qu'ElectreTri),
+calculée par tuiles sous un budget mémoire et stockée à raison d'un bit par
+couple (en mémoire ou dans un fichier .npy projeté en mémoire). Donne les
+degrés, un classement par flux net et le noyau des produits non surclassés.
+"""
+
+import math
+from typing import Iterator, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from supernutriscore import ElectreTri
+
+BUDGET_MEMOIRE = 64 * 2 ** 20
+
+
+class RelationSurclassement:
+    # bits[i, j // 8], bit j % 8 : le produit i surclasse le produit j.
+    # Relation réflexive (diagonale à 1) ; P = S et non S⁻¹ est la préférence stricte
+
+    def __init__(self, bits: np.ndarray, index: Optional[pd.Index] = None, taille_tuile: int = 2048):
+        self.bits = bits
+        self.n = bits.shape[0]
+        self.index = pd.RangeIndex(self.n) if index is None else index
+        self.taille_tuile = taille_tuile
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __repr__(self) -> str:
+        return f"RelationSurclassement(n={self.n}, octets={self.bits.nbytes})"
+
+    def tuile(self, lignes: slice, colonnes: slice) -> np.ndarray:
+        # Bloc booléen (lignes, colonnes) de la relation
+        debut, fin = colonnes.start, min(colonnes.stop, self.n)
+        octets = self.bits[lignes, debut // 8:(fin + 7) // 8]
+        bloc = np.unpackbits(octets, axis=1, bitorder='little')
+        return bloc[:, debut % 8:debut % 8 + fin - debut].view(bool)
+
+    def surclasse(self, i: int, j: int) -> bool:
+        return bool((self.bits[i, j // 8] >> (j % 8)) & 1)
+
+    def tuiles(self) -> Iterator[Tuple[slice, slice]]:
+        for i in range(0, self.n, self.taille_tuile):
+            for j in range(0, self.n, self.taille_tuile):
+                yield slice(i, min(i + self.taille_tuile, self.n)), slice(j, min(j + self.taille_tuile, self.n))
+
+    def preferences_strictes(self, lignes: slice, colonnes: slice) -> np.ndarray:
+        return self.tuile(lignes, colonnes) & ~self.tuile(colonnes, lignes).T
+
+    def paires(self, strictes: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+        # Forme creuse (coordonnées des couples i ≠ j en relation), tuile par tuile
+        lignes, colonnes = [], []
+        for bloc_lignes, bloc_colonnes in self.tuiles():
+            if strictes:
+                bloc = self.preferences_strictes(bloc_lignes, bloc_colonnes)
+            else:
+                bloc = self.tuile(bloc_lignes, bloc_colonnes)
+            i, j = np.nonzero(bloc)
+            i += bloc_lignes.start
+            j += bloc_colonnes.start
+            hors_diagonale = i != j
+            lignes.append(i[hors_diagonale])
+            colonnes.append(j[hors_diagonale])
+        if not lignes:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        return np.concatenate(lignes), np.concatenate(colonnes)
+
+    def degres(self) -> pd.DataFrame:
+        # Surclasse : nombre de produits que i surclasse ; Surclasse_Par : nombre de
+        # produits qui surclassent i (diagonale exclue) ; idem pour la préférence
+        # stricte ; Flux_Net = Prefere - Prefere_Par
+        sortants = np.zeros(self.n, dtype=np.int64)
+        entrants = np.zeros(self.n, dtype=np.int64)
+        preferes = np.zeros(self.n, dtype=np.int64)
+        preferes_par = np.zeros(self.n, dtype=np.int64)
+        for lignes, colonnes in self.tuiles():
+            S = self.tuile(lignes, colonnes)
+            P = S & ~self.tuile(colonnes, lignes).T
+            sortants[lignes] += S.sum(axis=1)
+            entrants[colonnes] += S.sum(axis=0)
+            preferes[lignes] += P.sum(axis=1)
+            preferes_par[colonnes] += P.sum(axis=0)
+        return pd.DataFrame({
+            'Surclasse': sortants - 1,
+            'Surclasse_Par': entrants - 1,
+            'Prefere': preferes,
+            'Prefere_Par': preferes_par,
+            'Flux_Net': preferes - preferes_par
+        }, index=self.index)
+
+    def noyau(self) -> Tuple[np.ndarray, bool]:
+        # Noyau de la préférence stricte : produits non surclassés, puis retrait de
+        # ce qu'ils surclassent, jusqu'à épuisement. Ensemble indépendant (aucun
+        # membre n'en préfère strictement un autre) et absorbant (tout produit
+        # écarté est strictement moins bon qu'un membre) tant que P est sans
+        # circuit ; sinon les produits du circuit restent hors du noyau et le
+        # second élément vaut False
+        restants = np.ones(self.n, dtype=bool)
+        noyau = np.zeros(self.n, dtype=bool)
+        while restants.any():
+            entrants = np.zeros(self.n, dtype=np.int64)
+            for lignes, colonnes in self.tuiles():
+                if restants[lignes].any() and restants[colonnes].any():
+                    P = self.preferences_strictes(lignes, colonnes)
+                    entrants[colonnes] += P[restants[lignes]].sum(axis=0)
+            sources = restants & (entrants == 0)
+            if not sources.any():
+                return noyau, False
+            noyau |= sources
+
+            domines = np.zeros(self.n, dtype=bool)
+            for lignes, colonnes in self.tuiles():
+                if sources[lignes].any() and restants[colonnes].any():
+                    P = self.preferences_strictes(lignes, colonnes)
+                    domines[colonnes] |= P[sources[lignes]].any(axis=0)
+            restants &= ~(sources | domines)
+        return noyau, True
+
+
+def taille_tuile_budget(budget_memoire: int, nb_groupes: int) -> int:
+    # Octets par couple : codes (un par groupe de 8 critères), comparaison,
+    # décalage et surclassement ; côté multiple de 8 pour l'empaquetage
+    cote = math.isqrt(budget_memoire // (nb_groupes + 3))
+    return max(8, cote - cote % 8)
+
+
+def calculer_relation(electre: ElectreTri, df: pd.DataFrame, budget_memoire: int = BUDGET_MEMOIRE,
+                      chemin: Optional[str] = None) -> RelationSurclassement:
+    # Concordance seule (ni seuils q / p / v, ni veto, même pour ElectreTriComplet).
+    # Avec chemin, les bits sont écrits dans un fichier .npy (relisible par
+    # np.load(chemin, mmap_mode='r')) plutôt qu'en mémoire
+    criteres = list(electre.poids.keys())
+    valeurs = electre.valeurs_criteres(df)
+    n = len(df)
+    tables = electre.tables_poids(criteres)
+    taille = taille_tuile_budget(budget_memoire, len(tables))
+
+    forme = (n, (n + 7) // 8)
+    if chemin is None:
+        bits = np.zeros(forme, dtype=np.uint8)
+    else:
+        bits = np.lib.format.open_memmap(chemin, mode='w+', dtype=np.uint8, shape=forme)
+
+    for i in range(0, n, taille):
+        a = valeurs[i:i + taille]
+        for j in range(0, n, taille):
+            b = valeurs[j:j + taille]
+            codes = np.zeros((len(a), len(b), len(tables)), dtype=np.uint8)
+            comparaison = np.empty((len(a), len(b)), dtype=bool)
+            decalage = np.empty((len(a), len(b)), dtype=np.uint8)
+            for k, critere in enumerate(criteres):
+                if critere in electre.criteres_a_maximiser:
+                    np.greater_equal(a[:, k, np.newaxis], b[np.newaxis, :, k], out=comparaison)
+                else:
+                    np.less_equal(a[:, k, np.newaxis], b[np.newaxis, :, k], out=comparaison)
+                groupe, bit = divmod(k, 8)
+                np.left_shift(comparaison.view(np.uint8), bit, out=decalage)
+                np.bitwise_or(codes[..., groupe], decalage, out=codes[..., groupe])
+
+            S = electre.surclassements_tables(tables, codes, electre.lambda_seuil)
+            if i == j:
+                np.fill_diagonal(S, True)
+            bits[i:i + taille, j // 8:j // 8 + (len(b) + 7) // 8] = np.packbits(S, axis=1, bitorder='little')
+
+    if chemin is not None:
+        bits.flush()
+    return RelationSurclassement(bits, df.index, taille)
+
+
+def classer_par_categorie(electre: ElectreTri, df: pd.DataFrame, colonne: str = 'Categorie',
+                          budget_memoire: int = BUDGET_MEMOIRE) -> pd.DataFrame:
+    # Degrés, rang par flux net (1 = meilleur, ex aequo au rang minimal) et
+    # appartenance au noyau, la relation étant calculée dans chaque catégorie
+    colonnes = ['Surclasse', 'Surclasse_Par', 'Prefere', 'Prefere_Par', 'Flux_Net', 'Rang_Categorie']
+    resultats = pd.DataFrame(0, index=df.index, columns=colonnes)
+    resultats['Noyau'] = False
+    for _, positions in df.groupby(colonne, observed=True, sort=False).indices.items():
+        relation = calculer_relation(electre, df.iloc[positions], budget_memoire)
+        degres = relation.degres()
+        degres['Rang_Categorie'] = degres['Flux_Net'].rank(ascending=False, method='min').astype(int)
+        degres['Noyau'], _ = relation.noyau()
+        resultats.iloc[positions] = degres[resultats.columns].to_numpy()
+    return resultats
@@ -0,0 +1,20 @@
+import os
+import sys
+import warnings
+
+import pytest
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from chargement_donnees import charger_base  # noqa: E402
+
+CHEMIN_CSV = os.path.join(RACINE, 'base_donnees_boissons.csv')
+
+
+@pytest.fixture(scope='session')
+def base():
+    # Base livrée, lue sans cache (ses incohérences connues sont signalées à part)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return charger_base(CHEMIN_CSV, utiliser_cache=False)
@@ -0,0 +1,143 @@
+import os
+import shutil
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import chargement_donnees
+from cache_artefacts import CacheArtefacts
+from chargement_donnees import (FICHIER_COURANT, PREFIXE_TEMPORAIRE, PREFIXE_VERSION, charger_base,
+                                dossier_cache, nettoyer_cache)
+from conftest import CHEMIN_CSV
+
+
+@pytest.fixture
+def chemin(tmp_path):
+    copie = tmp_path / os.path.basename(CHEMIN_CSV)
+    shutil.copy(CHEMIN_CSV, copie)
+    return str(copie)
+
+
+def charger(chemin: str, **options) -> pd.DataFrame:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return charger_base(chemin, **options)
+
+
+def egaux(df: pd.DataFrame, attendu: pd.DataFrame):
+    # Copie profonde : colonnes projetées (np.memmap) comparées comme des tableaux
+    pd.testing.assert_frame_equal(df.copy(deep=True), attendu)
+
+
+def version_courante(chemin: str) -> str:
+    with open(os.path.join(dossier_cache(chemin), FICHIER_COURANT), encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def projection(serie: pd.Series) -> np.memmap:
+    # Fichier projeté sous-jacent à une colonne numérique lue depuis le cache
+    tableau = serie.to_numpy()
+    while not isinstance(tableau, np.memmap):
+        tableau = tableau.base
+    return tableau
+
+
+def test_publication_atomique(chemin):
+    charger(chemin)
+    racine = dossier_cache(chemin)
+    version = version_courante(chemin)
+    assert version.startswith(PREFIXE_VERSION)
+    assert sorted(os.listdir(racine)) == sorted([FICHIER_COURANT, version])
+    assert os.path.exists(os.path.join(racine, version, 'meta.json'))
+
+
+def test_cache_egal_csv(chemin, base):
+    charger(chemin)
+    egaux(charger(chemin), base)
+
+
+def test_copie_sur_ecriture(chemin):
+    charger(chemin)
+    df = charger(chemin)
+    sucres = projection(df['Sucres_g'])
+    assert sucres.mode == 'c'
+    origine = float(sucres[0])
+    sucres[0] = origine + 1000
+    assert df['Sucres_g'].iloc[0] == origine + 1000
+    # Ni les fichiers ni les autres lecteurs ne voient la modification
+    assert charger(chemin)['Sucres_g'].iloc[0] == origine
+    df.loc[df.index[1], 'Energie_kcal'] = -1
+    assert charger(chemin)['Energie_kcal'].iloc[1] != -1
+
+
+def test_republication_garde_ancienne_version_lisible(chemin, monkeypatch):
+    charger(chemin)
+    ancien = charger(chemin)
+    attendu = ancien.copy(deep=True)
+    ancienne_version = version_courante(chemin)
+
+    with open(chemin, encoding='utf-8') as f:
+        lignes = f.readlines()
+    with open(chemin, 'w', encoding='utf-8') as f:
+        f.writelines(lignes[:-1])
+    # Version remplacée supprimée dès la republication
+    monkeypatch.setattr(chargement_donnees, 'DELAI_VERSIONS_OBSOLETES', -1)
+    nouveau = charger(chemin)
+
+    assert version_courante(chemin) != ancienne_version
+    assert not os.path.exists(os.path.join(dossier_cache(chemin), ancienne_version))
+    assert len(nouveau) == len(attendu) - 1
+    egaux(ancien, attendu)
+    egaux(charger(chemin), nouveau.copy(deep=True))
+
+
+def test_nettoyage_selon_delais(tmp_path):
+    maintenant = time.time()
+    dossiers = {
+        'v_courante': maintenant - 10 ** 5,
+        'v_recente': maintenant,
+        'v_ancienne': maintenant - chargement_donnees.DELAI_VERSIONS_OBSOLETES - 10,
+        f'{PREFIXE_TEMPORAIRE}en_cours': maintenant - chargement_donnees.DELAI_VERSIONS_OBSOLETES - 10,
+        f'{PREFIXE_TEMPORAIRE}abandonnee': maintenant - chargement_donnees.DELAI_ECRITURES_ABANDONNEES - 10,
+        'autre': maintenant - 10 ** 5,
+    }
+    for nom, date in dossiers.items():
+        (tmp_path / nom).mkdir()
+        os.utime(tmp_path / nom, (date, date))
+    nettoyer_cache(str(tmp_path), 'v_courante')
+    assert sorted(os.listdir(tmp_path)) == sorted(['v_courante', 'v_recente', f'{PREFIXE_TEMPORAIRE}en_cours',
+                                                   'autre'])
+
+
+def test_colonne_manquante_relit_csv(chemin, base):
+    charger(chemin)
+    dossier = os.path.join(dossier_cache(chemin), version_courante(chemin))
+    # Version retirée pendant la lecture : relecture du CSV
+    os.remove(os.path.join(dossier, 'colonne_0_valeurs.npy'))
+    egaux(charger(chemin), base)
+
+
+def test_artefacts_disque_et_invalidation(tmp_path):
+    dossier = str(tmp_path / 'artefacts')
+    cache = CacheArtefacts(dossier=dossier)
+    empreinte = 'f' * 64
+    cle_base = cache.cle('essai', empreinte, n=1)
+    cle_globale = cache.cle('essai', '', n=1)
+    cache.enregistrer(cle_base, np.arange(5), empreinte)
+    cache.enregistrer(cle_globale, {'a': 1})
+
+    # Relecture depuis le disque par une autre instance
+    autre = CacheArtefacts(dossier=dossier)
+    trouve, valeur = autre.obtenir(cle_base, empreinte)
+    assert trouve and (valeur == np.arange(5)).all()
+    assert not [nom for nom in os.listdir(dossier) if nom.endswith('.tmp')]
+
+    autre.invalider('')
+    assert autre.obtenir(cle_globale) == (False, None)
+    assert autre.obtenir(cle_base, empreinte)[0]
+    autre.invalider(empreinte)
+    assert CacheArtefacts(dossier=dossier).obtenir(cle_base, empreinte) == (False, None)
+    assert os.listdir(dossier) == []
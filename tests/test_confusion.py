@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from supernutriscore import AnalyseResultats, MatriceConfusionCumulee
+
+CLASSES = np.array(AnalyseResultats.CLASSES, dtype=object)
+
+
+@pytest.fixture(scope='module')
+def classes():
+    # Quelques libellés hors classes (ignorés) comme dans les données réelles
+    rng = np.random.default_rng(0)
+    vraies = pd.Series(CLASSES[rng.integers(0, 5, 5000)])
+    predites = pd.Series(CLASSES[rng.integers(0, 5, 5000)])
+    vraies[rng.random(5000) < 0.01] = None
+    predites[rng.random(5000) < 0.01] = "'C '"
+    return vraies, predites
+
+
+def test_fusion_blocs_egale_matrice_globale(classes):
+    vraies, predites = classes
+    attendu = AnalyseResultats.matrice_confusion(vraies, predites).to_numpy()
+    blocs = [MatriceConfusionCumulee().mettre_a_jour(vraies[debut:debut + 700], predites[debut:debut + 700])
+             for debut in range(0, len(vraies), 700)]
+    assert (sum(blocs).comptes == attendu).all()
+    # Addition associative et commutative
+    assert (blocs[0] + blocs[1]) + blocs[2] == blocs[0] + (blocs[1] + blocs[2]) == blocs[2] + blocs[1] + blocs[0]
+    assert sum(blocs).total == attendu.sum()
+
+
+def test_lot_egal_matrices_separees(classes):
+    vraies, predites = classes
+    decalees = pd.Series(np.roll(predites.to_numpy(), 3))
+    matrices = AnalyseResultats.matrices_confusion_lot(vraies, pd.DataFrame({'a': predites, 'b': decalees}))
+    assert (matrices[0] == AnalyseResultats.matrice_confusion(vraies, predites).to_numpy()).all()
+    assert (matrices[1] == AnalyseResultats.matrice_confusion(vraies, decalees).to_numpy()).all()
+
+
+@pytest.mark.parametrize('maximum, largeur', [(0, 1), (255, 1), (256, 2), (70_000, 4), (2 ** 32, 8)])
+def test_octets_aller_retour(maximum, largeur):
+    comptes = np.arange(25, dtype=np.int64) * (maximum // 25)
+    comptes[7] = maximum
+    matrice = MatriceConfusionCumulee(comptes)
+    octets = matrice.en_octets()
+    assert octets[len(MatriceConfusionCumulee.ENTETE)] == largeur
+    assert len(octets) == len(MatriceConfusionCumulee.ENTETE) + 1 + 25 * largeur
+    assert MatriceConfusionCumulee.depuis_octets(octets) == matrice
+
+
+@pytest.mark.parametrize('octets', [
+    b'', b'MCC', b'XYZ\x01' + bytes(25),
+    b'MCC\x03' + bytes(75),                          # largeur invalide
+    b'MCC\x01' + bytes(24), b'MCC\x02' + bytes(49),  # longueur incohérente
+    b'MCC\x04' + bytes(36 * 4),                      # carré, mais pas 5 × 5
+])
+def test_octets_invalides(octets):
+    with pytest.raises(ValueError, match="Données de matrice de confusion invalides"):
+        MatriceConfusionCumulee.depuis_octets(octets)
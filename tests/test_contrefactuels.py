@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from supernutriscore import NutriScoreBoissons
+
+RANGS = {classe: i for i, classe in enumerate('ABCDE')}
+NUTRIMENTS = NutriScoreBoissons.NUTRIMENTS_NEGATIFS + NutriScoreBoissons.NUTRIMENTS_POSITIFS
+
+
+@pytest.fixture(scope='module')
+def contexte(base):
+    edulcorants = NutriScoreBoissons.detecter_edulcorants(base)
+    est_eau = (base['Categorie'].astype(str).str.lower() == 'eau').to_numpy()
+    contrefactuels = NutriScoreBoissons.calculer_contrefactuels_batch(base, edulcorants, est_eau)
+    vise = contrefactuels['Classe_Visee'].map(RANGS).to_numpy(dtype=float)
+    return edulcorants, est_eau, contrefactuels, vise
+
+
+def classes(df, edulcorants, est_eau) -> np.ndarray:
+    scores = NutriScoreBoissons.calculer_scores_batch(df, edulcorants, est_eau)
+    return scores['Label_Nutriscore_Calcule'].map(RANGS).to_numpy(dtype=float)
+
+
+@pytest.mark.parametrize('nom', [nom for nom, _ in NUTRIMENTS])
+def test_cible_minimale(base, contexte, nom):
+    # La cible suffit à atteindre la classe visée, la valeur voisine non
+    edulcorants, est_eau, contrefactuels, vise = contexte
+    negatif = f'Reduction_{nom}' in contrefactuels
+    possible = contrefactuels[f'Cible_{nom}'].notna().to_numpy()
+    assert possible.any()
+    type_valeurs = base[nom].dtype
+    cible = contrefactuels[f'Cible_{nom}'].to_numpy()[possible].astype(type_valeurs)
+    voisine = np.nextafter(cible, np.array(-np.inf, dtype=type_valeurs))
+    suffisante, insuffisante = (voisine, cible) if negatif else (cible, voisine)
+
+    for valeurs, atteinte in [(suffisante, True), (insuffisante, False)]:
+        df = base.copy()
+        df.loc[possible, nom] = valeurs
+        obtenues = classes(df, edulcorants, est_eau)[possible]
+        assert ((obtenues <= vise[possible]) == atteinte).all()
+
+    # Sans cible : même la valeur la plus favorable ne suffit pas
+    impossible = ~possible & ~np.isnan(vise) & base[nom].notna().to_numpy()
+    df = base.copy()
+    df.loc[~possible, nom] = 0.0 if negatif else 1e9
+    assert (classes(df, edulcorants, est_eau)[impossible] > vise[impossible]).all()
+
+
+@pytest.mark.parametrize('nom, table', NUTRIMENTS)
+def test_ecarts_coherents_avec_cibles(base, contexte, nom, table):
+    # Cibles lues telles quelles dans les tables, écarts sans bruit float32
+    contrefactuels = contexte[2]
+    negatif = f'Reduction_{nom}' in contrefactuels
+    ecart = contrefactuels[f'{"Reduction" if negatif else "Augmentation"}_{nom}'].to_numpy()
+    cible = contrefactuels[f'Cible_{nom}'].to_numpy()
+    possible = ~np.isnan(cible)
+    valeurs = base[nom].to_numpy(dtype=float)[possible]
+    attendu = valeurs - cible[possible] if negatif else cible[possible] - valeurs
+    assert np.allclose(ecart[possible], attendu, rtol=1e-6, atol=1e-6)
+    assert (ecart[possible] == np.round(ecart[possible], 6)).all()
+    seuils = NutriScoreBoissons.seuils_au_plus(table) if negatif else NutriScoreBoissons.seuils_au_moins(table)
+    assert np.isin(cible[possible], seuils).all()
+    assert np.isnan(ecart[~possible]).all()
+
+
+def test_sans_edulcorants(base, contexte):
+    edulcorants, est_eau, contrefactuels, vise = contexte
+    sans = contrefactuels['Sans_Edulcorants'].to_numpy()
+    assert sans.any()
+    obtenues = classes(base, edulcorants & ~sans, est_eau)
+    assert (obtenues[sans] <= vise[sans]).all()
+    insuffisant = edulcorants & ~sans & ~np.isnan(vise)
+    obtenues = classes(base, np.zeros_like(edulcorants), est_eau)
+    assert (obtenues[insuffisant] > vise[insuffisant]).all()
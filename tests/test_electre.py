@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from classification_parallele import classifier_parallele
+from supernutriscore import (ElectreTri, ElectreTriComplet, creer_profils_categories, creer_profils_limites,
+                             definir_poids_criteres, definir_seuils_criteres)
+
+LAMBDAS = [0.6, 0.75]
+
+
+def classes_boucle(electre: ElectreTri, df: pd.DataFrame, lambda_seuil: float):
+    # Procédures d'origine, produit par produit (concordance_globale / surclassement)
+    electre.lambda_seuil = lambda_seuil
+    lignes = [ligne for _, ligne in df.iterrows()]
+    return (np.array([electre.affectation_pessimiste(ligne) for ligne in lignes], dtype=object),
+            np.array([electre.affectation_optimiste(ligne) for ligne in lignes], dtype=object))
+
+
+@pytest.fixture(scope='module')
+def donnees(base):
+    # Quelques valeurs manquantes : ni concordance ni discordance dans les deux versions
+    df = base.copy()
+    rng = np.random.default_rng(0)
+    for critere in ['Sucres_g', 'Proteines_g', 'Fruits_Legumes_Pct']:
+        df.loc[rng.random(len(df)) < 0.05, critere] = np.nan
+    return df
+
+
+@pytest.fixture(scope='module')
+def profils(base):
+    return creer_profils_limites(base)
+
+
+@pytest.fixture(scope='module')
+def references(donnees, profils):
+    electre = ElectreTri(definir_poids_criteres(), profils)
+    return {lambda_seuil: classes_boucle(electre, donnees, lambda_seuil) for lambda_seuil in LAMBDAS}
+
+
+@pytest.mark.parametrize('lambda_seuil', LAMBDAS)
+def test_deux_procedures_egales_boucle(donnees, profils, references, lambda_seuil):
+    electre = ElectreTri(definir_poids_criteres(), profils, lambda_seuil)
+    resultat = electre.classifier_deux_procedures(donnees, taille_bloc=64)
+    pessimiste, optimiste = references[lambda_seuil]
+    assert (resultat['Classe_ELECTRE_Pessimiste'].to_numpy() == pessimiste).all()
+    assert (resultat['Classe_ELECTRE_Optimiste'].to_numpy() == optimiste).all()
+    assert (resultat['Incomparabilite_ELECTRE'].to_numpy() == (pessimiste != optimiste)).all()
+
+
+@pytest.mark.parametrize('methode', ['pessimiste', 'optimiste'])
+def test_base_donnees_par_blocs_egale_boucle(donnees, profils, references, methode):
+    electre = ElectreTri(definir_poids_criteres(), profils, LAMBDAS[0])
+    resultat = electre.classifier_base_donnees(donnees, methode, taille_bloc=7)
+    attendu = references[LAMBDAS[0]][methode == 'optimiste']
+    assert (resultat[f'Classe_ELECTRE_{methode.capitalize()}'].to_numpy() == attendu).all()
+
+
+def test_reclassifier_egal_boucle(donnees, profils, references):
+    electre = ElectreTri(definir_poids_criteres(), profils).preparer(donnees, taille_bloc=50)
+    for lambda_seuil in LAMBDAS:
+        pessimiste, optimiste = references[lambda_seuil]
+        assert (electre.reclassifier(lambda_seuil=lambda_seuil).to_numpy() == pessimiste).all()
+        assert (electre.reclassifier(methode='optimiste').to_numpy() == optimiste).all()
+
+
+def test_reclassifier_garde_index_appelant(donnees, profils):
+    electre = ElectreTri(definir_poids_criteres(), profils).preparer(donnees)
+    decale = donnees.set_index(donnees.index + 1000)
+    autre = ElectreTri(definir_poids_criteres(), profils).preparer(decale, electre.comparaisons)
+    assert autre.reclassifier().index.equals(decale.index)
+
+
+def test_multi_lambda_egal_boucle(donnees, profils, references):
+    electre = ElectreTri(definir_poids_criteres(), profils)
+    resultat = electre.classifier_multi_lambda(donnees, LAMBDAS, taille_bloc=100)
+    for lambda_seuil in LAMBDAS:
+        pessimiste, optimiste = references[lambda_seuil]
+        assert (resultat[(lambda_seuil, 'pessimiste')].to_numpy() == pessimiste).all()
+        assert (resultat[(lambda_seuil, 'optimiste')].to_numpy() == optimiste).all()
+
+
+def test_parallele_egal_boucle(donnees, profils, references):
+    electre = ElectreTri(definir_poids_criteres(), profils)
+    resultat = classifier_parallele(electre, donnees, nb_processus=2, taille_tranche=60)
+    pessimiste, optimiste = references[LAMBDAS[0]]
+    assert (resultat['Classe_ELECTRE_Pessimiste'].to_numpy() == pessimiste).all()
+    assert (resultat['Classe_ELECTRE_Optimiste'].to_numpy() == optimiste).all()
+
+
+def test_parallele_profils_categories(base, profils):
+    electre = ElectreTri(definir_poids_criteres(), profils)
+    profils_categories = creer_profils_categories(base, effectif_min=20)
+    attendu = electre.classifier_deux_procedures(base, profils_categories=profils_categories)
+    resultat = classifier_parallele(electre, base, nb_processus=2, taille_tranche=60,
+                                    profils_categories=profils_categories)
+    for colonne in resultat.columns:
+        assert (resultat[colonne] == attendu[colonne]).all()
+
+
+def test_concordances_empaquetees_egales_concordance_globale(donnees, profils):
+    # Table des poids lue par code empaqueté : identique au bit près à la somme pondérée
+    electre = ElectreTri(definir_poids_criteres(), profils)
+    echantillon = donnees.iloc[::9]
+    C_ab, C_ba = electre.concordances_depuis_comparaisons(
+        *electre.comparer_aux_profils(electre.valeurs_criteres(echantillon)))
+    for i, (_, ligne) in enumerate(echantillon.iterrows()):
+        for j, nom in enumerate(electre.NOMS_PROFILS):
+            assert (C_ab[i, j], C_ba[i, j]) == electre.concordance_globale(ligne, profils.loc[nom])
+
+
+def test_empaqueter_plus_de_huit_criteres():
+    rng = np.random.default_rng(1)
+    comparaisons = rng.random((40, 6, 11)) < 0.5
+    codes = ElectreTri.empaqueter(comparaisons)
+    assert codes.shape == (40, 6, 2) and codes.dtype == np.uint8
+    bits = np.unpackbits(codes, axis=-1, bitorder='little')[..., :11].astype(bool)
+    assert (bits == comparaisons).all()
+
+
+def test_complet_sans_seuils_egal_electre_tri(donnees, profils, references):
+    seuils = pd.DataFrame(0.0, index=['q', 'p', 'v'], columns=list(definir_poids_criteres()))
+    seuils.loc['v'] = np.inf
+    electre = ElectreTriComplet(definir_poids_criteres(), profils, seuils, LAMBDAS[0])
+    resultat = electre.classifier_deux_procedures(donnees, taille_bloc=64)
+    pessimiste, optimiste = references[LAMBDAS[0]]
+    assert (resultat['Classe_ELECTRE_Pessimiste'].to_numpy() == pessimiste).all()
+    assert (resultat['Classe_ELECTRE_Optimiste'].to_numpy() == optimiste).all()
+
+
+def test_complet_credibilites_egales_definition(base, profils):
+    # σ(a, b) calculée scalaire par scalaire à partir des définitions
+    electre = ElectreTriComplet(definir_poids_criteres(), profils, definir_seuils_criteres())
+    echantillon = base.iloc[::11]
+    sigma_ab, sigma_ba = electre.credibilites_aux_profils(electre.valeurs_criteres(echantillon))
+    somme_poids = sum(electre.poids.values())
+
+    def sigma(a, b):
+        partielles = []
+        for critere, poids in electre.poids.items():
+            q, p, v = electre.seuils[critere]
+            avance = b[critere] - a[critere]
+            if critere not in electre.criteres_a_maximiser:
+                avance = -avance
+            c = 1.0 if avance <= q else (0.0 if avance >= p else (p - avance) / (p - q))
+            d = 0.0 if avance <= p else (1.0 if avance >= v else (avance - p) / (v - p))
+            partielles.append((poids, c, d))
+        C = sum(poids * c for poids, c, _ in partielles) / somme_poids
+        resultat = C
+        for _, _, d in partielles:
+            if d > C:
+                resultat *= (1 - d) / (1 - C)
+        return resultat
+
+    for i, (_, ligne) in enumerate(echantillon.iterrows()):
+        a = ligne[list(electre.poids)].astype(float)
+        for j, nom in enumerate(electre.NOMS_PROFILS):
+            b = profils.loc[nom]
+            assert sigma_ab[i, j] == pytest.approx(sigma(a, b), abs=1e-12)
+            assert sigma_ba[i, j] == pytest.approx(sigma(b, a), abs=1e-12)
+
+
+def test_complet_reclassifier_par_blocs(base, profils):
+    electre = ElectreTriComplet(definir_poids_criteres(), profils, definir_seuils_criteres())
+    attendu = electre.classifier_deux_procedures(base)
+    electre.preparer(base, taille_bloc=16)
+    assert (electre.reclassifier().to_numpy() == attendu['Classe_ELECTRE_Pessimiste'].to_numpy()).all()
+    assert (electre.reclassifier(methode='optimiste').to_numpy()
+            == attendu['Classe_ELECTRE_Optimiste'].to_numpy()).all()
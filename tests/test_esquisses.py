@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from esquisses_quantiles import EsquisseKLL, EsquissesProfils
+from supernutriscore import QUANTILES_PROFILS, creer_profils_limites
+
+QUANTILES = np.linspace(0, 1, 41)
+
+
+def erreur_rang(valeurs: np.ndarray, estimes: np.ndarray) -> float:
+    # Écart normalisé entre le rang visé et l'intervalle de rangs de l'estimation
+    triees = np.sort(valeurs)
+    bas = np.searchsorted(triees, estimes, side='left') / len(valeurs)
+    haut = np.searchsorted(triees, estimes, side='right') / len(valeurs)
+    return float(np.max(np.maximum(bas - QUANTILES, QUANTILES - haut).clip(min=0)))
+
+
+@pytest.mark.parametrize('graine', range(5))
+def test_erreur_rang_bornee(graine):
+    rng = np.random.default_rng(graine)
+    valeurs = np.concatenate([rng.lognormal(size=150_000), np.round(rng.random(50_000), 1)])
+    esquisse = EsquisseKLL(erreur=0.01, graine=graine)
+    for bloc in np.array_split(rng.permutation(valeurs), 37):
+        esquisse.mettre_a_jour(bloc)
+    assert len(esquisse) == len(valeurs)
+    assert esquisse.nb_stockes() < len(valeurs) / 20
+    assert erreur_rang(valeurs, esquisse.quantiles(QUANTILES)) <= esquisse.erreur
+
+
+def test_fusion_erreur_rang_bornee():
+    rng = np.random.default_rng(0)
+    parts = [rng.normal(loc, 1, 40_000) for loc in range(5)]
+    fusion = sum(EsquisseKLL(erreur=0.01, graine=i).mettre_a_jour(part) for i, part in enumerate(parts))
+    assert len(fusion) == sum(len(part) for part in parts)
+    assert erreur_rang(np.concatenate(parts), fusion.quantiles(QUANTILES)) <= fusion.erreur
+
+
+def test_exacte_avant_compression():
+    valeurs = np.random.default_rng(0).random(50)
+    esquisse = EsquisseKLL().mettre_a_jour(valeurs)
+    assert np.array_equal(esquisse.quantiles(QUANTILES), np.quantile(valeurs, QUANTILES))
+
+
+def test_precisions_differentes():
+    with pytest.raises(ValueError):
+        EsquisseKLL(erreur=0.01) + EsquisseKLL(erreur=0.05)
+
+
+def test_profils_par_blocs_egaux_profils_exacts(base):
+    # Capacité supérieure à la taille de la base : esquisse exacte, mêmes profils
+    esquisses = sum(EsquissesProfils(erreur=0.005).mettre_a_jour(base.iloc[debut:debut + 40])
+                    for debut in range(0, len(base), 40))
+    assert list(esquisses.quantiles().index) == list(QUANTILES_PROFILS)
+    attendu = creer_profils_limites(base)
+    np.testing.assert_allclose(esquisses.profils()[attendu.columns].to_numpy(dtype=float),
+                               attendu.to_numpy(dtype=float), rtol=1e-6)
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+import front_pareto
+from front_pareto import calculer_couches_pareto, couches_pareto, valeurs_orientees
+
+
+def couches_brutes(valeurs: np.ndarray) -> np.ndarray:
+    # Définition : couche k = non dominés une fois les couches 1..k-1 retirées
+    inferieur_egal = (valeurs[:, np.newaxis, :] <= valeurs[np.newaxis, :, :]).all(axis=2)
+    strict = (valeurs[:, np.newaxis, :] < valeurs[np.newaxis, :, :]).any(axis=2)
+    domine = inferieur_egal & strict
+    couches = np.zeros(len(valeurs), dtype=np.int64)
+    restants = np.ones(len(valeurs), dtype=bool)
+    couche = 0
+    while restants.any():
+        couche += 1
+        non_domines = restants & ~domine[restants].any(axis=0)
+        couches[non_domines] = couche
+        restants &= ~non_domines
+    return couches
+
+
+JEUX = ['continu', 'egalites', 'manquants', 'doublons', 'un_front', 'chaine', 'un_critere', 'huit_criteres']
+
+
+def jeu(nom: str) -> np.ndarray:
+    rng = np.random.default_rng(JEUX.index(nom))
+    if nom == 'continu':
+        return rng.random((400, 5))
+    if nom == 'egalites':
+        return rng.integers(0, 4, (500, 4)).astype(float)
+    if nom == 'manquants':
+        valeurs = np.round(rng.random((400, 6)), 1)
+        valeurs[rng.random(valeurs.shape) < 0.05] = np.inf
+        return valeurs
+    if nom == 'doublons':
+        return np.repeat(rng.integers(0, 6, (60, 3)).astype(float), 5, axis=0)
+    if nom == 'un_front':
+        return np.column_stack([np.arange(300), -np.arange(300)]).astype(float)
+    if nom == 'chaine':
+        return np.cumsum(rng.random((300, 3)), axis=0)
+    if nom == 'un_critere':
+        return rng.integers(0, 50, (200, 1)).astype(float)
+    return rng.random((300, 8))
+
+
+@pytest.mark.parametrize('nom', JEUX)
+def test_couches_egales_definition(nom):
+    valeurs = jeu(nom)
+    assert (couches_pareto(valeurs) == couches_brutes(valeurs)).all()
+
+
+@pytest.mark.parametrize('nom', JEUX)
+@pytest.mark.parametrize('bloc, paquet, comparaisons, seuil', [
+    (4, 3, 2048, 1),            # comparaisons directes minimales : toute la récursion
+    (16, 8, 0, 64),             # extraction de la première couche abandonnée
+    (7, 1, 5, 4),               # abandon en cours d'extraction
+    (1, 1, 2048, 2 ** 14),
+])
+def test_couches_tous_chemins(monkeypatch, nom, bloc, paquet, comparaisons, seuil):
+    monkeypatch.setattr(front_pareto, 'BLOC_PREMIERE_COUCHE', bloc)
+    monkeypatch.setattr(front_pareto, 'PAQUET_PREMIERE_COUCHE', paquet)
+    monkeypatch.setattr(front_pareto, 'COMPARAISONS_PREMIERE_COUCHE', comparaisons)
+    monkeypatch.setattr(front_pareto, 'SEUIL_COMPARAISON_DIRECTE', seuil)
+    valeurs = jeu(nom)
+    assert (couches_pareto(valeurs) == couches_brutes(valeurs)).all()
+
+
+def test_premiere_couche_egale_non_domines():
+    valeurs = jeu('egalites')
+    distinctes = np.unique(valeurs, axis=0).astype(np.uint8)
+    attendu = np.flatnonzero(couches_brutes(distinctes) == 1)
+    assert np.array_equal(np.sort(front_pareto.premiere_couche(distinctes)), attendu)
+
+
+def test_vide():
+    assert len(couches_pareto(np.empty((0, 3)))) == 0
+
+
+def test_base(base):
+    couches = calculer_couches_pareto(base)
+    assert couches.index.equals(base.index)
+    assert (couches.to_numpy() == couches_brutes(valeurs_orientees(base))).all()
+
+
+def test_base_par_categorie(base):
+    couches = calculer_couches_pareto(base, par_categorie=True)
+    valeurs = valeurs_orientees(base)
+    for _, positions in base.groupby('Categorie', observed=True).indices.items():
+        assert (couches.to_numpy()[positions] == couches_brutes(valeurs[positions])).all()